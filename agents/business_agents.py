@@ -20,6 +20,7 @@ import fast_agent as fast
     """,
     servers=["filesystem", "vector_db"],
     model="claude-3.7-sonnet-20250219",
+    cache=False,
 )
 
 @fast.agent(
@@ -40,6 +41,16 @@ import fast_agent as fast
     """,
     servers=["filesystem", "github"],
     model="claude-3.7-sonnet-20250219",
+    cache=False,
+)
+
+@fast.agent(
+    "context_summarizer",
+    """Condense workflow context for the next step of a chain.
+    You summarize earlier agents' outputs within the requested length.
+    Preserve every decision, name, value and requirement; drop reasoning and repetition.
+    """,
+    cache=True,
 )
 
 # Orchestrator for complex business tasks
@@ -8,6 +8,7 @@ import fast_agent as fast
     """,
     servers=["filesystem"],
     model="claude-3.7-sonnet-20250219",
+    cache=False,
 )
 
 @fast.agent(
@@ -18,6 +19,7 @@ import fast_agent as fast
     """,
     servers=["filesystem", "vector_db"],
     model="claude-3.7-sonnet-20250219",
+    cache=False,
 )
 
 @fast.agent(
@@ -28,4 +30,5 @@ import fast_agent as fast
     """,
     servers=["filesystem"],
     model="claude-3.7-sonnet-20250219",
+    cache=False,
 )
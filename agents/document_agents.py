@@ -18,6 +18,7 @@ import fast_agent as fast
     """,
     servers=["filesystem", "pdf_generator"],
     model="claude-3.7-sonnet-20250219",
+    cache=False,
 )
 
 @fast.agent(
@@ -28,6 +29,7 @@ import fast_agent as fast
     """,
     servers=["filesystem", "vector_db"],
     model="claude-3.7-sonnet-20250219",
+    cache=False,
 )
 
 @fast.evaluator_optimizer(
@@ -36,6 +38,8 @@ import fast_agent as fast
     evaluator="quality_assurance",
     min_rating="EXCELLENT",
     max_refinements=3,
+    # Local checks run before each evaluator call
+    checks={"min_words": 150, "banned_terms": ["lorem ipsum", "TBD"]},
 )
 
 # Quality assurance agent for documents
@@ -46,4 +50,5 @@ import fast_agent as fast
     Rate documents as EXCELLENT, GOOD, FAIR, or POOR with specific improvement suggestions.
     """,
     model="claude-3.7-sonnet-20250219",
+    cache=True,
 )
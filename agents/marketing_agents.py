@@ -42,6 +42,7 @@ import fast_agent as fast
     """,
     servers=["filesystem"],
     model="claude-3.7-sonnet-20250219",
+    cache=True,
 )
 
 @fast.agent(
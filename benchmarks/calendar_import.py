@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Calendar import and ID allocation check
+Verifies that record IDs never collide and measures bulk calendar import throughput
+
+IDs are allocated by several forked processes (each with several threads) at once, and
+every ID must be unique and each thread's sequence strictly increasing. Concurrent
+save_calendar_event() calls within one process must all survive, since same-second saves
+used to overwrite each other. A synthetic ICS document of --events events and --tasks
+tasks is then parsed and imported into a temporary store, and every record must be
+readable afterwards, including after reopening the store.
+
+Results are printed as JSON and, with --output, saved. The exit status is 1 when any
+check fails or import throughput is below --min-rate records per second.
+
+Usage:
+    python benchmarks/calendar_import.py [--processes 4] [--threads 4] [--ids 20000]
+        [--events 5000] [--tasks 1000] [--min-rate 1000] [--output results.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import calendar_import
+from storage.filesystem import FilesystemStore
+from storage.ids import new_id
+
+
+# === ID allocation ===
+
+def allocate(threads: int, count: int) -> List[List[str]]:
+    """Allocate `count` IDs on each of `threads` threads, returning each thread's sequence"""
+    def run(_: int) -> List[str]:
+        return [new_id("event") for _ in range(count)]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(run, range(threads)))
+
+
+def _allocate_in_child(threads: int, count: int, results: multiprocessing.Queue):
+    results.put(allocate(threads, count))
+
+
+def check_ids(processes: int, threads: int, count: int) -> Dict[str, Any]:
+    """Allocate IDs in forked processes at the same time and look for collisions"""
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    # Allocate in the parent first so every child inherits a live allocator state
+    new_id("event")
+    children = [context.Process(target=_allocate_in_child, args=(threads, count, results))
+                for _ in range(processes)]
+    started = time.perf_counter()
+    for child in children:
+        child.start()
+    sequences = [sequence for _ in children for sequence in results.get()]
+    elapsed = time.perf_counter() - started
+    for child in children:
+        child.join()
+
+    ids = [id_ for sequence in sequences for id_ in sequence]
+    unordered = sum(1 for sequence in sequences
+                    for before, after in zip(sequence, sequence[1:]) if after <= before)
+    return {
+        "processes": processes,
+        "threads_per_process": threads,
+        "allocated": len(ids),
+        "duplicates": len(ids) - len(set(ids)),
+        "out_of_order": unordered,
+        "ids_per_s": round(len(ids) / elapsed, 1),
+    }
+
+
+def check_concurrent_saves(threads: int, count: int) -> Dict[str, Any]:
+    """Save events from several threads at once, all within a few seconds"""
+    with tempfile.TemporaryDirectory(prefix="bw-ids-") as base_dir:
+        store = FilesystemStore(base_dir)
+        try:
+            def save(worker: int) -> List[str]:
+                return [store.save_calendar_event({"title": f"Event {worker}-{i}", "date": "2025-06-15"})
+                        for i in range(count)]
+
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                ids = [id_ for saved in pool.map(save, range(threads)) for id_ in saved]
+            stored = len(store.get_calendar_events("2025-06-15", "2025-06-15"))
+        finally:
+            store.index.close()
+    return {"saved": len(ids), "duplicates": len(ids) - len(set(ids)), "stored": stored}
+
+
+# === Bulk import ===
+
+def ics_document(events: int, tasks: int) -> str:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Business Workflow//Import check//EN"]
+    for i in range(events):
+        day = f"2025{1 + i % 12:02d}{1 + i % 28:02d}"
+        lines += ["BEGIN:VEVENT", f"UID:event-{i}@check", f"SUMMARY:Event {i}", f"DTSTART:{day}T090000Z",
+                  f"DTEND:{day}T100000Z", f"DESCRIPTION:Synthetic event {i}\\, imported in bulk", "END:VEVENT"]
+    for i in range(tasks):
+        lines += ["BEGIN:VTODO", f"UID:task-{i}@check", f"SUMMARY:Task {i}",
+                  f"DUE;VALUE=DATE:2025{1 + i % 12:02d}{1 + i % 28:02d}", "STATUS:NEEDS-ACTION", "END:VTODO"]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def check_import(events: int, tasks: int) -> Dict[str, Any]:
+    body = ics_document(events, tasks)
+    with tempfile.TemporaryDirectory(prefix="bw-import-") as base_dir:
+        store = FilesystemStore(base_dir)
+        try:
+            started = time.perf_counter()
+            parsed_events, parsed_tasks = calendar_import.parse(body, calendar_import.detect_format(body))
+            parsed = time.perf_counter()
+            imported = store.import_calendar(parsed_events, parsed_tasks)
+            finished = time.perf_counter()
+        finally:
+            store.index.close()
+
+        # A fresh store reads everything back from the journals
+        store = FilesystemStore(base_dir)
+        try:
+            stored_events = len(store.get_calendar_events("2025-01-01", "2025-12-31"))
+            stored_tasks = len(store.get_tasks())
+        finally:
+            store.index.close()
+
+    ids = imported["events"] + imported["tasks"]
+    return {
+        "events": events,
+        "tasks": tasks,
+        "bytes": len(body.encode("utf-8")),
+        "parse_ms": round((parsed - started) * 1000, 1),
+        "write_ms": round((finished - parsed) * 1000, 1),
+        "records_per_s": round(len(ids) / (finished - started), 1),
+        "duplicates": len(ids) - len(set(ids)),
+        "stored_events": stored_events,
+        "stored_tasks": stored_tasks,
+    }
+
+
+def failures(results: Dict[str, Any], min_rate: float) -> List[str]:
+    ids, saves, imported = results["ids"], results["concurrent_saves"], results["import"]
+    failed = []
+    if ids["duplicates"]:
+        failed.append(f"{ids['duplicates']} duplicate ID(s) across processes")
+    if ids["out_of_order"]:
+        failed.append(f"{ids['out_of_order']} ID(s) not increasing within a thread")
+    if saves["duplicates"] or saves["stored"] != saves["saved"]:
+        failed.append(f"concurrent saves: {saves['saved']} saved, {saves['stored']} stored")
+    if imported["duplicates"]:
+        failed.append(f"{imported['duplicates']} duplicate imported ID(s)")
+    if (imported["stored_events"], imported["stored_tasks"]) != (imported["events"], imported["tasks"]):
+        failed.append(f"import: {imported['stored_events']}/{imported['events']} events and "
+                      f"{imported['stored_tasks']}/{imported['tasks']} tasks readable")
+    if imported["records_per_s"] < min_rate:
+        failed.append(f"import throughput {imported['records_per_s']}/s is below {min_rate}/s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4, help="Forked processes allocating IDs")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per process")
+    parser.add_argument("--ids", type=int, default=20000, help="IDs allocated per thread")
+    parser.add_argument("--saves", type=int, default=250, help="Events saved per thread in the concurrent save check")
+    parser.add_argument("--events", type=int, default=5000, help="Events in the imported document")
+    parser.add_argument("--tasks", type=int, default=1000, help="Tasks in the imported document")
+    parser.add_argument("--min-rate", type=float, default=1000.0, help="Minimum import throughput, records per second")
+    parser.add_argument("--output", type=Path, default=None, help="Also save the results to this file")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "ids": check_ids(args.processes, args.threads, args.ids),
+        "concurrent_saves": check_concurrent_saves(args.threads, args.saves),
+        "import": check_import(args.events, args.tasks),
+    }
+    results["failures"] = failures(results, args.min_rate)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(report + "\n")
+    print(report)
+    if results["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Cumulative chain compaction benchmark
+Compares per-stage prompt size and latency of a chain or dag under each compaction strategy
+
+The model is simulated: a stage takes a fixed time plus a cost per input token, which
+is how prefill time scales with prompt length.
+
+Usage:
+    python benchmarks/compaction.py [--workflow ui_workflow] [--output-tokens 1500]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from runtime.compaction import DEFAULTS, ContextCompactor
+from runtime.dag import dag_steps, stream_dag
+from runtime.registry import WorkflowRegistry
+from runtime.scheduler import estimate_tokens
+from runtime.streaming import stages_for, stream_stages
+
+
+class SimulatedAgent:
+    """Answers every agent with output_tokens of text after base + per_token * input tokens"""
+
+    def __init__(self, base: float, per_token: float, output_tokens: int):
+        self.base = base
+        self.per_token = per_token
+        self.output_tokens = output_tokens
+        self.input_tokens = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return _SimulatedProxy(self, name)
+
+
+class _SimulatedProxy:
+    def __init__(self, model: SimulatedAgent, name: str):
+        self.model = model
+        self.name = name
+
+    async def send(self, message: str) -> str:
+        tokens = estimate_tokens(message)
+        self.model.input_tokens += tokens
+        await asyncio.sleep(self.model.base + self.model.per_token * tokens)
+        if self.name == "context_summarizer":
+            return "Summary: " + "s" * 4 * min(self.model.output_tokens, 300)
+        line = f"Decision: {self.name} output\n"
+        return line + "x" * max(0, 4 * self.model.output_tokens - len(line))
+
+
+async def run_strategy(stages: List[str], strategy: str, args: argparse.Namespace,
+                       steps: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+    model = SimulatedAgent(args.base, args.per_token, args.output_tokens)
+    config = {**DEFAULTS[strategy], "strategy": strategy, "budget": args.budget, "fields": ["decision"]}
+    compactor = ContextCompactor(config, model) if strategy != "full" else None
+
+    per_stage = []
+    started = time.perf_counter()
+    events = (stream_dag(model, steps, args.request, True, compactor) if steps is not None
+              else stream_stages(model, stages, args.request, True, compactor))
+    async for event in events:
+        if event["event"] == "stage_end":
+            per_stage.append({key: event[key] for key in
+                              ("stage", "prompt_tokens", "full_prompt_tokens", "elapsed_ms")})
+    return {
+        "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+        "input_tokens": model.input_tokens,
+        "stages": per_stage,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    registry = WorkflowRegistry()
+    spec = registry.get(args.workflow) or {}
+    steps = dag_steps(spec) if spec.get("kind") == "dag" else None
+    stages, cumulative = (list(steps), True) if steps is not None else stages_for(registry, args.workflow)
+    if not cumulative:
+        raise SystemExit(f"{args.workflow} is not a cumulative chain or a dag")
+    results: Dict[str, Any] = {"workflow": args.workflow, "stages": steps or stages}
+    for strategy in DEFAULTS:
+        results[strategy] = await run_strategy(stages, strategy, args, steps)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workflow", default="ui_workflow", help="Cumulative chain or dag to simulate")
+    parser.add_argument("--request", default="Create a new dashboard page with company color scheme")
+    parser.add_argument("--output-tokens", type=int, default=1500, help="Tokens each stage produces")
+    parser.add_argument("--base", type=float, default=0.05, help="Fixed seconds per model call")
+    parser.add_argument("--per-token", type=float, default=0.00005, help="Seconds per input token")
+    parser.add_argument("--budget", type=int, default=2000, help="Token budget for summarize")
+    print(json.dumps(asyncio.run(main_async(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+DAG workflow benchmark
+Compares the wall-clock time of a dag workflow with the chain it was converted from
+
+The model is simulated: a step takes a fixed time plus a cost per input token. The
+chain runs the dag's steps one after another with cumulative input, as @fast.chain
+would.
+
+Usage:
+    python benchmarks/dag.py [--workflow ui_workflow] [--base 0.5] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from runtime.dag import dag_steps, stream_dag
+from runtime.registry import WorkflowRegistry
+from runtime.scheduler import estimate_tokens
+from runtime.streaming import stream_stages
+
+
+class SimulatedAgent:
+    """Answers every agent with output_tokens of text after base + per_token * input tokens"""
+
+    def __init__(self, base: float, per_token: float, output_tokens: int):
+        self.base = base
+        self.per_token = per_token
+        self.output_tokens = output_tokens
+
+    def __getattr__(self, name: str) -> Any:
+        return _SimulatedProxy(self, name)
+
+
+class _SimulatedProxy:
+    def __init__(self, model: SimulatedAgent, name: str):
+        self.model = model
+        self.name = name
+
+    async def send(self, message: str) -> str:
+        await asyncio.sleep(self.model.base + self.model.per_token * estimate_tokens(message))
+        return f"{self.name}: " + "x" * 4 * self.model.output_tokens
+
+
+async def timed(events: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    stages: List[Dict[str, Any]] = []
+    async for event in events:
+        if event["event"] == "stage_end":
+            stages.append({"stage": event["stage"], "at_ms": round((time.perf_counter() - started) * 1000, 1),
+                           "prompt_tokens": event["prompt_tokens"]})
+    return {"wall_ms": round((time.perf_counter() - started) * 1000, 1), "stages": stages}
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    spec = WorkflowRegistry().get(args.workflow) or {}
+    if spec.get("kind") != "dag":
+        raise SystemExit(f"{args.workflow} is not a dag workflow")
+    steps = dag_steps(spec)
+    model = SimulatedAgent(args.base, args.per_token, args.output_tokens)
+
+    chain, dag = [], []
+    for _ in range(args.runs):
+        chain.append(await timed(stream_stages(model, list(steps), args.request, cumulative=True)))
+        dag.append(await timed(stream_dag(model, steps, args.request, cumulative=True)))
+    chain_ms = statistics.median(run["wall_ms"] for run in chain)
+    dag_ms = statistics.median(run["wall_ms"] for run in dag)
+    return {
+        "workflow": args.workflow,
+        "steps": steps,
+        "chain": {"median_wall_ms": chain_ms, "stages": chain[-1]["stages"]},
+        "dag": {"median_wall_ms": dag_ms, "stages": dag[-1]["stages"]},
+        "reduction": round(1 - dag_ms / chain_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workflow", default="ui_workflow", help="Dag workflow to simulate")
+    parser.add_argument("--request", default="Create a new dashboard page with company color scheme")
+    parser.add_argument("--output-tokens", type=int, default=800, help="Tokens each step produces")
+    parser.add_argument("--base", type=float, default=0.5, help="Fixed seconds per model call")
+    parser.add_argument("--per-token", type=float, default=0.00005, help="Seconds per input token")
+    parser.add_argument("--runs", type=int, default=3, help="Runs of each variant (median reported)")
+    print(json.dumps(asyncio.run(main_async(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Filesystem MCP server latency benchmark
+Measures small tool-call latency while large listings run, blocking vs. thread-pooled handlers
+
+Usage:
+    python benchmarks/filesystem_server.py [--artifacts 20000] [--calls 500] [--listers 2]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from servers.filesystem_server import FilesystemServer
+from storage.filesystem import FilesystemStore
+
+
+def populate(store: FilesystemStore, artifacts: int):
+    """Create a large download catalog and one small business data record"""
+    with store.index.transaction():
+        for i in range(artifacts):
+            store.prepare_download(f"report {i}", f"report_{i}.txt", "report", f"batch_{i % 10}")
+    store.save_business_data({"name": "Benchmark Co"}, "profile")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+    }
+
+
+async def run_scenario(small_call: Callable[[], Any], large_call: Callable[[], Any],
+                       calls: int, listers: int, interval: float) -> Dict[str, Any]:
+    """
+    Issue small calls at a fixed rate while large listings run continuously
+
+    Latency is measured from when each call was due, so time spent waiting for a
+    blocked event loop counts against it.
+    """
+    stop = asyncio.Event()
+    listings = 0
+
+    async def lister():
+        nonlocal listings
+        while not stop.is_set():
+            await large_call()
+            listings += 1
+            await asyncio.sleep(0)  # A blocking call never yields on its own
+
+    async def timed(due: float) -> float:
+        await small_call()
+        return time.perf_counter() - due
+
+    lister_tasks = [asyncio.create_task(lister()) for _ in range(listers)]
+    await asyncio.sleep(interval)  # Let the listings get going
+
+    start = time.perf_counter()
+    pending = []
+    for i in range(calls):
+        due = start + i * interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pending.append(asyncio.create_task(timed(due)))
+    latencies = await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await asyncio.gather(*lister_tasks)
+    return {"small_calls": percentiles(latencies), "large_listings": listings,
+            "elapsed_s": round(elapsed, 3)}
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = FilesystemStore(base_dir)
+        populate(store, args.artifacts)
+        server = FilesystemServer(store, max_workers=args.workers)
+
+        async def blocking(function, *call_args):
+            return function(*call_args)
+
+        results = {"artifacts": args.artifacts, "calls": args.calls, "listers": args.listers}
+        # Before: handlers run on the event loop thread, so small calls wait for listings
+        results["blocking"] = await run_scenario(
+            lambda: blocking(server.get_business_data, "profile"),
+            lambda: blocking(server.list_downloads),
+            args.calls, args.listers, args.interval,
+        )
+        # After: the registered async variants run on the I/O pool
+        results["thread_pool"] = await run_scenario(
+            lambda: server.tools["get_business_data"]("profile"),
+            lambda: server.tools["list_downloads"](),
+            args.calls, args.listers, args.interval,
+        )
+        server.executor.shutdown()
+        store.index.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--artifacts", type=int, default=20000, help="Downloads in the catalog")
+    parser.add_argument("--calls", type=int, default=500, help="Small calls to time")
+    parser.add_argument("--listers", type=int, default=2, help="Concurrent full listings")
+    parser.add_argument("--interval", type=float, default=0.002, help="Seconds between small calls")
+    parser.add_argument("--workers", type=int, default=8, help="I/O thread pool size")
+    print(json.dumps(asyncio.run(main_async(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
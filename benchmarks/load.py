@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test
+Drives the workflow endpoints at a target request rate and reports latency percentiles, throughput and errors
+
+Run the API against the stub model provider (benchmarks/stub_provider.py) so a load test
+costs nothing. Requests are sent open-loop: each is timed from when it was scheduled, so
+a slow server cannot hide its queueing by slowing the driver down.
+
+Results are printed as JSON and, with --output, saved; --baseline compares them with an
+earlier result and exits with status 1 on a regression beyond --tolerance.
+
+Usage:
+    python benchmarks/load.py [--url http://127.0.0.1:8000] [--rps 5] [--duration 60]
+        [--mix onboarding=1,document=2,marketing=2,calendar=2,ui=1] [--output results.json]
+        [--baseline previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# Endpoint -> (path, payload for the i-th request)
+SCENARIOS: Dict[str, Tuple[str, Callable[[int], Dict[str, Any]]]] = {
+    "onboarding": ("/api/onboarding", lambda i: {
+        "business_name": f"Load Test Co {i}", "industry": "Retail",
+        "description": "Independent shop selling handmade home goods online and in store"}),
+    "document": ("/api/document/create", lambda i: {
+        "type": "business_plan", "title": f"Growth plan {i}", "sections": ["summary", "market", "finances"]}),
+    "marketing": ("/api/marketing/campaign", lambda i: {
+        "campaign": f"Spring launch {i}", "channels": ["instagram", "email"], "budget": 5000}),
+    "calendar": ("/api/calendar/list", lambda i: {"range": "week", "offset": i % 4}),
+    "ui": ("/api/ui/component", lambda i: {"component": "pricing_table", "variant": i % 3}),
+}
+
+# Lower is better for these; throughput is better higher
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def parse_mix(setting: str) -> Dict[str, float]:
+    """Parse "document=2,calendar=1" into endpoint weights"""
+    mix = {}
+    for item in setting.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip():
+            if name.strip() not in SCENARIOS:
+                raise SystemExit(f"Unknown endpoint {name.strip()!r}; choose from {', '.join(SCENARIOS)}")
+            mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(sample["latency_ms"] for sample in samples if sample["ok"])
+    errors: Dict[str, int] = {}
+    for sample in samples:
+        if not sample["ok"]:
+            errors[sample["error"]] = errors.get(sample["error"], 0) + 1
+    return {
+        "requests": len(samples),
+        "succeeded": len(latencies),
+        "errors": errors,
+        "error_rate": round(1 - len(latencies) / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        **{name: round(percentile(latencies, q), 1) for name, q in zip(LATENCY_METRICS, (0.50, 0.95, 0.99))},
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+    }
+
+
+def arrival_times(rps: float, duration: float, arrivals: str, rng: random.Random) -> List[float]:
+    """Send offsets in seconds: evenly spaced, or a Poisson process with the same mean rate"""
+    if arrivals == "constant":
+        return [i / rps for i in range(int(rps * duration))]
+    times, at = [], rng.expovariate(rps)
+    while at < duration:
+        times.append(at)
+        at += rng.expovariate(rps)
+    return times
+
+
+async def run_load(client: httpx.AsyncClient, mix: Dict[str, float], rps: float, duration: float,
+                   arrivals: str = "poisson", identical: bool = False, seed: Optional[int] = None,
+                   timeout: float = 300.0) -> Tuple[List[Dict[str, Any]], float]:
+    """Send the requests, returning one sample per request and the elapsed seconds"""
+    rng = random.Random(seed)
+    endpoints, weights = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+    samples: List[Dict[str, Any]] = []
+
+    async def send(index: int, endpoint: str, scheduled: float):
+        path, payload = SCENARIOS[endpoint]
+        sample: Dict[str, Any] = {"endpoint": endpoint, "ok": False}
+        try:
+            response = await client.post(path, json=payload(0 if identical else index), timeout=timeout)
+            sample["ok"] = response.status_code < 400
+            if not sample["ok"]:
+                sample["error"] = f"http_{response.status_code}"
+        except httpx.TimeoutException:
+            sample["error"] = "timeout"
+        except httpx.HTTPError as e:
+            sample["error"] = type(e).__name__
+        sample["latency_ms"] = (loop.time() - scheduled) * 1000
+        samples.append(sample)
+
+    tasks = []
+    started = loop.time()
+    for index, offset in enumerate(arrival_times(rps, duration, arrivals, rng)):
+        delay = started + offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        endpoint = rng.choices(endpoints, weights)[0]
+        tasks.append(asyncio.create_task(send(index, endpoint, started + offset)))
+    await asyncio.gather(*tasks)
+    return samples, loop.time() - started
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """Relative change of each metric against a baseline result, and which changes are regressions"""
+    changes: Dict[str, Dict[str, Any]] = {}
+    regressions: List[str] = []
+    scopes = [("overall", current["overall"], baseline.get("overall") or {})]
+    scopes += [(f"endpoints.{name}", stats, (baseline.get("endpoints") or {}).get(name) or {})
+               for name, stats in current["endpoints"].items()]
+    for scope, now, before in scopes:
+        for metric in LATENCY_METRICS + ("throughput_rps", "error_rate"):
+            if metric not in before:
+                continue
+            change = (now[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+            changes[f"{scope}.{metric}"] = {"baseline": before[metric], "current": now[metric],
+                                            "change": round(change, 4)}
+            worse = {"throughput_rps": change < -tolerance,
+                     "error_rate": now[metric] - before[metric] > 0.01}.get(metric, change > tolerance)
+            if worse and metric != "p50_ms":
+                regressions.append(f"{scope}.{metric}")
+    return {"baseline_commit": baseline.get("commit"), "tolerance": tolerance,
+            "changes": changes, "regressions": regressions}
+
+
+def git_commit() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=PROJECT_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        samples, elapsed = await run_load(client, mix, args.rps, args.duration, args.arrivals,
+                                          args.identical, args.seed, args.timeout)
+        provider = None
+        if args.provider:
+            reply = await client.get(f"{args.provider.rstrip('/')}/stats")
+            provider = reply.json()
+
+    results: Dict[str, Any] = {
+        **git_commit(),
+        "timestamp": time.time(),
+        "settings": {"url": args.url, "rps": args.rps, "duration": args.duration, "arrivals": args.arrivals,
+                     "mix": mix, "identical": args.identical, "seed": args.seed},
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(samples, elapsed),
+        "endpoints": {endpoint: summarize([sample for sample in samples if sample["endpoint"] == endpoint], elapsed)
+                      for endpoint in mix},
+        "provider": provider,
+    }
+    if args.baseline:
+        results["comparison"] = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API base URL")
+    parser.add_argument("--rps", type=float, default=5.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to send requests for")
+    parser.add_argument("--mix", default="onboarding=1,document=2,marketing=2,calendar=2,ui=1",
+                        help="Endpoint weights")
+    parser.add_argument("--arrivals", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--identical", action="store_true",
+                        help="Send the same payload per endpoint (exercises caching and coalescing)")
+    parser.add_argument("--connections", type=int, default=200, help="Maximum open connections")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds before a request counts as failed")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for arrivals and the endpoint mix")
+    parser.add_argument("--provider", default=None, help="Stub provider URL, to include its replay counters")
+    parser.add_argument("--output", type=Path, default=None, help="Also save the results to this file")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative p95/p99/throughput change that counts as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    report = json.dumps(results, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(report + "\n")
+    print(report)
+    if results.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Metrics overhead benchmark
+Measures the cost of recording metrics, alone and on instrumented filesystem tool calls
+
+Usage:
+    python benchmarks/metrics.py [--operations 200000] [--calls 5000]
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from servers.filesystem_server import FilesystemServer
+from storage.filesystem import FilesystemStore
+from telemetry.metrics import Registry
+
+
+def per_operation_ns(operation: Callable[[], Any], operations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(operations):
+        operation()
+    return round((time.perf_counter_ns() - started) / operations, 1)
+
+
+async def per_call_us(calls: Dict[str, Callable[[], Any]], count: int, rounds: int = 7) -> Dict[str, float]:
+    """Median over rounds of the mean microseconds per sequential call, alternating the variants"""
+    means: Dict[str, list] = {name: [] for name in calls}
+    for _ in range(rounds):
+        for name, call in calls.items():
+            started = time.perf_counter()
+            for _ in range(count):
+                await call()
+            means[name].append((time.perf_counter() - started) / count * 1e6)
+    return {name: round(statistics.median(values), 2) for name, values in means.items()}
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram", ["agent", "outcome"])
+    counter = registry.counter("bench_total", "Benchmark counter", ["agent"])
+    results: Dict[str, Any] = {
+        "histogram_observe_ns": per_operation_ns(lambda: histogram.observe(0.042, "agent", "ok"), args.operations),
+        "counter_inc_ns": per_operation_ns(lambda: counter.inc("agent"), args.operations),
+        "perf_counter_ns": per_operation_ns(time.perf_counter, args.operations),
+    }
+
+    for i in range(200):
+        histogram.observe(i / 100, f"agent_{i % 20}", "ok")
+    started = time.perf_counter()
+    registry.render()
+    results["render_ms_20_series"] = round((time.perf_counter() - started) * 1000, 3)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = FilesystemStore(base_dir)
+        store.save_business_data({"name": "Benchmark Co"}, "profile")
+        server = FilesystemServer(store, max_workers=args.workers)
+        loop = asyncio.get_running_loop()
+
+        async def uninstrumented():
+            return await loop.run_in_executor(server.executor, functools.partial(server.get_business_data, "profile"))
+
+        timings = await per_call_us({
+            "uninstrumented": uninstrumented,
+            "instrumented": lambda: server.tools["get_business_data"]("profile"),
+        }, args.calls)
+        server.executor.shutdown()
+        store.index.close()
+
+    timings["overhead_pct"] = round((timings["instrumented"] - timings["uninstrumented"])
+                                    / timings["uninstrumented"] * 100, 2)
+    results["tool_call_us"] = timings
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--operations", type=int, default=200000, help="Metric updates to time")
+    parser.add_argument("--calls", type=int, default=5000, help="Tool calls per round")
+    parser.add_argument("--workers", type=int, default=8, help="I/O thread pool size")
+    print(json.dumps(asyncio.run(main_async(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Rate limit check
+Drives concurrent agent turns through the model-call scheduler against a stub provider that answers 429
+
+The stub model provider (benchmarks/stub_provider.py) runs in-process and rejects
+requests beyond --stub-concurrency in flight plus a random --reject-rate of the rest. The
+scheduler is hooked into the Anthropic SDK the way the agent runtime does it, and each
+of --turns simulated agent turns, at a mix of priorities, sends a messages.create()
+request, runs a tool, then streams a second request. A second stub rejecting
+--pause-reject-rate of requests is then sent --pause-requests requests at once through a
+scheduler limited to one in flight, so every request sent is attributable. The checks are:
+    completed   every turn finishes despite the rejections
+    resent      each rejected request is resent exactly once by the scheduler and
+                nothing else is: no SDK retries on top, no tool call repeated
+    backoff     the adaptive concurrency limit came down after the 429s
+    paused      no request is sent between a 429 and the end of the pause it starts
+
+Results are printed as JSON; the exit status is 1 when any check fails.
+
+Usage:
+    python benchmarks/rate_limits.py [--turns 24] [--stub-concurrency 3] [--reject-rate 0.1]
+        [--reject-status 429] [--pause-requests 12] [--pause-reject-rate 0.5]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import anthropic
+import httpx
+import uvicorn
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import stub_provider  # noqa: E402  (benchmarks/ is on sys.path as the script's directory)
+from runtime.scheduler import ModelCallScheduler, call_agent, call_priority, instrument_anthropic  # noqa: E402
+
+PRIORITIES = ("interactive", "interactive", "batch", "background")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def agent_turn(client: anthropic.AsyncAnthropic, index: int, tools: Dict[str, int]):
+    """One agent turn: a request, the tool call it asks for, then a streamed follow-up"""
+    call_priority.set(PRIORITIES[index % len(PRIORITIES)])
+    call_agent.set(f"agent_{index % 4}")
+    messages = [{"role": "user", "content": f"Plan item {index} of the spring launch"}]
+    first = await client.messages.create(model="stub", max_tokens=64, messages=messages)
+    tools["calls"] += 1
+    messages += [{"role": "assistant", "content": first.content[0].text},
+                 {"role": "user", "content": f"Tool result for item {index}"}]
+    async with client.messages.stream(model="stub", max_tokens=64, messages=messages) as stream:
+        await stream.get_final_message()
+
+
+async def start_stub(args: argparse.Namespace, max_concurrency: int, reject_rate: float,
+                     arrivals: Optional[List[float]] = None) -> Tuple[uvicorn.Server, asyncio.Task, str]:
+    """Serve the stub provider in this process, returning the server, its task and its URL"""
+    port = free_port()
+    stub_args = stub_provider.build_parser().parse_args([
+        "--mode", "synthesize", "--ttft-ms", "40", "--output-tokens", "30", "--tokens-per-second", "600",
+        "--max-concurrency", str(max_concurrency), "--reject-rate", str(reject_rate),
+        "--reject-status", str(args.reject_status), "--retry-after", str(args.retry_after), "--seed", "7",
+    ])
+    app = stub_provider.create_app(stub_args)
+    if arrivals is not None:
+        @app.middleware("http")
+        async def note_arrival(request, call_next):
+            arrivals.append(time.monotonic())
+            return await call_next(request)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, serving, f"http://127.0.0.1:{port}"
+
+
+async def stop_stub(server: uvicorn.Server, serving: asyncio.Task, url: str) -> Dict[str, Any]:
+    """Stop a stub started by start_stub(), returning its /stats"""
+    async with httpx.AsyncClient(base_url=url) as http:
+        stats = (await http.get("/stats")).json()
+    server.should_exit = True
+    await serving
+    return stats
+
+
+async def check_pauses(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Send requests one at a time into a stub that rejects many of them, noting every send
+
+    With one request in flight, nothing may reach the provider from the moment a 429
+    arrives until the pause it starts is over. The stub runs in this process, so its
+    arrival times and the scheduler's pauses share a clock.
+    """
+    sends: List[float] = []
+    server, serving, url = await start_stub(args, 0, args.pause_reject_rate, sends)
+    scheduler = ModelCallScheduler(max_concurrency=1, max_retries=args.max_retries)
+    pauses: List[Tuple[float, float]] = []
+    on_overload = scheduler._on_overload
+
+    def record_pause(error: BaseException):
+        overloaded_at = time.monotonic()
+        on_overload(error)
+        pauses.append((overloaded_at, scheduler._paused_until))
+
+    scheduler._on_overload = record_pause
+    remove = instrument_anthropic(scheduler)
+    client = anthropic.AsyncAnthropic(api_key="stub", base_url=url)
+    try:
+        outcomes = await asyncio.gather(*(
+            client.messages.create(model="stub", max_tokens=16, messages=[{"role": "user", "content": f"Item {i}"}])
+            for i in range(args.pause_requests)), return_exceptions=True)
+    finally:
+        remove()
+        await client.close()
+        stub = await stop_stub(server, serving, url)
+
+    early = [round((sent - start) * 1000, 1) for start, end in pauses for sent in sends if start < sent < end]
+    return {"requests": stub["requests"], "rejected": stub["rejected"], "pauses": len(pauses),
+            "errors": sum(1 for outcome in outcomes if isinstance(outcome, BaseException)),
+            "sent_during_pause_ms": early, "ok": bool(pauses) and not early}
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    server, serving, url = await start_stub(args, args.stub_concurrency, args.reject_rate)
+
+    scheduler = ModelCallScheduler(max_concurrency=args.max_concurrency, max_retries=args.max_retries,
+                                   decrease_cooldown=0.2)
+    remove = instrument_anthropic(scheduler)
+    lowest = {"limit": scheduler.limit}
+
+    async def watch_limit():
+        while True:
+            lowest["limit"] = min(lowest["limit"], scheduler.limit)
+            await asyncio.sleep(0.01)
+
+    watcher = asyncio.create_task(watch_limit())
+    tools = {"calls": 0}
+    client = anthropic.AsyncAnthropic(api_key="stub", base_url=url)
+    started = time.perf_counter()
+    try:
+        outcomes = await asyncio.gather(*(agent_turn(client, i, tools) for i in range(args.turns)),
+                                        return_exceptions=True)
+    finally:
+        elapsed = time.perf_counter() - started
+        watcher.cancel()
+        remove()
+        await client.close()
+        stub = await stop_stub(server, serving, url)
+
+    errors = [f"{type(e).__name__}: {e}" for e in outcomes if isinstance(e, BaseException)]
+    stats = scheduler.stats()
+    sent = 2 * args.turns
+    results: Dict[str, Any] = {
+        "seconds": round(elapsed, 2),
+        "stub": {key: stub[key] for key in ("requests", "rejected", "peak_in_flight")},
+        "scheduler": {key: stats[key] for key in ("calls", "succeeded", "failed", "overloaded", "retries")},
+        "avg_wait_seconds": {name: round(wait, 3) for name, wait in stats["avg_wait_seconds"].items()},
+        "completed": {"turns": args.turns - len(errors), "errors": errors[:5], "ok": not errors},
+        "resent": {"rejected": stub["rejected"], "retries": stats["retries"], "tool_calls": tools["calls"],
+                   "ok": stub["rejected"] > 0 and stats["retries"] == stub["rejected"]
+                   and stub["requests"] == sent + stub["rejected"] and tools["calls"] == args.turns},
+        "backoff": {"max_concurrency": args.max_concurrency, "lowest_limit": round(lowest["limit"], 2),
+                    "ok": lowest["limit"] < args.max_concurrency},
+        "paused": await check_pauses(args),
+    }
+    results["failures"] = [name for name in ("completed", "resent", "backoff", "paused") if not results[name]["ok"]]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=24, help="Concurrent agent turns (two requests each)")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Scheduler concurrency limit")
+    parser.add_argument("--max-retries", type=int, default=8, help="Scheduler retries per request")
+    parser.add_argument("--stub-concurrency", type=int, default=3, help="Requests the stub serves at once")
+    parser.add_argument("--reject-rate", type=float, default=0.1, help="Fraction of other requests the stub rejects")
+    parser.add_argument("--reject-status", type=int, choices=[429, 529], default=429)
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After seconds the stub sends")
+    parser.add_argument("--pause-requests", type=int, default=12, help="Requests sent in the pause check")
+    parser.add_argument("--pause-reject-rate", type=float, default=0.5,
+                        help="Fraction of requests rejected in the pause check")
+    results = asyncio.run(main_async(parser.parse_args()))
+    print(json.dumps(results, indent=2))
+    if results["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
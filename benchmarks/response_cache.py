@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Response cache check
+Shows that repeated agent calls are answered from the cache without calling the model
+
+A counting stub stands in for the model: each agent call sleeps --latency seconds and is
+counted. Agents are wrapped in CachingAgent with their real declarations, and the checks
+are:
+    repeat     the same input (up to whitespace) sent twice to a cache=True agent
+               reaches the model once
+    restart    a new cache on the same file answers it from the disk tier
+    opt_out    a cache=False agent reaches the model every time
+    chains     social_media_workflow and creator_partnership_workflow, which both
+               start with brand_guidelines_keeper, share its first response
+
+Results are printed as JSON; the exit status is 1 when any check fails.
+
+Usage:
+    python benchmarks/response_cache.py [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from runtime.cache import CachingAgent, ResponseCache
+from runtime.registry import WorkflowRegistry
+from runtime.streaming import stages_for, stream_stages
+
+CACHED_AGENT = "brand_guidelines_keeper"
+UNCACHED_AGENT = "task_tracker"
+CHAINS = ("social_media_workflow", "creator_partnership_workflow")
+
+
+class CountingModel:
+    """Answers any agent after `latency` seconds and counts the calls per agent"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        return _CountingProxy(self, name)
+
+
+class _CountingProxy:
+    def __init__(self, model: CountingModel, name: str):
+        self.model = model
+        self.name = name
+
+    async def send(self, message: str) -> str:
+        self.model.calls[self.name] = self.model.calls.get(self.name, 0) + 1
+        await asyncio.sleep(self.model.latency)
+        return f"{self.name} response #{self.model.calls[self.name]} to: {message[:60]}"
+
+
+async def timed_send(agent: Any, name: str, message: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    response = await getattr(agent, name).send(message)
+    return {"response": response, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+async def run_chain(agent: Any, registry: WorkflowRegistry, name: str, message: str):
+    stages, cumulative = stages_for(registry, name)
+    async for _ in stream_stages(agent, stages, message, cumulative):
+        pass
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    registry = WorkflowRegistry()
+    message = "Draft   the brand voice section for the\nspring launch of ACME Corp"
+    results: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory(prefix="bw-cache-") as directory:
+        path = Path(directory) / "responses.db"
+
+        model = CountingModel(args.latency)
+        cache = ResponseCache(path)
+        agent = CachingAgent(model, cache, registry)
+        first = await timed_send(agent, CACHED_AGENT, message)
+        second = await timed_send(agent, CACHED_AGENT, " ".join(message.split()))
+        results["repeat"] = {"model_calls": model.calls.get(CACHED_AGENT, 0), "cold_ms": first["ms"],
+                             "warm_ms": second["ms"], "same_response": first["response"] == second["response"],
+                             "ok": model.calls.get(CACHED_AGENT, 0) == 1 and first["response"] == second["response"]}
+
+        for _ in range(2):
+            await getattr(agent, UNCACHED_AGENT).send(message)
+        results["opt_out"] = {"model_calls": model.calls.get(UNCACHED_AGENT, 0),
+                              "ok": model.calls.get(UNCACHED_AGENT, 0) == 2}
+        cache.close()
+
+        restarted = CountingModel(args.latency)
+        cache = ResponseCache(path)
+        reply = await timed_send(CachingAgent(restarted, cache, registry), CACHED_AGENT, message)
+        results["restart"] = {"model_calls": restarted.calls.get(CACHED_AGENT, 0), "ms": reply["ms"],
+                              "disk_hits": cache.stats()["disk_hits"],
+                              "ok": not restarted.calls and reply["response"] == first["response"]}
+        cache.close()
+
+        chained = CountingModel(args.latency)
+        cache = ResponseCache(Path(directory) / "chains.db")
+        agent = CachingAgent(chained, cache, registry)
+        for chain in CHAINS:
+            await run_chain(agent, registry, chain, "Plan the spring launch for ACME Corp")
+        heads = {chain: stages_for(registry, chain)[0][0] for chain in CHAINS}
+        results["chains"] = {"heads": heads, "model_calls": dict(chained.calls),
+                             "cache": {key: cache.stats()[key] for key in ("hits", "misses", "stores")},
+                             "ok": set(heads.values()) == {CACHED_AGENT} and chained.calls.get(CACHED_AGENT) == 1}
+        cache.close()
+
+    results["failures"] = [name for name, check in results.items() if not check["ok"]]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the stub model takes per call")
+    results = asyncio.run(main_async(parser.parse_args()))
+    print(json.dumps(results, indent=2))
+    if results["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Storage scale benchmark
+Measures FilesystemServer storage operations as the number of stored artifacts grows
+
+Each corpus size gets its own temporary business directory, filled with synthetic
+documents, UI assets (each also offered as a download), calendar events and tasks. For
+every operation the report gives latency percentiles, the files it opened, linked,
+renamed or removed and the directories it listed (counted with an audit hook, so SQLite's
+own I/O is not included), and its peak Python memory (tracemalloc). Write throughput is
+measured with concurrent writers, and reopening the store shows the startup cost.
+
+Results are printed as JSON and, with --output, saved; --baseline compares them with an
+earlier result and exits with status 1 when an operation's p95 latency or peak memory
+grows, or write throughput drops, by more than --tolerance, or it touches more files.
+
+Usage:
+    python benchmarks/storage_scale.py [--sizes 1000,10000,100000,1000000] [--repeats 20]
+        [--writers 1,4,16] [--output results.json] [--baseline previous.json]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Make the project packages importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from servers.filesystem_server import FilesystemServer
+from storage.filesystem import FilesystemStore
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# Share of the corpus per artifact kind
+MIX = {"documents": 0.4, "ui_assets": 0.2, "events": 0.2, "tasks": 0.2}
+DOCUMENT_TYPES = ["business_plan", "report", "proposal", "contract", "memo"]
+ASSET_TYPES = ["css", "js", "svg", "html"]
+STATUSES = ["todo", "in_progress", "done", "blocked"]
+BATCH = 5000
+
+# === File access counting ===
+
+FILE_EVENTS = {"open", "os.link", "os.rename", "os.replace", "os.remove", "os.unlink"}
+DIRECTORY_EVENTS = {"os.listdir", "os.scandir"}
+_io = {"counting": False, "files": 0, "directories": 0}
+
+
+def _audit(event: str, args: Any):
+    if _io["counting"]:
+        if event in FILE_EVENTS:
+            _io["files"] += 1
+        elif event in DIRECTORY_EVENTS:
+            _io["directories"] += 1
+
+
+sys.addaudithook(_audit)
+
+
+def count_io(operation: Callable[[], Any]) -> Dict[str, int]:
+    _io.update(counting=True, files=0, directories=0)
+    try:
+        operation()
+    finally:
+        _io["counting"] = False
+    return {"files_touched": _io["files"], "directories_listed": _io["directories"]}
+
+
+def peak_memory_kb(operation: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        operation()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50_ms": round(pick(0.50) * 1000, 3), "p95_ms": round(pick(0.95) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+# === Corpus ===
+
+def day(i: int) -> str:
+    return f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}"
+
+
+def populate(store: FilesystemStore, size: int) -> Dict[str, int]:
+    """Create `size` artifacts in the proportions of MIX"""
+    counts = {kind: int(size * share) for kind, share in MIX.items()}
+    for start in range(0, counts["documents"], BATCH):
+        with store.index.transaction():
+            for i in range(start, min(start + BATCH, counts["documents"])):
+                store.save_document(f"# Document {i}\n\nSynthetic content for document {i}.\n",
+                                    f"document_{i}.md", DOCUMENT_TYPES[i % len(DOCUMENT_TYPES)],
+                                    {"title": f"Document {i}"} if i % 10 == 0 else None)
+    for start in range(0, counts["ui_assets"], BATCH):
+        with store.index.transaction():
+            for i in range(start, min(start + BATCH, counts["ui_assets"])):
+                store.save_ui_asset(f".component-{i} {{ color: #{i % 0xffffff:06x}; }}\n",
+                                    f"asset_{i}.css", ASSET_TYPES[i % len(ASSET_TYPES)])
+    for start in range(0, max(counts["events"], counts["tasks"]), BATCH):
+        events = [{"title": f"Event {i}", "date": day(i), "type": "meeting"}
+                  for i in range(start, min(start + BATCH, counts["events"]))]
+        tasks = [{"title": f"Task {i}", "status": STATUSES[i % len(STATUSES)], "due_date": day(i),
+                  "assignee": f"person_{i % 50}"}
+                 for i in range(start, min(start + BATCH, counts["tasks"]))]
+        store.import_calendar(events, tasks)
+    return counts
+
+
+# === Measurements ===
+
+def operations(server: FilesystemServer) -> Dict[str, Callable[[], Any]]:
+    """The storage operations to time, as the MCP tools call them"""
+    written = iter(range(10 ** 9))
+    return {
+        "save_document": lambda: server.save_document("# New document\n\nBenchmark content.\n",
+                                                      f"new_{next(written)}.md", "report"),
+        "list_documents": lambda: server.list_documents(),
+        "list_documents_page": lambda: server.list_documents("report", sort="created_at", descending=True,
+                                                             limit=50),
+        "get_calendar_events": lambda: server.get_calendar_events("2025-03-01", "2025-03-07"),
+        "get_tasks": lambda: server.get_tasks(status="todo", assignee="person_8", limit=50),
+        "list_downloads": lambda: server.list_downloads(),
+        "list_downloads_page": lambda: server.list_downloads("document", descending=True, limit=50),
+        "list_ui_assets": lambda: server.list_ui_assets(),
+        "list_ui_assets_page": lambda: server.list_ui_assets("css", limit=50),
+    }
+
+
+def measure(operation: Callable[[], Any], repeats: int, budget: float) -> Dict[str, Any]:
+    """Time an operation up to `repeats` times (at least three, within `budget` seconds)"""
+    operation()  # Warm up caches
+    samples: List[float] = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeats and (len(samples) < 3 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - started)
+    return {**percentiles(samples), "runs": len(samples), **count_io(operation),
+            "peak_memory_kb": peak_memory_kb(operation)}
+
+
+def write_throughput(server: FilesystemServer, writers: int, writes: int) -> Dict[str, float]:
+    """Documents and tasks saved per second with `writers` threads each saving `writes` of each"""
+    def save_documents(worker: int):
+        for i in range(writes):
+            server.save_document(f"Concurrent content {worker}-{i}\n", f"w{writers}_{worker}_{i}.md", "memo")
+
+    def save_tasks(worker: int):
+        for i in range(writes):
+            server.save_task({"title": f"Task {worker}-{i}", "status": "todo", "due_date": day(i)})
+
+    results = {}
+    for name, work in (("documents_per_s", save_documents), ("tasks_per_s", save_tasks)):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            list(pool.map(work, range(writers)))
+        results[name] = round(writers * writes / (time.perf_counter() - started), 1)
+    return results
+
+
+def run_size(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix=f"bw-scale-{size}-", dir=args.dir) as base_dir:
+        store = FilesystemStore(base_dir)
+        started = time.perf_counter()
+        counts = populate(store, size)
+        populate_s = time.perf_counter() - started
+        store.index.close()
+
+        # Reopening replays the calendar journals and opens the index, as a restart would
+        started = time.perf_counter()
+        store = FilesystemStore(base_dir)
+        open_s = time.perf_counter() - started
+        server = FilesystemServer(store, max_workers=1)
+        try:
+            results = {
+                "artifacts": counts,
+                "populate_s": round(populate_s, 2),
+                "open_s": round(open_s, 3),
+                "operations": {name: measure(operation, args.repeats, args.budget)
+                               for name, operation in operations(server).items()},
+                "writes": {str(writers): write_throughput(server, writers, args.writes)
+                           for writers in args.writers},
+            }
+        finally:
+            server.executor.shutdown()
+            store.index.close()
+    print(f"{size} artifacts done", file=sys.stderr)
+    return results
+
+
+# === Regression check ===
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """Changes against a baseline result, for every size and operation both contain"""
+    regressions: List[str] = []
+    for size, now in current["sizes"].items():
+        before = (baseline.get("sizes") or {}).get(size)
+        if not before:
+            continue
+        for name, stats in now["operations"].items():
+            old = before["operations"].get(name)
+            if not old:
+                continue
+            for metric in ("p95_ms", "peak_memory_kb"):
+                if old[metric] and (stats[metric] - old[metric]) / old[metric] > tolerance:
+                    regressions.append(f"{size}.{name}.{metric}: {old[metric]} -> {stats[metric]}")
+            for metric in ("files_touched", "directories_listed"):
+                if stats[metric] > old[metric]:
+                    regressions.append(f"{size}.{name}.{metric}: {old[metric]} -> {stats[metric]}")
+        for writers, rates in now["writes"].items():
+            for metric, rate in rates.items():
+                old_rate = before["writes"].get(writers, {}).get(metric)
+                if old_rate and (old_rate - rate) / old_rate > tolerance:
+                    regressions.append(f"{size}.writes.{writers}.{metric}: {old_rate} -> {rate}")
+    return {"baseline_commit": baseline.get("commit"), "tolerance": tolerance, "regressions": regressions}
+
+
+def git_commit() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=PROJECT_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Corpus sizes, in artifacts")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per operation")
+    parser.add_argument("--budget", type=float, default=10.0, help="Seconds per operation before fewer runs are kept")
+    parser.add_argument("--writers", default="1,4,16", help="Concurrent writer counts")
+    parser.add_argument("--writes", type=int, default=200, help="Documents and tasks saved per writer")
+    parser.add_argument("--dir", default=None, help="Where to create the corpora (needs space for the largest)")
+    parser.add_argument("--output", type=Path, default=None, help="Also save the results to this file")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative p95, peak memory or throughput change that counts as a regression")
+    args = parser.parse_args()
+    args.writers = [int(writers) for writers in args.writers.split(",")]
+
+    results: Dict[str, Any] = {
+        **git_commit(),
+        "timestamp": time.time(),
+        "settings": {"repeats": args.repeats, "writers": args.writers, "writes": args.writes},
+        "sizes": {size: run_size(int(size), args) for size in args.sizes.split(",")},
+    }
+    if args.baseline:
+        results["comparison"] = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(report + "\n")
+    print(report)
+    if results.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Offline model provider for load tests
+Serves the Anthropic Messages API from recorded responses or synthetic ones with realistic timing
+
+Point fast-agent's Anthropic client at it in fastagent.config.yaml (anthropic.base_url,
+see the commented block there) or with ANTHROPIC_BASE_URL, then start the API as usual.
+
+Modes:
+    record      Forward each request to the real API and append the exchange to the recordings
+    replay      Answer from the recordings, with their recorded timing scaled by --speed;
+                requests that were never recorded are synthesized (or fail with --strict)
+    synthesize  Answer every request with generated text
+
+Synthetic responses wait a time-to-first-token drawn from a lognormal distribution
+(--ttft-ms median, --ttft-sigma), then produce a lognormal number of output tokens
+(--output-tokens median, --output-sigma) at a normally distributed rate
+(--tokens-per-second, --rate-sd).
+
+To exercise rate limiting, the stub can also shed load the way the real API does:
+requests beyond --max-concurrency in flight, and a random --reject-rate fraction of the
+rest, are answered with --reject-status (429 rate limited or 529 overloaded) and a
+Retry-After of --retry-after seconds. /stats counts them as "rejected".
+
+Usage:
+    python benchmarks/stub_provider.py --mode synthesize [--port 8765] [--ttft-ms 600]
+    python benchmarks/stub_provider.py --mode record --recordings .cache/model_recordings.jsonl
+    python benchmarks/stub_provider.py --mode replay --speed 1.0
+    python benchmarks/stub_provider.py --max-concurrency 4 --reject-rate 0.1 [--reject-status 529]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+RECORDINGS_PATH = PROJECT_DIR / ".cache" / "model_recordings.jsonl"
+UPSTREAM_URL = "https://api.anthropic.com"
+
+# Headers passed through to the real API when recording
+FORWARDED_HEADERS = ("x-api-key", "authorization", "anthropic-version", "anthropic-beta")
+
+WORDS = ("the plan covers revenue growth customer segments brand voice market channels budget timeline "
+         "milestones risks owners metrics review launch content partners pricing operations").split()
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Identify a request by what determines its response: model, system prompt, messages and tool names"""
+    material = {
+        "model": body.get("model"),
+        "system": body.get("system"),
+        "messages": body.get("messages"),
+        "tools": sorted(tool.get("name", "") for tool in body.get("tools") or []),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    # Same heuristic as runtime.scheduler.estimate_tokens: about four characters per token
+    return max(1, len(text) // 4)
+
+
+def prompt_tokens(body: Dict[str, Any]) -> int:
+    return estimate_tokens(json.dumps([body.get("system"), body.get("messages"), body.get("tools")]))
+
+
+class Recordings:
+    """
+    Recorded exchanges, appended to a JSONL file and indexed by request key
+
+    Each line holds {"key", "response", "ttft_ms", "total_ms", "recorded_at"}; the
+    latest recording of a key wins.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def add(self, key: str, response: Dict[str, Any], ttft_ms: float, total_ms: float):
+        entry = {"key": key, "response": response, "ttft_ms": ttft_ms, "total_ms": total_ms,
+                 "recorded_at": time.time()}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.entries[key] = entry
+
+
+class LatencyModel:
+    """Draws time to first token, output length and token rate for synthetic responses"""
+
+    def __init__(self, ttft_ms: float = 600.0, ttft_sigma: float = 0.5, output_tokens: int = 300,
+                 output_sigma: float = 0.6, tokens_per_second: float = 60.0, rate_sd: float = 15.0,
+                 seed: Optional[int] = None):
+        self.ttft_ms = ttft_ms
+        self.ttft_sigma = ttft_sigma
+        self.output_tokens = output_tokens
+        self.output_sigma = output_sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_sd = rate_sd
+        self._random = random.Random(seed)
+
+    def sample(self, max_tokens: int) -> Dict[str, float]:
+        tokens = int(self._random.lognormvariate(0.0, self.output_sigma) * self.output_tokens)
+        rate = max(5.0, self._random.gauss(self.tokens_per_second, self.rate_sd))
+        return {
+            "ttft_ms": self._random.lognormvariate(0.0, self.ttft_sigma) * self.ttft_ms,
+            "output_tokens": max(1, min(tokens, max_tokens)),
+            "tokens_per_second": rate,
+        }
+
+    def text(self, tokens: int) -> str:
+        words, chars = [], 0
+        while chars < tokens * 4:
+            word = self._random.choice(WORDS)
+            words.append(word)
+            chars += len(word) + 1
+        return " ".join(words)
+
+
+def message(model: str, content: List[Dict[str, Any]], input_tokens: int, output_tokens: int,
+            stop_reason: str = "end_turn") -> Dict[str, Any]:
+    return {
+        "id": f"msg_stub_{random.getrandbits(64):016x}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    }
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps({'type': event, **data})}\n\n"
+
+
+async def stream_message(response: Dict[str, Any], ttft: float, per_chunk: float,
+                         chunk_chars: int = 16) -> AsyncIterator[str]:
+    """Replay a complete message as Messages API stream events, paced like a real model"""
+    start = {**response, "content": [], "stop_reason": None,
+             "usage": {**response["usage"], "output_tokens": 1}}
+    yield _sse("message_start", {"message": start})
+    await asyncio.sleep(ttft)
+    for index, block in enumerate(response["content"]):
+        if block["type"] == "tool_use":
+            yield _sse("content_block_start", {"index": index, "content_block": {**block, "input": {}}})
+            yield _sse("content_block_delta", {"index": index, "delta": {
+                "type": "input_json_delta", "partial_json": json.dumps(block["input"])}})
+        else:
+            yield _sse("content_block_start", {"index": index, "content_block": {"type": "text", "text": ""}})
+            text = block.get("text", "")
+            for offset in range(0, len(text), chunk_chars):
+                yield _sse("content_block_delta", {"index": index, "delta": {
+                    "type": "text_delta", "text": text[offset:offset + chunk_chars]}})
+                await asyncio.sleep(per_chunk)
+        yield _sse("content_block_stop", {"index": index})
+    yield _sse("message_delta", {"delta": {"stop_reason": response["stop_reason"], "stop_sequence": None},
+                                 "usage": {"output_tokens": response["usage"]["output_tokens"]}})
+    yield _sse("message_stop", {})
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Stub model provider")
+    recordings = Recordings(args.recordings)
+    latency = LatencyModel(args.ttft_ms, args.ttft_sigma, args.output_tokens, args.output_sigma,
+                           args.tokens_per_second, args.rate_sd, args.seed)
+    counters = {"requests": 0, "replayed": 0, "recorded": 0, "synthesized": 0, "misses": 0, "rejected": 0,
+                "in_flight": 0, "peak_in_flight": 0}
+    rejections = random.Random(args.seed)
+    upstream = httpx.AsyncClient(base_url=args.upstream, timeout=600.0)
+
+    def synthesize(body: Dict[str, Any]) -> Dict[str, Any]:
+        timing = latency.sample(int(body.get("max_tokens") or 4096))
+        response = message(body.get("model", "stub"), [{"type": "text", "text": latency.text(timing["output_tokens"])}],
+                           prompt_tokens(body), timing["output_tokens"])
+        total_ms = timing["ttft_ms"] + timing["output_tokens"] / timing["tokens_per_second"] * 1000
+        return {"response": response, "ttft_ms": timing["ttft_ms"], "total_ms": total_ms}
+
+    async def record(body: Dict[str, Any], request: Request, key: str) -> Dict[str, Any]:
+        headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+        started = time.perf_counter()
+        reply = await upstream.post("/v1/messages", json={**body, "stream": False}, headers=headers)
+        total_ms = (time.perf_counter() - started) * 1000
+        if reply.status_code != 200:
+            raise HTTPException(status_code=reply.status_code, detail=reply.text)
+        response = reply.json()
+        # Not streamed upstream, so the first token's time is estimated from the output length
+        rate = args.tokens_per_second / 1000
+        ttft_ms = max(0.0, total_ms - response["usage"]["output_tokens"] / rate)
+        recordings.add(key, response, ttft_ms, total_ms)
+        counters["recorded"] += 1
+        return {"response": response, "ttft_ms": ttft_ms, "total_ms": total_ms}
+
+    def shed() -> Optional[JSONResponse]:
+        """The error response for a request the stub refuses, or None to serve it"""
+        if args.max_concurrency and counters["in_flight"] >= args.max_concurrency:
+            reason = f"More than {args.max_concurrency} concurrent requests"
+        elif args.reject_rate and rejections.random() < args.reject_rate:
+            reason = "Rate limit exceeded"
+        else:
+            return None
+        counters["rejected"] += 1
+        error = "overloaded_error" if args.reject_status == 529 else "rate_limit_error"
+        return JSONResponse({"type": "error", "error": {"type": error, "message": reason}},
+                            status_code=args.reject_status, headers={"retry-after": str(args.retry_after)})
+
+    async def finished(events: AsyncIterator[str]) -> AsyncIterator[str]:
+        try:
+            async for event in events:
+                yield event
+        finally:
+            counters["in_flight"] -= 1
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        key = request_key(body)
+        counters["requests"] += 1
+        rejected = shed()
+        if rejected is not None:
+            return rejected
+        counters["in_flight"] += 1
+        counters["peak_in_flight"] = max(counters["peak_in_flight"], counters["in_flight"])
+        try:
+            response = await serve(body, request, key)
+        except BaseException:
+            counters["in_flight"] -= 1
+            raise
+        if not isinstance(response, StreamingResponse):
+            counters["in_flight"] -= 1  # Streams count down when their last event is sent
+        return response
+
+    async def serve(body: Dict[str, Any], request: Request, key: str):
+        if args.mode == "record":
+            exchange = await record(body, request, key)
+            speed = 0.0  # The client already waited for the real API
+        else:
+            exchange = recordings.get(key) if args.mode == "replay" else None
+            speed = args.speed
+            if exchange is not None:
+                counters["replayed"] += 1
+            elif args.mode == "replay" and args.strict:
+                counters["misses"] += 1
+                raise HTTPException(status_code=404, detail=f"No recording for request {key[:12]}")
+            else:
+                counters["misses" if args.mode == "replay" else "synthesized"] += 1
+                exchange = synthesize(body)
+
+        response = exchange["response"]
+        ttft = exchange["ttft_ms"] / 1000 * speed
+        generation = max(0.0, exchange["total_ms"] - exchange["ttft_ms"]) / 1000 * speed
+        if body.get("stream"):
+            chars = sum(len(block.get("text", "")) for block in response["content"]) or 1
+            per_chunk = generation / max(1, chars / 16)
+            return StreamingResponse(finished(stream_message(response, ttft, per_chunk)),
+                                     media_type="text/event-stream")
+        await asyncio.sleep(ttft + generation)
+        return JSONResponse(response)
+
+    @app.get("/stats")
+    async def stats():
+        return {"mode": args.mode, "recordings": len(recordings.entries), **counters}
+
+    @app.on_event("shutdown")
+    async def close_upstream():
+        await upstream.aclose()
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["record", "replay", "synthesize"], default="synthesize")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recordings", type=Path, default=RECORDINGS_PATH, help="JSONL file of recorded exchanges")
+    parser.add_argument("--upstream", default=UPSTREAM_URL, help="Real API to record from")
+    parser.add_argument("--strict", action="store_true", help="Fail requests that were never recorded (replay)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Latency multiplier; 0 answers at once")
+    parser.add_argument("--ttft-ms", type=float, default=600.0, help="Median time to first token")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="Lognormal sigma of time to first token")
+    parser.add_argument("--output-tokens", type=int, default=300, help="Median output tokens")
+    parser.add_argument("--output-sigma", type=float, default=0.6, help="Lognormal sigma of output tokens")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Mean generation rate")
+    parser.add_argument("--rate-sd", type=float, default=15.0, help="Standard deviation of the generation rate")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible synthetic responses")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="Reject requests beyond this many in flight (0 for no limit)")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of requests rejected at random")
+    parser.add_argument("--reject-status", type=int, choices=[429, 529], default=429,
+                        help="Status of rejections: 429 rate limited or 529 overloaded")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with rejections")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    print(f"Stub model provider ({args.mode}) on http://{args.host}:{args.port}", file=sys.stderr)
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
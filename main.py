@@ -1,11 +1,15 @@
 import asyncio
+import contextlib
+import json
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-import fast_agent as fast
-from fastapi import FastAPI, HTTPException, Response
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
@@ -16,13 +20,77 @@ from workflows.ui_management import ui_workflow
 from workflows.calendar_management import calendar_workflow
 from workflows.marketing_management import marketing_router
 
+from runtime import (AgentRuntime, ModelCallScheduler, ResponseCache, RuntimeUnavailable, ServerManager,
+                     WorkflowRouter)
+from runtime.batch import MAX_BATCH_ITEMS, run_batch
+from runtime.cache import CACHE_PATH
+from runtime.coalescing import SingleFlight, parse_endpoints
+from runtime.idempotency import (EXECUTED, IDEMPOTENCY_PATH, MAX_KEY_LENGTH, IdempotencyConflict,
+                                 IdempotencyStore)
+from runtime.jobs import JobNotFound, JobQueue, JobWorkerPool
+from runtime.routing import ROUTING_PATH
+from runtime.scheduler import call_priority
+from runtime.streaming import sse_format
+from storage import FilesystemStore, InvalidPathError, calendar_import
+from storage.ids import new_id
+from telemetry import REGISTRY, TraceStore, load_snapshots
+from telemetry.tracing import TRACE_PATH
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Shared agent runtime, started once and reused by every request
+runtime = AgentRuntime(
+    max_concurrent_runs=int(os.environ.get("BUSINESS_WORKFLOW_MAX_CONCURRENT_RUNS", "4")),
+    max_batch_runs=int(os.environ.get("BUSINESS_WORKFLOW_MAX_BATCH_RUNS", "8")),
+    max_background_runs=int(os.environ.get("BUSINESS_WORKFLOW_MAX_BACKGROUND_RUNS", "4")),
+    scheduler=ModelCallScheduler(
+        requests_per_minute=float(os.environ.get("BUSINESS_WORKFLOW_MODEL_RPM", "0")) or None,
+        tokens_per_minute=float(os.environ.get("BUSINESS_WORKFLOW_MODEL_TPM", "0")) or None,
+        max_concurrency=int(os.environ.get("BUSINESS_WORKFLOW_MAX_CONCURRENT_CALLS", "8")),
+    ),
+    health_interval=float(os.environ.get("BUSINESS_WORKFLOW_HEALTH_INTERVAL", "30")),
+    shutdown_timeout=float(os.environ.get("BUSINESS_WORKFLOW_SHUTDOWN_TIMEOUT", "30")),
+    server_manager=ServerManager(
+        idle_timeout=float(os.environ.get("BUSINESS_WORKFLOW_MCP_IDLE_TIMEOUT", "300")),
+        startup_timeout=float(os.environ.get("BUSINESS_WORKFLOW_STARTUP_TIMEOUT", "60")),
+    ),
+    response_cache=ResponseCache(
+        path=Path(os.environ.get("BUSINESS_WORKFLOW_CACHE_PATH", str(CACHE_PATH))),
+        memory_entries=int(os.environ.get("BUSINESS_WORKFLOW_CACHE_MEMORY_ENTRIES", "512")),
+        ttl=float(os.environ.get("BUSINESS_WORKFLOW_CACHE_TTL", str(24 * 3600))),
+        max_bytes=int(os.environ.get("BUSINESS_WORKFLOW_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    ) if os.environ.get("BUSINESS_WORKFLOW_CACHE", "1") != "0" else None,
+    cache_by_default=os.environ.get("BUSINESS_WORKFLOW_CACHE_BY_DEFAULT", "0") == "1",
+    router=WorkflowRouter(
+        path=Path(os.environ.get("BUSINESS_WORKFLOW_ROUTING_PATH", str(ROUTING_PATH))),
+        confidence=float(os.environ.get("BUSINESS_WORKFLOW_ROUTER_CONFIDENCE", "0.85")),
+        excerpt_chars=int(os.environ.get("BUSINESS_WORKFLOW_ROUTING_EXCERPT_CHARS", "500")),
+        max_rows=int(os.environ.get("BUSINESS_WORKFLOW_ROUTING_MAX_ROWS", "100000")),
+        max_age=float(os.environ.get("BUSINESS_WORKFLOW_ROUTING_MAX_AGE", str(30 * 24 * 3600))),
+    ) if os.environ.get("BUSINESS_WORKFLOW_LOCAL_ROUTING", "1") != "0" else None,
+    traces=TraceStore(
+        path=Path(os.environ.get("BUSINESS_WORKFLOW_TRACE_PATH", str(TRACE_PATH))),
+        max_runs=int(os.environ.get("BUSINESS_WORKFLOW_TRACE_MAX_RUNS", "10000")),
+        max_age=float(os.environ.get("BUSINESS_WORKFLOW_TRACE_MAX_AGE", str(7 * 24 * 3600))),
+    ) if os.environ.get("BUSINESS_WORKFLOW_TRACING", "1") != "0" else None,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the agent runtime on startup and shut it down gracefully on exit"""
+    await runtime.start()
+    await job_workers.start()
+    try:
+        yield
+    finally:
+        await job_workers.stop()
+        await runtime.stop()
+
 # Initialize FastAPI app
-app = FastAPI(title="Business Workflow System")
+app = FastAPI(title="Business Workflow System", lifespan=lifespan)
 
 # Add CORS middleware to allow requests from the frontend
 app.add_middleware(
@@ -49,81 +117,384 @@ else:
 DATA_DIR = BASE_DIR / "data"
 DOWNLOADS_DIR = DATA_DIR / "downloads"
 
+# In-process filesystem storage for routes that only need local disk access
+filesystem = FilesystemStore(BASE_DIR)
+
+# Background jobs for long-running workflows, e.g. "onboarding_workflow=1,premium_document_workflow=2"
+job_workers = JobWorkerPool(
+    JobQueue(DATA_DIR / "jobs.db",
+             retry_backoff=float(os.environ.get("BUSINESS_WORKFLOW_JOB_RETRY_BACKOFF", "5")),
+             retention=float(os.environ.get("BUSINESS_WORKFLOW_JOB_RETENTION", str(7 * 24 * 3600)))),
+    runtime,
+    workers=int(os.environ.get("BUSINESS_WORKFLOW_JOB_WORKERS", str(runtime.run_limits["background"]))),
+    concurrency={
+        name.strip(): int(limit)
+        for name, _, limit in (item.partition("=") for item in
+                               os.environ.get("BUSINESS_WORKFLOW_JOB_CONCURRENCY", "").split(","))
+        if name.strip() and limit
+    },
+)
+
+# Read-only requests that share one execution when identical ones arrive together,
+# e.g. "calendar=list|upcoming,downloads=*"; workflow actions that change data must not be listed
+flights = SingleFlight(parse_endpoints(os.environ.get(
+    "BUSINESS_WORKFLOW_COALESCE", "calendar=list|view|upcoming|summary|status,downloads=*")))
+
+# Results of requests sent with an Idempotency-Key, so a retried POST does not run its workflow twice
+idempotency = IdempotencyStore(
+    path=Path(os.environ.get("BUSINESS_WORKFLOW_IDEMPOTENCY_PATH", str(IDEMPOTENCY_PATH))),
+    ttl=float(os.environ.get("BUSINESS_WORKFLOW_IDEMPOTENCY_TTL", str(24 * 3600))),
+    max_bytes=int(os.environ.get("BUSINESS_WORKFLOW_IDEMPOTENCY_MAX_BYTES", str(64 * 1024 * 1024))),
+) if os.environ.get("BUSINESS_WORKFLOW_IDEMPOTENCY", "1") != "0" else None
+
+def stream_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Send workflow events as server-sent events; a client disconnect cancels the run"""
+    async def body():
+        try:
+            async for event in events:
+                yield sse_format(event)
+        except RuntimeUnavailable as e:
+            yield sse_format({"event": "error", "status_code": 503, "detail": str(e)})
+        except Exception as e:
+            logger.error(f"Error in streamed workflow: {e}")
+            yield sse_format({"event": "error", "status_code": 500, "detail": str(e)})
+        finally:
+            await events.aclose()
+
+    # Disable proxy buffering so each event reaches the client as soon as it is sent
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/")
 async def root():
     """Redirect to the UI frontend"""
     return {"message": "API is running. Access the UI at /ui"}
 
+# Workflow run by each endpoint family, for batch requests
+ENDPOINT_WORKFLOWS = {
+    "onboarding": "onboarding_workflow",
+    "document": "document_workflow",
+    "ui": "ui_workflow",
+    "calendar": "calendar_workflow",
+    "marketing": "marketing_router",
+}
+
+def batch_message(workflow: str, item: Any) -> Any:
+    """Build a workflow message from a batch item the way the single-item endpoint would"""
+    if not isinstance(item, dict):
+        return item
+    if workflow == "onboarding":
+        return item.get("data", item)
+    if "action" in item:
+        return f"{item['action']}: {item.get('data', {})}"
+    return item.get("message", item)
+
+# Declared before the per-workflow routes so "batch" is not taken for an action
+@app.post("/api/{workflow}/batch")
+async def run_batch_endpoint(workflow: str, data: dict):
+    """
+    Run many payloads through a workflow concurrently, streaming results as NDJSON
+
+    Body: {"items": [{"action": ..., "data": {...}} or {"message": ...}, ...], "concurrency": n}.
+    workflow is an endpoint family (document, marketing, ...) or any registered workflow name.
+    concurrency is capped by the runtime's batch run slots; the summary reports both.
+    Each line reports one item by index, in completion order; a final line summarizes the batch.
+    """
+    name = ENDPOINT_WORKFLOWS.get(workflow, workflow)
+    if name not in runtime.registry:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow: {workflow}")
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Expected a non-empty 'items' list")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+    setting = data.get("concurrency")
+    if setting is None:
+        setting = os.environ.get("BUSINESS_WORKFLOW_BATCH_CONCURRENCY", runtime.run_limits["batch"])
+    try:
+        requested = int(setting) if not isinstance(setting, (bool, float)) else 0
+    except (TypeError, ValueError):
+        requested = 0
+    if requested < 1:
+        raise HTTPException(status_code=422, detail="'concurrency' must be a positive integer")
+    # Every batch item also needs one of the batch run slots all batches share
+    concurrency = min(requested, runtime.run_limits["batch"])
+
+    async def body():
+        # Batch items queue behind interactive requests for model calls
+        call_priority.set("batch")
+        started = time.perf_counter()
+        results = run_batch(lambda message: runtime.run_workflow(name, message),
+                            [batch_message(workflow, item) for item in items], concurrency)
+        succeeded = failed = 0
+        try:
+            async for item in results:
+                succeeded += item["status"] == "ok"
+                failed += item["status"] != "ok"
+                yield json.dumps(item, default=str) + "\n"
+        finally:
+            await results.aclose()
+        yield json.dumps({"summary": {"workflow": name, "items": len(items), "succeeded": succeeded,
+                                      "failed": failed, "concurrency": concurrency,
+                                      "requested_concurrency": requested,
+                                      "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}}) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def run_traced(workflow: str, message: Any) -> Dict[str, Any]:
+    """Run a workflow, returning its result with the run ID its trace is stored under"""
+    run_id = new_id("run")
+    return {"result": await runtime.run_workflow(workflow, message, run_id), "run_id": run_id}
+
+async def idempotent(key: Optional[str], endpoint: str, payload: Any, response: Response,
+                     execute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run execute(), unless an Idempotency-Key names a result that is stored or still running
+
+    A replayed result is marked with an Idempotent-Replayed: true response header.
+    """
+    if not key or idempotency is None:
+        return await execute()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key is longer than {MAX_KEY_LENGTH} characters")
+    try:
+        result, outcome = await idempotency.run(key, endpoint, payload, execute)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if outcome != EXECUTED:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
 # API endpoints for different workflows
 @app.post("/api/onboarding")
-async def run_onboarding(data: dict):
-    """Run the onboarding workflow with provided data"""
+async def run_onboarding(data: dict, response: Response, stream: bool = False,
+                         idempotency_key: Optional[str] = Header(None)):
+    """Run the onboarding workflow with provided data; with ?stream=true, progress is sent as server-sent events"""
+    if stream:
+        return stream_response(runtime.stream_workflow("onboarding_workflow", data))
     try:
-        async with fast.run() as agent:
-            result = await agent.onboarding_workflow(data)
-            return {"result": result}
+        return await idempotent(idempotency_key, "onboarding", data, response,
+                                lambda: run_traced("onboarding_workflow", data))
+    except HTTPException:
+        raise
+    except RuntimeUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in onboarding workflow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/document/{action}")
-async def manage_document(action: str, data: dict):
-    """Run document management workflows"""
+async def manage_document(action: str, data: dict, response: Response, stream: bool = False,
+                          idempotency_key: Optional[str] = Header(None)):
+    """Run document management workflows; with ?stream=true, progress is sent as server-sent events"""
+    message = f"{action}: {data}"
+    if stream:
+        return stream_response(flights.stream("document", action, data,
+                                              lambda: runtime.stream_workflow("document_workflow", message)))
     try:
-        async with fast.run() as agent:
-            result = await agent.document_workflow(f"{action}: {data}")
-            return {"result": result}
+        return await idempotent(idempotency_key, "document", [action, data], response,
+                                lambda: flights.run("document", action, data, lambda: run_traced("document_workflow", message)))
+    except HTTPException:
+        raise
+    except RuntimeUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in document workflow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/ui/{action}")
-async def manage_ui(action: str, data: dict):
-    """Run UI management workflows"""
+async def manage_ui(action: str, data: dict, response: Response, stream: bool = False,
+                    idempotency_key: Optional[str] = Header(None)):
+    """Run UI management workflows; with ?stream=true, progress is sent as server-sent events"""
+    message = f"{action}: {data}"
+    if stream:
+        return stream_response(flights.stream("ui", action, data,
+                                              lambda: runtime.stream_workflow("ui_workflow", message)))
     try:
-        async with fast.run() as agent:
-            result = await agent.ui_workflow(f"{action}: {data}")
-            return {"result": result}
+        return await idempotent(idempotency_key, "ui", [action, data], response,
+                                lambda: flights.run("ui", action, data, lambda: run_traced("ui_workflow", message)))
+    except HTTPException:
+        raise
+    except RuntimeUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in UI workflow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Declared before /api/calendar/{action} so "import" is not taken for a workflow action
+@app.post("/api/calendar/import")
+async def import_calendar(request: Request, format: Optional[str] = None):
+    """Bulk import calendar events and tasks from an ICS or JSONL request body"""
+    body = (await request.body()).decode("utf-8", errors="replace")
+    fmt = format or calendar_import.detect_format(body, request.headers.get("content-type", ""))
+    try:
+        # Parsing and the journal write are blocking, so keep them off the event loop
+        events, tasks = await asyncio.to_thread(calendar_import.parse, body, fmt)
+        ids = await asyncio.to_thread(filesystem.import_calendar, events, tasks)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing calendar data: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"format": fmt, "imported": {"events": len(ids["events"]), "tasks": len(ids["tasks"])},
+            "ids": ids}
+
 @app.post("/api/calendar/{action}")
-async def manage_calendar(action: str, data: dict):
-    """Run calendar management workflows"""
+async def manage_calendar(action: str, data: dict, response: Response, stream: bool = False,
+                          idempotency_key: Optional[str] = Header(None)):
+    """Run calendar management workflows; with ?stream=true, progress is sent as server-sent events"""
+    message = f"{action}: {data}"
+    if stream:
+        return stream_response(flights.stream("calendar", action, data,
+                                              lambda: runtime.stream_workflow("calendar_workflow", message)))
     try:
-        async with fast.run() as agent:
-            result = await agent.calendar_workflow(f"{action}: {data}")
-            return {"result": result}
+        return await idempotent(idempotency_key, "calendar", [action, data], response,
+                                lambda: flights.run("calendar", action, data, lambda: run_traced("calendar_workflow", message)))
+    except HTTPException:
+        raise
+    except RuntimeUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in calendar workflow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/marketing/{action}")
-async def manage_marketing(action: str, data: dict):
-    """Run marketing management workflows"""
+async def manage_marketing(action: str, data: dict, response: Response, stream: bool = False,
+                           idempotency_key: Optional[str] = Header(None)):
+    """Run marketing management workflows; with ?stream=true, progress is sent as server-sent events"""
+    message = f"{action}: {data}"
+    if stream:
+        return stream_response(flights.stream("marketing", action, data,
+                                              lambda: runtime.stream_workflow("marketing_router", message)))
     try:
-        async with fast.run() as agent:
-            result = await agent.marketing_router(f"{action}: {data}")
-            return {"result": result}
+        return await idempotent(idempotency_key, "marketing", [action, data], response,
+                                lambda: flights.run("marketing", action, data, lambda: run_traced("marketing_router", message)))
+    except HTTPException:
+        raise
+    except RuntimeUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in marketing workflow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/api/ws/{workflow}")
+async def stream_workflow_socket(websocket: WebSocket, workflow: str):
+    """
+    Run a workflow over a WebSocket, streaming its progress events
+
+    Each JSON message {"message": ...} starts a run; its events are sent back as JSON,
+    ending with a "result" or "error" event. Sending anything while a run is streaming,
+    or disconnecting, cancels it.
+    """
+    await websocket.accept()
+    if workflow not in runtime.registry:
+        await websocket.close(code=4404, reason=f"Unknown workflow: {workflow}")
+        return
+
+    async def relay(message: Any):
+        events = runtime.stream_workflow(workflow, message)
+        try:
+            async for event in events:
+                await websocket.send_json(event)
+        except RuntimeUnavailable as e:
+            await websocket.send_json({"event": "error", "status_code": 503, "detail": str(e)})
+        except Exception as e:
+            logger.error(f"Error in streamed workflow {workflow}: {e}")
+            await websocket.send_json({"event": "error", "status_code": 500, "detail": str(e)})
+        finally:
+            await events.aclose()
+
+    try:
+        while True:
+            request = await websocket.receive_json()
+            message = request.get("message", request) if isinstance(request, dict) else request
+            run = asyncio.create_task(relay(message))
+            # Watch for a disconnect while the run streams
+            receive = asyncio.create_task(websocket.receive())
+            done, _ = await asyncio.wait({run, receive}, return_when=asyncio.FIRST_COMPLETED)
+            if receive in done:
+                run.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await run
+                if receive.result().get("type") == "websocket.disconnect":
+                    return
+                await websocket.send_json({"event": "cancelled"})
+                continue
+            receive.cancel()
+            run.result()
+    except WebSocketDisconnect:
+        pass
+
+# Job API endpoints
+@app.post("/api/jobs")
+async def submit_job(data: dict):
+    """Queue a workflow run: {"workflow": ..., "message": ..., "priority": 0, "max_attempts": 3}"""
+    workflow = data.get("workflow")
+    if workflow not in runtime.registry:
+        raise HTTPException(status_code=400, detail=f"Unknown workflow: {workflow}")
+    try:
+        return await job_workers.submit(workflow, data.get("message", ""),
+                                        int(data.get("priority", 0)), int(data.get("max_attempts", 3)))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/jobs")
+async def list_jobs(status: str = None, workflow: str = None, limit: int = 100, offset: int = 0):
+    """List jobs, newest first"""
+    return {"jobs": await asyncio.to_thread(job_workers.queue.list, status, workflow, limit, offset)}
+
+@app.get("/api/jobs/metrics")
+async def job_metrics():
+    """Report queue depth, wait time and run time per workflow"""
+    return await job_workers.stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get a job's status"""
+    try:
+        job = await asyncio.to_thread(job_workers.queue.get, job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    job.pop("result", None)
+    return job
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Get a finished job's result; 409 while it is still queued or running"""
+    try:
+        job = await asyncio.to_thread(job_workers.queue.get, job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] == "succeeded":
+        return {"id": job_id, "result": job.get("result")}
+    if job["status"] in ("failed", "cancelled"):
+        return JSONResponse(status_code=422, content={"id": job_id, "status": job["status"],
+                                                      "error": job["error"]})
+    return JSONResponse(status_code=409, content={"id": job_id, "status": job["status"]})
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    try:
+        return await job_workers.cancel(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
 # Download API endpoints
 @app.get("/api/download/{content_type}/{subtype}/{filename}")
 async def download_file(content_type: str, subtype: str, filename: str):
     """Download a file from the filesystem"""
     try:
-        # Get the file path from the filesystem server
-        async with fast.run() as agent:
-            result = await agent.filesystem.get_download_path(content_type, subtype, filename)
+        # Resolve the file path in-process; no agent or MCP round trip needed
+        try:
+            file_path = filesystem.get_download_path(content_type, subtype, filename)
+        except InvalidPathError as e:
+            raise HTTPException(status_code=400, detail=str(e))
             
-        if "not found" in result:
+        if file_path is None:
             raise HTTPException(status_code=404, detail=f"File {filename} not found")
         
-        file_path = result
-        
         # Determine content type for the response
         if filename.endswith('.pdf'):
             media_type = 'application/pdf'
@@ -156,17 +527,97 @@ async def download_file(content_type: str, subtype: str, filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/downloads")
-async def list_downloads(content_type: str = None, subtype: str = None):
-    """List available downloads"""
+async def list_downloads(content_type: str = None, subtype: str = None,
+                         created_after: str = None, created_before: str = None,
+                         sort: str = "created_at", descending: bool = False,
+                         limit: int = None, offset: int = 0):
+    """List available downloads from the metadata index"""
+    query = [content_type, subtype, created_after, created_before, sort, descending, limit, offset]
     try:
-        async with fast.run() as agent:
-            result = await agent.filesystem.list_downloads(content_type, subtype)
-            
+        # The index query blocks, so it runs on a worker thread
+        result = await flights.run("downloads", "list", query,
+                                   lambda: asyncio.to_thread(filesystem.list_downloads, *query))
         return {"downloads": result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing downloads: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this process and the MCP servers that publish snapshots"""
+    snapshots = await asyncio.to_thread(load_snapshots, DATA_DIR / "metrics")
+    return PlainTextResponse(REGISTRY.render(snapshots), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/runs")
+async def list_runs(slowest: Optional[int] = None, workflow: Optional[str] = None,
+                    since: Optional[float] = None, limit: int = 50):
+    """List recent workflow runs, or with ?slowest=N the N slowest and their longest span"""
+    if runtime.traces is None:
+        return {"enabled": False}
+    runs = await asyncio.to_thread(runtime.traces.runs, slowest, workflow, since, limit)
+    return {"enabled": True, "runs": runs}
+
+@app.get("/api/runs/{run_id}/trace")
+async def get_run_trace(run_id: str):
+    """Get a run's span tree: router, stages, agent calls and the MCP tool calls made during them"""
+    if runtime.traces is None:
+        raise HTTPException(status_code=404, detail="Run tracing is disabled")
+    trace = await asyncio.to_thread(runtime.traces.trace, run_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return trace
+
+@app.get("/api/health")
+async def health():
+    """Report agent runtime and MCP server health"""
+    status = await runtime.health()
+    if status["status"] != "ok":
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+@app.get("/api/servers")
+async def server_stats():
+    """Report live applications and MCP servers, cold starts, evictions and each workflow's servers"""
+    return runtime.server_manager.stats()
+
+@app.get("/api/cache")
+async def cache_stats():
+    """Report LLM response cache hits and misses, overall and per agent"""
+    if runtime.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(runtime.response_cache.stats)}
+
+@app.get("/api/routing")
+async def routing_stats(since: Optional[float] = None):
+    """Report router decisions by rule, classifier and LLM fallback, with the fallback rate"""
+    if runtime.router is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(runtime.router.stats, since)}
+
+@app.get("/api/evaluations")
+async def evaluation_stats():
+    """Report evaluator-optimizer rounds and model calls per run, and why loops stopped"""
+    return runtime.evaluations.stats()
+
+@app.get("/api/idempotency")
+async def idempotency_stats():
+    """Report idempotency-key replays (stored and in-flight), conflicts and result store size"""
+    if idempotency is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(idempotency.stats)}
+
+@app.get("/api/coalescing")
+async def coalescing_stats():
+    """Report how many executions identical concurrent requests shared, per endpoint"""
+    return flights.stats()
+
+@app.get("/api/model-calls")
+async def model_call_stats():
+    """Report model-call scheduling: concurrency limit, queue per priority class and 429s"""
+    return runtime.scheduler.stats()
+
 @app.get("/api/config")
 async def get_config():
     """Get application configuration"""
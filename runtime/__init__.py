@@ -0,0 +1,10 @@
+# Runtime package initialization
+# Shared infrastructure for running workflows behind the API
+
+from runtime.agent_runtime import AgentRuntime, RuntimeUnavailable
+from runtime.cache import ResponseCache
+from runtime.idempotency import IdempotencyStore
+from runtime.registry import WorkflowRegistry
+from runtime.routing import WorkflowRouter
+from runtime.scheduler import ModelCallScheduler
+from runtime.server_manager import ServerManager
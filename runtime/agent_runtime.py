@@ -0,0 +1,328 @@
+"""
+Long-lived agent runtime for the Business Workflow System
+Starts fast-agent applications on demand and shares them across API requests
+"""
+
+import asyncio
+import contextlib
+import logging
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from runtime.cache import CachingAgent, ResponseCache
+from runtime.compaction import ContextCompactor, compaction_config
+from runtime.dag import dag_steps, stream_dag
+from runtime.evaluation import EvaluationStats, RefiningAgent
+from runtime.routing import WorkflowRouter, instrument_llm_router
+from runtime.scheduler import ModelCallScheduler, ScheduledAgent, call_priority, instrument_anthropic
+from runtime.server_manager import ServerManager
+from runtime.streaming import stages_for, stream_stages
+from storage.ids import new_id
+from telemetry.metrics import STAGE_SECONDS, WORKFLOW_SECONDS
+from telemetry.tracing import Span, Trace, TraceStore
+
+logger = logging.getLogger(__name__)
+
+
+class RuntimeUnavailable(Exception):
+    """Raised when the agent runtime is not running or not accepting work"""
+
+
+class AgentRuntime:
+    """
+    Runs workflows on the fast-agent applications of the server manager
+
+    Each workflow run leases the application for the MCP servers it uses, which is started
+    on first use and kept warm until idle (see runtime.server_manager.ServerManager).
+
+    Workflow runs take a slot from the budget of their priority class (see
+    runtime.scheduler.call_priority): interactive requests, batch items and background
+    jobs each have their own, so queued batches and jobs never hold up interactive runs.
+
+    Args:
+        max_concurrent_runs: Maximum number of interactive workflow runs executing at once
+        max_batch_runs: Maximum number of batch items executing at once, across all batches
+        max_background_runs: Maximum number of background jobs executing at once
+        max_concurrent_calls: Maximum number of model requests in flight across all runs;
+            ignored when a scheduler is given
+        health_interval: Seconds between MCP server health checks
+        startup_timeout: Seconds to wait for an application to come up; ignored when a server
+            manager is given
+        shutdown_timeout: Seconds to wait for in-flight runs during shutdown
+        server_manager: Starts, shares and evicts the applications and their MCP servers (one is
+            created if omitted)
+        response_cache: Cache for the responses of cache-enabled agents (no caching if omitted)
+        cache_by_default: Cache agents whose decorator does not set cache=True/False
+        scheduler: Rate-limits and prioritizes model requests (one bounded by max_concurrent_calls
+            is created if omitted)
+        router: Picks router targets locally when it can (routers always call the LLM if omitted)
+        traces: Where each run's span tree is stored (runs are not traced if omitted)
+    """
+
+    def __init__(self, max_concurrent_runs: int = 4, max_batch_runs: int = 8, max_background_runs: int = 4,
+                 max_concurrent_calls: int = 8,
+                 health_interval: float = 30.0,
+                 startup_timeout: float = 60.0, shutdown_timeout: float = 30.0,
+                 server_manager: Optional[ServerManager] = None,
+                 response_cache: Optional[ResponseCache] = None, cache_by_default: bool = False,
+                 scheduler: Optional[ModelCallScheduler] = None, router: Optional[WorkflowRouter] = None,
+                 traces: Optional[TraceStore] = None):
+        self.max_concurrent_runs = max_concurrent_runs
+        self.health_interval = health_interval
+        self.startup_timeout = startup_timeout
+        self.shutdown_timeout = shutdown_timeout
+
+        self.run_limits = {"interactive": max_concurrent_runs, "batch": max_batch_runs,
+                           "background": max_background_runs}
+        self._run_slots = {name: asyncio.Semaphore(limit) for name, limit in self.run_limits.items()}
+        self._active_runs = {name: 0 for name in self.run_limits}
+        self.scheduler = scheduler or ModelCallScheduler(max_concurrency=max_concurrent_calls)
+        self._patches: List[Callable[[], None]] = []
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._accepting = False
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self.server_manager = server_manager or ServerManager(startup_timeout=startup_timeout)
+        self.registry = self.server_manager.registry
+        self.response_cache = response_cache
+        self.cache_by_default = cache_by_default
+        self.router = router
+        self.traces = traces
+        self.evaluations = EvaluationStats()
+        self.servers = self.server_manager.used
+        self.server_health: Dict[str, Dict[str, Any]] = {
+            name: {"healthy": None, "last_check": None, "error": None}
+            for name in self.servers
+        }
+        self.started_at: Optional[float] = None
+        self.restarts = 0
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Start accepting runs, the idle eviction of applications and the health monitor"""
+        # Every request fast-agent sends to the model goes through the scheduler, and the
+        # targets its LLM routers pick train the local router
+        patches = [instrument_anthropic(self.scheduler), instrument_llm_router() if self.router else None]
+        self._patches = [remove for remove in patches if remove]
+        # Applications and their MCP servers start with the first run that needs them
+        await self.server_manager.start()
+        self.started_at = time.time()
+        self._accepting = True
+        self._monitor_task = asyncio.create_task(self._monitor())
+        logger.info(f"Agent runtime started (run slots per priority class: {self.run_limits})")
+
+    async def stop(self):
+        """Stop accepting work, drain in-flight runs and close the applications"""
+        self._accepting = False
+
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._monitor_task
+            self._monitor_task = None
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shutting down with {self._in_flight} workflow run(s) still in flight")
+
+        await self.server_manager.close()
+        for remove in self._patches:
+            remove()
+        self._patches = []
+        logger.info("Agent runtime stopped")
+
+    async def restart(self, reason: str):
+        """Close every application; each starts again, with fresh MCP servers, on its next run"""
+        logger.warning(f"Restarting agent runtime: {reason}")
+        for servers in list(self.server_manager.apps):
+            await self.server_manager.retire(servers)
+        self.restarts += 1
+
+    # === Health checks ===
+
+    async def _monitor(self):
+        """Periodically probe MCP servers and retire any application with one that has died"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    async def check_health(self) -> List[str]:
+        """
+        Probe the MCP servers of every live application, returning the names of unhealthy ones
+
+        An application with an unhealthy server is retired: runs using it finish, and the
+        next run for its server set starts a fresh one.
+        """
+        unhealthy = []
+        for key, warm in list(self.server_manager.apps.items()):
+            failed = []
+            for name in key:
+                status = self.server_health.setdefault(name, {"healthy": None, "last_check": None, "error": None})
+                status["last_check"] = time.time()
+                try:
+                    await asyncio.wait_for(getattr(warm.app, name).list_tools(), timeout=10.0)
+                    status["healthy"], status["error"] = True, None
+                except Exception as e:
+                    status["healthy"], status["error"] = False, str(e) or type(e).__name__
+                    failed.append(name)
+            if failed and self.server_manager.apps.get(key) is warm:
+                logger.warning(f"Retiring the application for {', '.join(key)}: "
+                               f"MCP server(s) not responding: {', '.join(failed)}")
+                await self.server_manager.retire(key)
+                self.restarts += 1
+            unhealthy += [name for name in failed if name not in unhealthy]
+        return unhealthy
+
+    async def health(self) -> Dict[str, Any]:
+        """Return a snapshot of runtime and MCP server health"""
+        # Both take a lock their stores hold during disk writes; routing also queries its log
+        cache = await asyncio.to_thread(self.response_cache.stats) if self.response_cache else None
+        routing = await asyncio.to_thread(self.router.stats) if self.router else None
+        return {
+            "status": "ok" if self._accepting else "unavailable",
+            "uptime": time.time() - self.started_at if self.started_at else 0.0,
+            "restarts": self.restarts,
+            "in_flight": self._in_flight,
+            "max_concurrent_runs": self.max_concurrent_runs,
+            "run_slots": {name: {"limit": limit, "in_use": self._active_runs[name]}
+                          for name, limit in self.run_limits.items()},
+            "model_calls": self.scheduler.stats(),
+            "servers": self.server_health,
+            "mcp_servers": self.server_manager.stats(),
+            "response_cache": cache,
+            "routing": routing,
+            "evaluations": self.evaluations.stats(),
+        }
+
+    # === Request handling ===
+
+    async def run_workflow(self, name: str, message: Any, run_id: Optional[str] = None) -> Any:
+        """Run a named workflow on the application for its servers, bounded by the concurrency limit"""
+        # Chains and dags run step by step either way, so their agents share the response cache
+        events = self.stream_workflow(name, message, run_id)
+        try:
+            async for event in events:
+                if event["event"] == "result":
+                    return event["result"]
+        finally:
+            await events.aclose()
+
+    async def stream_workflow(self, name: str, message: Any,
+                              run_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a named workflow, yielding stage and output events as it progresses
+
+        The first event, "run", carries the run ID its trace is stored under (one is
+        allocated if not given), and the run then waits for a slot of the current priority
+        class. Chains run one agent at a time so each stage boundary is reported, dags run
+        each step once its inputs are ready; closing the generator cancels whatever has not
+        run yet. Routers first try the local router, reporting its choice as a "route" event.
+        """
+        run_id = run_id or new_id("run")
+        trace = self.traces.start(run_id, name, input_chars=len(str(message))) if self.traces else None
+        status = "cancelled"
+        try:
+            yield {"event": "run", "run_id": run_id, "workflow": name}
+            async with self._run_slot(), contextlib.AsyncExitStack() as lease:
+                spec = self.registry.get(name) or {}
+                route = None
+                if self.router is not None and spec.get("kind") == "router":
+                    routing = trace.root.child(name, "router") if trace else None
+                    route = await self.router.route(spec, message)
+                    if routing:
+                        routing.end(**(route or {"workflow": None, "source": "llm"}))
+                target = route["workflow"] if route else name
+                agent = ScheduledAgent(await self._prepare_run(target, lease), self.scheduler)
+                if self.response_cache is not None:
+                    agent = CachingAgent(agent, self.response_cache, self.registry, self.cache_by_default)
+                agent = RefiningAgent(agent, self.registry, self.evaluations)
+                events = self._events(agent, target, message, trace.root if trace else None)
+                started = time.perf_counter()
+                with self._tracked():
+                    try:
+                        if route:
+                            yield {"event": "route", "router": name, **route}
+                        async for event in events:
+                            if event["event"] == "stage_end":
+                                STAGE_SECONDS.observe(event["elapsed_ms"] / 1000, name, event["stage"])
+                            elif event["event"] == "result":
+                                status = "ok"
+                                if trace:
+                                    trace.root.attrs["output_chars"] = len(str(event["result"]))
+                            yield event
+                    except Exception:
+                        status = "error"
+                        raise
+                    finally:
+                        WORKFLOW_SECONDS.observe(time.perf_counter() - started, name, status)
+                        await events.aclose()
+        except Exception as e:
+            status = "error"
+            if trace:
+                trace.root.attrs["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            if trace:
+                await self._save_trace(trace, status)
+
+    async def _save_trace(self, trace: Trace, status: str):
+        # The run ends now, not once the thread gets to it; the write and any retention
+        # pass it triggers stay off the event loop
+        trace.root.end(status)
+        try:
+            await asyncio.to_thread(self.traces.save, trace, status)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not store the trace of run {trace.run_id}: {e}")
+
+    def _events(self, agent: Any, name: str, message: Any,
+                parent: Optional[Span] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Pick the executor for a workflow: dags and chains step by step, the rest as one stage"""
+        spec = self.registry.get(name) or {}
+        compaction = compaction_config(self.registry, name)
+        compactor = ContextCompactor(compaction, agent) if compaction else None
+        if spec.get("kind") == "dag":
+            # fast-agent has no dag type; the runtime schedules its steps itself
+            return stream_dag(agent, dag_steps(spec), message, bool(spec.get("cumulative", False)),
+                              compactor, parent)
+        stages, cumulative = stages_for(self.registry, name)
+        return stream_stages(agent, stages, message, cumulative, compactor, parent)
+
+    async def _prepare_run(self, name: str, lease: contextlib.AsyncExitStack):
+        """Lease the application for the workflow's MCP servers until `lease` closes, starting it if needed"""
+        if not self._accepting:
+            raise RuntimeUnavailable("Agent runtime is not accepting requests")
+        try:
+            return await lease.enter_async_context(self.server_manager.lease(name))
+        except asyncio.TimeoutError:
+            raise RuntimeUnavailable(f"The MCP servers for {name} did not start in time")
+
+    @contextlib.asynccontextmanager
+    async def _run_slot(self) -> AsyncIterator[None]:
+        """Hold a run slot of the current task's priority class"""
+        priority = call_priority.get()
+        if priority not in self._run_slots:
+            raise ValueError(f"Unknown priority class: {priority!r}")
+        async with self._run_slots[priority]:
+            self._active_runs[priority] += 1
+            try:
+                yield
+            finally:
+                self._active_runs[priority] -= 1
+
+    @contextlib.contextmanager
+    def _tracked(self) -> Iterator[None]:
+        """Count a run as in flight so shutdown can wait for it"""
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
@@ -0,0 +1,56 @@
+"""
+Batch workflow execution for the Business Workflow System
+Runs many workflow invocations concurrently and yields their results as they complete
+"""
+
+import asyncio
+import contextlib
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from runtime.agent_runtime import RuntimeUnavailable
+
+MAX_BATCH_ITEMS = 1000
+
+
+async def run_batch(run: Callable[[Any], Awaitable[Any]], messages: List[Any],
+                    concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run every message through run(), at most `concurrency` at a time
+
+    Yields one item per message in completion order, each tagged with the message's index:
+    {"index", "status": "ok", "result", "elapsed_ms"} or
+    {"index", "status": "error", "status_code", "error", "elapsed_ms"}.
+    A failing item never affects the others. Closing the generator cancels the items
+    still pending.
+    """
+    if len(messages) > MAX_BATCH_ITEMS:
+        raise ValueError(f"Batch of {len(messages)} items exceeds the limit of {MAX_BATCH_ITEMS}")
+
+    slots = asyncio.Semaphore(max(1, concurrency))
+    completed: asyncio.Queue = asyncio.Queue()
+
+    async def run_one(index: int, message: Any):
+        async with slots:
+            started = time.perf_counter()
+            try:
+                item = {"index": index, "status": "ok", "result": await run(message)}
+            except asyncio.CancelledError:
+                raise
+            except RuntimeUnavailable as e:
+                item = {"index": index, "status": "error", "status_code": 503, "error": str(e)}
+            except Exception as e:
+                item = {"index": index, "status": "error", "status_code": 500,
+                        "error": str(e) or type(e).__name__}
+            item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        completed.put_nowait(item)
+
+    tasks = [asyncio.create_task(run_one(index, message)) for index, message in enumerate(messages)]
+    try:
+        for _ in tasks:
+            yield await completed.get()
+    finally:
+        for task in tasks:
+            task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,259 @@
+"""
+LLM response cache for the Business Workflow System
+Memory LRU in front of a SQLite disk tier with TTL and size-based eviction
+"""
+
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from runtime.registry import WorkflowRegistry
+from storage.filesystem import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = DATA_DIR / "responses.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at);
+"""
+
+
+def normalize_input(message: Any) -> str:
+    """Canonical form of an agent input: JSON with sorted keys, or text with collapsed whitespace"""
+    if not isinstance(message, str):
+        return json.dumps(message, sort_keys=True, default=str)
+    return re.sub(r"\s+", " ", message).strip()
+
+
+def cache_key(agent: str, instruction: str, model: str, message: Any, context: str = "") -> str:
+    """
+    Hash everything that determines an agent's response
+
+    Args:
+        agent: Agent name
+        instruction: The agent's system instruction
+        model: Model identifier
+        message: The input sent to the agent
+        context: Anything else the response depends on, e.g. the MCP servers it may call
+    """
+    material = json.dumps([agent, instruction, model, normalize_input(message), context])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of agent responses
+
+    Args:
+        path: SQLite file for the disk tier
+        memory_entries: Entries kept in the in-memory LRU
+        ttl: Default seconds an entry stays valid
+        max_bytes: Disk tier size above which the least recently used entries are evicted
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, memory_entries: int = 512,
+                 ttl: float = 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        # key -> (expires_at, value)
+        self._memory: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False,
+                                     timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0,
+                         "stores": 0, "expired": 0, "evicted": 0}
+        self.agent_counters: Dict[str, Dict[str, int]] = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str, agent: str = "") -> Optional[str]:
+        """Return a cached response, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self._count(agent, "hits", "memory_hits")
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+
+            row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self._count(agent, "misses")
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._delete(key)
+                self._count(agent, "misses", "expired")
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._remember(key, expires_at, value)
+            self._count(agent, "hits", "disk_hits")
+            return value
+
+    def put(self, key: str, value: str, agent: str = "", ttl: Optional[float] = None):
+        """Store a response in both tiers"""
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, expires_at, value)
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, agent, value, size, now, expires_at, now),
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._count(agent, "stores")
+            if self._disk_bytes > self.max_bytes:
+                self._evict(now)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "agents": {agent: dict(counts) for agent, counts in self.agent_counters.items()},
+            }
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key: str):
+        row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._disk_bytes -= row[0]
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used ones, until under 90% of max_bytes"""
+        expired = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses "
+                                     "WHERE expires_at <= ?", (now,)).fetchone()
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._disk_bytes -= expired[1]
+        self.counters["expired"] += expired[0]
+
+        target = self.max_bytes * 0.9
+        if self._disk_bytes <= target:
+            return
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if self._disk_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            self._disk_bytes -= size
+            removed += 1
+        self.counters["evicted"] += removed
+        logger.info(f"Evicted {removed} cached response(s) to stay under {self.max_bytes} bytes")
+
+    def _count(self, agent: str, *names: str):
+        counts = self.agent_counters.setdefault(agent, {"hits": 0, "misses": 0, "stores": 0})
+        for name in names:
+            self.counters[name] += 1
+            if name in counts:
+                counts[name] += 1
+
+
+class CachingAgent:
+    """
+    Wraps the fast-agent application so calls to cache-enabled agents go through the cache
+
+    An agent is cached when its decorator says cache=True, or when it does not say
+    cache=False and caching is on by default. cache_ttl in the decorator overrides the
+    cache's default TTL.
+
+    Args:
+        agent: The running fast-agent application
+        cache: Where responses are stored
+        registry: Declarations supplying each agent's instruction, model and cache settings
+        default: Whether agents without a cache setting are cached
+    """
+
+    def __init__(self, agent: Any, cache: ResponseCache, registry: WorkflowRegistry, default: bool = False):
+        self._agent = agent
+        self._cache = cache
+        self._registry = registry
+        self._default = default
+
+    def __getattr__(self, name: str) -> Any:
+        proxy = getattr(self._agent, name)
+        spec = self._registry.get(name) or {}
+        if spec.get("kind") != "agent" or not spec.get("cache", self._default):
+            return proxy
+        return _CachedProxy(proxy, name, spec, self._cache)
+
+
+class _CachedProxy:
+    """An agent proxy whose send() answers repeated inputs from the cache"""
+
+    def __init__(self, proxy: Any, name: str, spec: Dict[str, Any], cache: ResponseCache):
+        self._proxy = proxy
+        self._name = name
+        self._spec = spec
+        self._cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._proxy, name)
+
+    async def __call__(self, message: Any) -> Any:
+        return await self.send(message)
+
+    async def send(self, message: Any) -> Any:
+        # Tool results are not visible at this boundary, so the servers an agent can call
+        # are part of the key and tool-dependent agents should only opt in when stable
+        key = cache_key(self._name, self._spec.get("instruction", ""), self._spec.get("model", "default"),
+                        message, ",".join(self._spec.get("servers", [])))
+        # Both tiers share a lock with SQLite writes, so lookups and stores run off the event loop
+        cached = await asyncio.to_thread(self._cache.get, key, self._name)
+        if cached is not None:
+            return cached
+        response = await self._proxy.send(message)
+        if isinstance(response, str) and response:
+            await asyncio.to_thread(self._cache.put, key, response, self._name, self._spec.get("cache_ttl"))
+        return response
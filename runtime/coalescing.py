@@ -0,0 +1,179 @@
+"""
+Request coalescing for the Business Workflow System
+Lets identical concurrent requests share one execution and its result or event stream
+"""
+
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from runtime.agent_runtime import RuntimeUnavailable
+from runtime.cache import normalize_input
+
+
+def flight_key(endpoint: str, action: str, payload: Any) -> str:
+    """Identify a request by endpoint, action and canonicalized payload"""
+    material = "\0".join([endpoint, action, normalize_input(payload)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def parse_endpoints(setting: str) -> Dict[str, Set[str]]:
+    """Parse "calendar=list|upcoming,downloads=*" into the actions each endpoint coalesces"""
+    endpoints: Dict[str, Set[str]] = {}
+    for item in setting.split(","):
+        name, _, actions = item.partition("=")
+        if name.strip():
+            endpoints[name.strip()] = {action.strip() for action in (actions or "*").split("|") if action.strip()}
+    return endpoints
+
+
+class _Flight:
+    """One shared execution and the number of requests waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """One shared event stream, recorded so late joiners replay it from the start"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    In-flight deduplication of identical requests
+
+    Only endpoints (and actions) listed in `endpoints` coalesce, since sharing one run
+    is only safe for requests that do not change anything. An execution is cancelled
+    once every request waiting on it has gone away, and forgotten at that moment, so an
+    identical request arriving while it winds down starts a new one. If an execution is
+    cancelled by anything else (e.g. shutdown), the requests sharing it get
+    RuntimeUnavailable rather than the cancellation.
+
+    Args:
+        endpoints: Endpoint -> actions that coalesce ("*" for all of them)
+    """
+
+    def __init__(self, endpoints: Optional[Dict[str, Set[str]]] = None):
+        self.endpoints = endpoints or {}
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def coalesces(self, endpoint: str, action: str = "*") -> bool:
+        actions = self.endpoints.get(endpoint, set())
+        return "*" in actions or action in actions
+
+    async def run(self, endpoint: str, action: str, payload: Any,
+                  execute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return execute()'s result, sharing it with identical requests already in flight"""
+        if not self.coalesces(endpoint, action):
+            return await execute()
+        key = flight_key(endpoint, action, payload)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(execute()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+            self._count(endpoint, "executions")
+        else:
+            self._count(endpoint, "coalesced")
+
+        flight.waiters += 1
+        try:
+            # Shielded so one client going away does not cancel the others' result
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.task.cancelled():
+                raise RuntimeUnavailable(f"The shared {endpoint} request was cancelled") from None
+            raise  # This request itself was cancelled
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(self._flights, key, flight)
+                flight.task.cancel()
+
+    async def stream(self, endpoint: str, action: str, payload: Any,
+                     start: Callable[[], AsyncIterator[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the events of start(), sharing one stream with identical requests already in flight"""
+        if not self.coalesces(endpoint, action):
+            events = start()
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+            return
+
+        key = flight_key(endpoint, action, payload)
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(self._pump(key, broadcast, start()))
+            self._count(endpoint, "executions")
+        else:
+            self._count(endpoint, "coalesced")
+
+        broadcast.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(broadcast.events):
+                    yield broadcast.events[index]
+                    index += 1
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                await broadcast.changed.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.task.done():
+                self._forget(self._streams, key, broadcast)
+                broadcast.task.cancel()
+
+    async def _pump(self, key: str, broadcast: _Broadcast, events: AsyncIterator[Dict[str, Any]]):
+        try:
+            async for event in events:
+                broadcast.events.append(event)
+                broadcast.notify()
+        except asyncio.CancelledError:
+            broadcast.error = RuntimeUnavailable("The shared stream was cancelled")
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            await events.aclose()
+            broadcast.done = True
+            self._forget(self._streams, key, broadcast)
+            broadcast.notify()
+
+    @staticmethod
+    def _forget(flights: Dict[str, Any], key: str, flight: Any):
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def _count(self, endpoint: str, name: str):
+        counts = self.counters.setdefault(endpoint, {"executions": 0, "coalesced": 0})
+        counts[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoints": {endpoint: sorted(actions) for endpoint, actions in self.endpoints.items()},
+            "executions": sum(counts["executions"] for counts in self.counters.values()),
+            "saved_executions": sum(counts["coalesced"] for counts in self.counters.values()),
+            "in_flight": len(self._flights) + len(self._streams),
+            "per_endpoint": {endpoint: dict(counts) for endpoint, counts in self.counters.items()},
+        }
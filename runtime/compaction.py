@@ -0,0 +1,189 @@
+"""
+Context compaction for the Business Workflow System
+Keeps the prompts of cumulative chains and dags from growing with every stage
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from runtime.registry import WorkflowRegistry
+from runtime.scheduler import estimate_tokens
+from runtime.streaming import cumulative_input
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("full", "last_k", "fields", "summarize")
+
+SUMMARIZER_AGENT = "context_summarizer"
+
+DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "full": {},
+    "last_k": {"keep": 2},
+    "fields": {"keep": 1, "fields": []},
+    "summarize": {"keep": 1, "budget": 2000, "agent": SUMMARIZER_AGENT},
+}
+
+JSON_BLOCK = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+HEADING = re.compile(r"^\s*#{1,6}\s+(.+?)\s*#*\s*$")
+KEY_VALUE = re.compile(r"^\s*(?:[-*]\s+)?\**([^:*\n]{1,60}?)\**\s*:\s*(.+?)\s*$")
+
+
+def compaction_config(registry: WorkflowRegistry, name: str) -> Optional[Dict[str, Any]]:
+    """
+    Return a workflow's compaction settings, or None if its prompts are left whole
+
+    Cumulative chains and dags opt in through their decorator, either with a strategy
+    name (compaction="last_k") or a dict of settings
+    (compaction={"strategy": "summarize", "budget": 1500}). In a dag the compacted
+    responses are those of the steps a step depends on, in the order they are listed.
+    """
+    spec = registry.get(name) or {}
+    setting = spec.get("compaction")
+    if not setting:
+        return None
+    if spec.get("kind") != "dag" and (spec.get("kind") != "chain" or not spec.get("cumulative")):
+        return None
+    config = {"strategy": setting} if isinstance(setting, str) else dict(setting)
+    strategy = config.get("strategy", "last_k")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"{name}: unknown compaction strategy {strategy!r}")
+    return {**DEFAULTS[strategy], **config, "strategy": strategy}
+
+
+def _normalize(key: str) -> str:
+    return re.sub(r"[\s_\-]+", "_", key.strip().lower())
+
+
+def extract_fields(output: str, fields: List[str]) -> Dict[str, str]:
+    """
+    Pull the named fields out of an agent's output
+
+    JSON outputs (bare or in a fenced block) are read by key; otherwise "Field: value"
+    lines and markdown sections headed by a field name are used.
+    """
+    wanted = {_normalize(field): field for field in fields}
+    found: Dict[str, str] = {}
+
+    for candidate in [output.strip()] + JSON_BLOCK.findall(output):
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if _normalize(key) in wanted:
+                    found.setdefault(wanted[_normalize(key)],
+                                     value if isinstance(value, str) else json.dumps(value))
+    if found:
+        return found
+
+    section: Optional[str] = None
+    for line in output.splitlines():
+        heading = HEADING.match(line)
+        if heading:
+            key = _normalize(heading.group(1))
+            section = wanted[key] if key in wanted and wanted[key] not in found else None
+            continue
+        if section is not None:
+            if line.strip():
+                found[section] = f"{found[section]}\n{line.strip()}" if section in found else line.strip()
+            continue
+        pair = KEY_VALUE.match(line)
+        if pair and _normalize(pair.group(1)) in wanted:
+            found.setdefault(wanted[_normalize(pair.group(1))], pair.group(2))
+    return found
+
+
+class ContextCompactor:
+    """
+    Builds the input a cumulative chain or dag gives its next agent, compacting earlier outputs
+
+    Strategies:
+        full: the request and every response so far (fast-agent's own behaviour)
+        last_k: the request and only the last `keep` responses
+        fields: the last `keep` responses in full, and only the named `fields` of earlier ones
+        summarize: once the prompt exceeds `budget` tokens, earlier responses are folded
+            into a running summary written by the `agent` agent
+
+    One compactor serves one run: the summary carries over to later stages when they
+    build on the same responses, as every stage of a chain does. Dag steps run
+    concurrently, so each builds its input with its own fork().
+
+    Args:
+        config: Settings from compaction_config()
+        agent: The running application, used to reach the summarizer agent
+    """
+
+    def __init__(self, config: Dict[str, Any], agent: Any = None):
+        self.config = config
+        self.strategy = config["strategy"]
+        self.keep = max(1, int(config.get("keep", 1)))
+        self._agent = agent
+        self._summary = ""
+        self._summarized: List[str] = []
+
+    def fork(self) -> "ContextCompactor":
+        """A compactor with the same settings and no summary yet"""
+        return ContextCompactor(self.config, self._agent)
+
+    async def build(self, request: str, responses: List[Tuple[str, str]]) -> str:
+        if self.strategy == "full" or len(responses) <= self.keep:
+            return cumulative_input(request, responses)
+        older, recent = responses[:-self.keep], responses[-self.keep:]
+
+        if self.strategy == "last_k":
+            return self._join(request, [], recent)
+
+        if self.strategy == "fields":
+            extracted = []
+            for stage, output in older:
+                values = extract_fields(output, self.config.get("fields", []))
+                if values:
+                    body = "\n".join(f"{key}: {value}" for key, value in values.items())
+                    extracted.append(f'<fastagent:fields agent="{stage}">\n{body}\n</fastagent:fields>')
+            return self._join(request, extracted, recent)
+
+        full = cumulative_input(request, responses)
+        budget = int(self.config.get("budget", 2000))
+        if estimate_tokens(full) <= budget:
+            return full
+        summary = await self._summarize(older, budget - estimate_tokens(self._join(request, [], recent)))
+        if summary is None:
+            return self._join(request, [], recent)
+        agents = ",".join(stage for stage, _ in older)
+        return self._join(request, [f'<fastagent:summary agents="{agents}">\n{summary}\n</fastagent:summary>'],
+                          recent)
+
+    async def _summarize(self, older: List[Tuple[str, str]], target: int) -> Optional[str]:
+        """Fold responses not yet summarized into the running summary, in about `target` tokens"""
+        stages = [stage for stage, _ in older]
+        if stages == self._summarized:
+            return self._summary
+        # Responses that do not build on the summarized ones start a new summary
+        extends = bool(self._summary) and stages[:len(self._summarized)] == self._summarized
+        start = len(self._summarized) if extends else 0
+        target = max(64, target)
+        parts = [f"<previous_summary>\n{self._summary}\n</previous_summary>"] if extends else []
+        parts += [f'<fastagent:response agent="{stage}">\n{output}\n</fastagent:response>'
+                  for stage, output in older[start:]]
+        prompt = (f"Summarize the following workflow context in at most {target} tokens. "
+                  f"Keep every decision, name, value and requirement a later step may rely on.\n\n"
+                  + "\n\n".join(parts))
+        try:
+            summary = await getattr(self._agent, self.config.get("agent", SUMMARIZER_AGENT)).send(prompt)
+        except Exception as e:
+            logger.warning(f"Context summarization failed, keeping the last {self.keep} response(s): {e}")
+            return None
+        summary = summary if isinstance(summary, str) else str(summary)
+        self._summary = summary[:target * 4]  # Hold the summarizer to the budget
+        self._summarized = stages
+        return self._summary
+
+    @staticmethod
+    def _join(request: str, context: List[str], recent: List[Tuple[str, str]]) -> str:
+        parts = [f"<fastagent:request>\n{request}\n</fastagent:request>"] + context
+        parts += [f'<fastagent:response agent="{stage}">\n{output}\n</fastagent:response>'
+                  for stage, output in recent]
+        return "\n\n".join(parts)
@@ -0,0 +1,141 @@
+"""
+DAG workflow execution for the Business Workflow System
+Runs workflow steps as soon as the steps they depend on have finished
+"""
+
+import asyncio
+import contextlib
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from runtime.scheduler import estimate_tokens
+from runtime.streaming import _DONE, _run_stage, cumulative_input
+from telemetry.tracing import Span
+
+
+def dag_steps(spec: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Return a @fast.dag declaration's steps in dependency order, mapped to their inputs
+
+    steps maps each agent to the steps whose output it needs, e.g.
+    steps={"ui_analyzer": [], "style_manager": [], "ui_generator": ["ui_analyzer", "style_manager"]}.
+    Raises ValueError for unknown inputs and cycles.
+    """
+    name = spec.get("name", "dag")
+    steps = {step: [after] if isinstance(after, str) else list(after or [])
+             for step, after in (spec.get("steps") or {}).items()}
+    if not steps:
+        raise ValueError(f"{name}: a dag needs at least one step")
+    for step, after in steps.items():
+        unknown = [input_ for input_ in after if input_ not in steps]
+        if unknown:
+            raise ValueError(f"{name}: step {step!r} depends on unknown step(s) {', '.join(unknown)}")
+
+    ordered: Dict[str, List[str]] = {}
+    while len(ordered) < len(steps):
+        ready = [step for step, after in steps.items()
+                 if step not in ordered and all(input_ in ordered for input_ in after)]
+        if not ready:
+            cycle = [step for step in steps if step not in ordered]
+            raise ValueError(f"{name}: steps {', '.join(cycle)} depend on each other")
+        for step in ready:
+            ordered[step] = steps[step]
+    return ordered
+
+
+def chain_as_dag(sequence: List[str], cumulative: bool = False) -> Dict[str, List[str]]:
+    """
+    The steps of a dag equivalent to a chain, as a starting point for converting it
+
+    Each step depends on every earlier one (cumulative) or on the one before it; drop
+    the inputs a step does not really need to let it run sooner.
+    """
+    return {step: list(sequence[:index]) if cumulative else list(sequence[max(0, index - 1):index])
+            for index, step in enumerate(sequence)}
+
+
+class _StepDeltas:
+    """Queue stand-in for _run_stage that tags a step's output chunks as delta events"""
+
+    def __init__(self, step: str, events: asyncio.Queue):
+        self.step = step
+        self.events = events
+
+    def put_nowait(self, chunk: Any):
+        if chunk is not _DONE:
+            self.events.put_nowait({"event": "delta", "stage": self.step, "text": chunk})
+
+
+async def stream_dag(agent: Any, steps: Dict[str, List[str]], message: Any, cumulative: bool = False,
+                     compactor: Optional[Any] = None,
+                     parent: Optional[Span] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run steps concurrently as their inputs become available, yielding progress events
+
+    Emits the same events as stream_stages(), with "after" added to stage_start. A step
+    receives the request plus the outputs of the steps it depends on, built by a fork of
+    the compactor (see runtime.compaction) if one is given, so concurrent steps never
+    share its summary. The result holds every step's
+    output (cumulative) or those of the steps nothing depends on. With a parent span
+    each step is traced as its child.
+
+    A failing step cancels the others and its error is raised. Closing the generator
+    cancels every running step.
+    """
+    request = message if isinstance(message, str) else str(message)
+    order = list(steps)
+    outputs: Dict[str, str] = {}
+    events: asyncio.Queue = asyncio.Queue()
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_step(step: str):
+        try:
+            after = steps[step]
+            inputs = [(input_, outputs[input_]) for input_ in after]
+            full = cumulative_input(request, inputs) if after else request
+            prompt = await compactor.fork().build(request, inputs) if compactor and after else full
+            sizes = {"prompt_tokens": estimate_tokens(prompt), "full_prompt_tokens": estimate_tokens(full)}
+            started = time.perf_counter()
+            events.put_nowait({"event": "stage_start", "stage": step, "index": order.index(step),
+                               "total": len(order), "after": after, **sizes})
+            output = await _run_stage(getattr(agent, step), prompt, _StepDeltas(step, events), step, parent)
+            outputs[step] = output
+            launch_ready()
+            events.put_nowait({"event": "stage_end", "stage": step, "index": order.index(step),
+                               "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                               "chars": len(output), **sizes})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            events.put_nowait({"event": "_failed", "stage": step, "error": e})
+
+    def launch_ready():
+        for step, after in steps.items():
+            if step not in tasks and all(input_ in outputs for input_ in after):
+                tasks[step] = asyncio.create_task(run_step(step))
+
+    try:
+        launch_ready()
+        while len(outputs) < len(order):
+            event = await events.get()
+            if event["event"] == "_failed":
+                raise event["error"]
+            yield event
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    # The last step's stage_end is queued after its output is recorded
+    while not events.empty():
+        yield events.get_nowait()
+
+    needed = {input_ for after in steps.values() for input_ in after}
+    final = order if cumulative else [step for step in order if step not in needed]
+    if len(final) == 1 and not cumulative:
+        result = outputs[final[0]]
+    else:
+        result = "\n\n".join(f'<fastagent:response agent="{step}">\n{outputs[step]}\n</fastagent:response>'
+                             for step in final)
+    yield {"event": "result", "result": result}
@@ -0,0 +1,221 @@
+"""
+Evaluator-optimizer loops for the Business Workflow System
+Refines drafts with local pre-checks, remembered verdicts and convergence detection
+"""
+
+import difflib
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from runtime.cache import normalize_input
+from runtime.registry import WorkflowRegistry
+from telemetry.metrics import REFINEMENT_ROUNDS
+from telemetry.tracing import annotate
+
+logger = logging.getLogger(__name__)
+
+# Worst to best, as fast-agent's evaluator rates responses
+RATINGS = ["POOR", "FAIR", "GOOD", "EXCELLENT"]
+
+RATING_LINE = re.compile(r"\b(?:RATING|Rating|rating)\s*[:=]?\s*\**\s*(EXCELLENT|GOOD|FAIR|POOR)\b")
+RATING_WORD = re.compile(r"\b(EXCELLENT|GOOD|FAIR|POOR)\b")
+
+EVALUATE_PROMPT = """Evaluate the draft below against the request.
+Start your answer with a line "RATING: EXCELLENT", "RATING: GOOD", "RATING: FAIR" or "RATING: POOR",
+then give specific, actionable feedback for improving it.
+
+<request>
+{request}
+</request>
+
+<draft>
+{draft}
+</draft>"""
+
+REFINE_PROMPT = """Improve your previous response using the feedback.
+
+<request>
+{request}
+</request>
+
+<previous_response>
+{draft}
+</previous_response>
+
+<feedback>
+{feedback}
+</feedback>"""
+
+
+def precheck(draft: str, checks: Dict[str, Any]) -> List[str]:
+    """
+    Problems local checks can find without the evaluator
+
+    checks may set required_sections (each must appear as a heading or line start),
+    min_words, max_words and banned_terms (case-insensitive whole words).
+    """
+    problems = []
+    lines = [re.sub(r"^[#*\-\s]+|[*:\s]+$", "", line).lower() for line in draft.splitlines()]
+    for section in checks.get("required_sections", []):
+        if not any(line.startswith(section.lower()) for line in lines):
+            problems.append(f"Missing required section: {section}")
+
+    words = len(draft.split())
+    if "min_words" in checks and words < checks["min_words"]:
+        problems.append(f"Too short: {words} words, at least {checks['min_words']} expected")
+    if "max_words" in checks and words > checks["max_words"]:
+        problems.append(f"Too long: {words} words, at most {checks['max_words']} allowed")
+
+    for term in checks.get("banned_terms", []):
+        if re.search(rf"\b{re.escape(term)}\b", draft, re.IGNORECASE):
+            problems.append(f"Remove the term: {term}")
+    return problems
+
+
+def parse_verdict(text: str) -> Tuple[str, str]:
+    """Split an evaluator response into its rating and feedback; unrated responses count as POOR"""
+    match = RATING_LINE.search(text) or RATING_WORD.search(text)
+    if match is None:
+        return "POOR", text.strip()
+    return match.group(1), (text[:match.start()].rstrip("* \t") + text[match.end():].lstrip("*:- \t")).strip()
+
+
+def similarity(previous: str, draft: str) -> float:
+    """Word-level similarity of two drafts, 1.0 when identical"""
+    matcher = difflib.SequenceMatcher(None, previous.split(), draft.split())
+    if matcher.real_quick_ratio() < 0.5 or matcher.quick_ratio() < 0.5:
+        return matcher.quick_ratio()
+    return matcher.ratio()
+
+
+class EvaluationStats:
+    """Rounds, model calls and stop reasons of evaluator-optimizer runs, per workflow"""
+
+    COUNTERS = ("runs", "rounds", "generator_calls", "evaluator_calls", "remembered_verdicts",
+                "precheck_rejections")
+
+    def __init__(self):
+        self.workflows: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, stop_reason: str, **counts: int):
+        totals = self.workflows.setdefault(name, {**{key: 0 for key in self.COUNTERS}, "stop_reasons": {}})
+        totals["runs"] += 1
+        for key, value in counts.items():
+            totals[key] += value
+        totals["stop_reasons"][stop_reason] = totals["stop_reasons"].get(stop_reason, 0) + 1
+        REFINEMENT_ROUNDS.observe(counts.get("rounds", 0), name, stop_reason)
+
+    def stats(self) -> Dict[str, Any]:
+        report = {}
+        for name, totals in self.workflows.items():
+            runs = totals["runs"] or 1
+            report[name] = {
+                **totals,
+                "stop_reasons": dict(totals["stop_reasons"]),
+                "avg_rounds": round(totals["rounds"] / runs, 2),
+                "avg_model_calls": round((totals["generator_calls"] + totals["evaluator_calls"]) / runs, 2),
+            }
+        return report
+
+
+class RefiningAgent:
+    """
+    Wraps the fast-agent application so evaluator-optimizer workflows run the refinement loop here
+
+    Each round first runs the declaration's local checks (checks=...), and only a draft
+    that passes them is sent to the evaluator. A draft the loop has already rated is not
+    rated again, and the loop stops early once successive drafts are at least
+    converge_at similar (default 0.98). The best-rated draft is returned.
+
+    Args:
+        agent: The application, usually wrapped by the scheduler and response cache
+        registry: Declarations supplying generator, evaluator, min_rating and max_refinements
+        stats: Where round and call counts are recorded
+    """
+
+    def __init__(self, agent: Any, registry: WorkflowRegistry, stats: EvaluationStats):
+        self._agent = agent
+        self._registry = registry
+        self._stats = stats
+
+    def __getattr__(self, name: str) -> Any:
+        spec = self._registry.get(name) or {}
+        if spec.get("kind") != "evaluator_optimizer":
+            return getattr(self._agent, name)
+        return _RefiningProxy(self._agent, name, spec, self._stats)
+
+
+class _RefiningProxy:
+    def __init__(self, agent: Any, name: str, spec: Dict[str, Any], stats: EvaluationStats):
+        self._agent = agent
+        self._name = name
+        self._spec = spec
+        self._stats = stats
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(getattr(self._agent, self._name), name)
+
+    async def __call__(self, message: Any) -> Any:
+        return await self.send(message)
+
+    async def send(self, message: Any) -> str:
+        spec = self._spec
+        request = message if isinstance(message, str) else str(message)
+        generator = getattr(self._agent, spec["generator"])
+        evaluator = getattr(self._agent, spec["evaluator"])
+        min_rating = RATINGS.index(spec.get("min_rating", "GOOD"))
+        max_refinements = int(spec.get("max_refinements", 3))
+        converge_at = float(spec.get("converge_at", 0.98))
+        checks = spec.get("checks") or {}
+
+        counts = {"rounds": 0, "generator_calls": 0, "evaluator_calls": 0,
+                  "remembered_verdicts": 0, "precheck_rejections": 0}
+        verdicts: Dict[str, Tuple[int, str]] = {}
+        best: Optional[Tuple[int, str]] = None
+        previous: Optional[str] = None
+        stop_reason = "max_refinements"
+
+        draft = str(await generator.send(request))
+        counts["generator_calls"] += 1
+        for round_ in range(max_refinements + 1):
+            if previous is not None and similarity(previous, draft) >= converge_at:
+                stop_reason = "converged"
+                break
+            counts["rounds"] += 1
+
+            key = hashlib.sha256(normalize_input(draft).encode("utf-8")).hexdigest()
+            problems = precheck(draft, checks)
+            if problems:
+                counts["precheck_rejections"] += 1
+                rating, feedback = -1, "\n".join(problems)
+            elif key in verdicts:
+                counts["remembered_verdicts"] += 1
+                rating, feedback = verdicts[key]
+            else:
+                verdict, feedback = parse_verdict(str(await evaluator.send(
+                    EVALUATE_PROMPT.format(request=request, draft=draft))))
+                counts["evaluator_calls"] += 1
+                rating = RATINGS.index(verdict)
+                verdicts[key] = (rating, feedback)
+
+            if best is None or rating >= best[0]:
+                best = (rating, draft)
+            if rating >= min_rating:
+                stop_reason = "rating"
+                break
+            if round_ == max_refinements:
+                break
+
+            previous = draft
+            draft = str(await generator.send(REFINE_PROMPT.format(request=request, draft=draft,
+                                                                  feedback=feedback)))
+            counts["generator_calls"] += 1
+
+        self._stats.record(self._name, stop_reason, **counts)
+        annotate(stop_reason=stop_reason, **counts)
+        logger.info(f"{self._name}: stopped after {counts['rounds']} round(s) ({stop_reason}), "
+                    f"{counts['generator_calls'] + counts['evaluator_calls']} model call(s)")
+        # A converged draft is no better than the rated one before it
+        return best[1] if best else draft
@@ -0,0 +1,213 @@
+"""
+Idempotency keys for the Business Workflow System
+Stores completed workflow results so client retries replay them instead of running again
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from runtime.cache import normalize_input
+from storage.filesystem import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_PATH = DATA_DIR / "idempotency.db"
+MAX_KEY_LENGTH = 255
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at);
+CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at);
+"""
+
+# How a request with a key was answered
+EXECUTED, STORED, ATTACHED = "executed", "stored", "attached"
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different request"""
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Persistent results of requests sent with an Idempotency-Key
+
+    Keys are scoped to an endpoint. A request whose key has a stored result gets that
+    result back without running anything; one whose key is still running waits for that
+    run. A run keeps going when its client disconnects, since a retry is expected to
+    attach to it. Failed runs are not stored, so a retry runs again. Reusing a key for a
+    different payload raises IdempotencyConflict.
+
+    Args:
+        path: SQLite file for the stored results
+        ttl: Seconds a result is kept
+        max_bytes: Stored size above which the least recently used results are evicted
+    """
+
+    def __init__(self, path: Path = IDEMPOTENCY_PATH, ttl: float = 24 * 3600,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False,
+                                     timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        # key -> (fingerprint, task) of runs still executing
+        self._running: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+        self.counters = {"requests": 0, EXECUTED: 0, STORED: 0, ATTACHED: 0, "conflicts": 0,
+                         "failed": 0, "expired": 0, "evicted": 0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    async def run(self, key: str, endpoint: str, payload: Any,
+                  execute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        Return execute()'s result for this key, and whether it was executed, stored or attached
+
+        The result must be JSON-serializable to be stored.
+        """
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+        scoped = _digest(endpoint, key)
+        fingerprint = _digest(endpoint, normalize_input(payload))
+        self.counters["requests"] += 1
+
+        running = self._running.get(scoped)
+        if running is not None:
+            self._check(running[0], fingerprint, key)
+            self.counters[ATTACHED] += 1
+            return await asyncio.shield(running[1]), ATTACHED
+
+        stored = await asyncio.to_thread(self._get, scoped)
+        if stored is not None:
+            self._check(stored[0], fingerprint, key)
+            self.counters[STORED] += 1
+            return json.loads(stored[1]), STORED
+
+        # Another request may have started the run while the store was being read
+        running = self._running.get(scoped)
+        if running is not None:
+            self._check(running[0], fingerprint, key)
+            self.counters[ATTACHED] += 1
+            return await asyncio.shield(running[1]), ATTACHED
+
+        task = asyncio.ensure_future(self._execute(scoped, fingerprint, endpoint, execute))
+        self._running[scoped] = (fingerprint, task)
+        task.add_done_callback(lambda _: self._finished(scoped, task))
+        self.counters[EXECUTED] += 1
+        return await asyncio.shield(task), EXECUTED
+
+    def _finished(self, scoped: str, task: asyncio.Task):
+        self._running.pop(scoped, None)
+        # Every waiter may have gone away; retrieve the error so it is not reported as unhandled
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Idempotent run failed: {task.exception()}")
+
+    def _check(self, stored_fingerprint: str, fingerprint: str, key: str):
+        if stored_fingerprint != fingerprint:
+            self.counters["conflicts"] += 1
+            raise IdempotencyConflict(f"Idempotency-Key {key!r} was already used for a different request")
+
+    async def _execute(self, scoped: str, fingerprint: str, endpoint: str,
+                       execute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await execute()
+        except BaseException:
+            self.counters["failed"] += 1
+            raise
+        try:
+            await asyncio.to_thread(self._put, scoped, fingerprint, endpoint, json.dumps(result, default=str))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not store the result of an idempotent {endpoint} request: {e}")
+        return result
+
+    # === Storage ===
+
+    def _get(self, scoped: str) -> Optional[Tuple[str, str]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint, value, expires_at, size FROM results WHERE key = ?",
+                                     (scoped,)).fetchone()
+            if row is None:
+                return None
+            fingerprint, value, expires_at, size = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (scoped,))
+                self._bytes -= size
+                self.counters["expired"] += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, scoped))
+            return fingerprint, value
+
+    def _put(self, scoped: str, fingerprint: str, endpoint: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM results WHERE key = ?", (scoped,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (scoped, fingerprint, endpoint, value, size, now, now + self.ttl, now))
+            self._bytes += size - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        """Drop expired results, then the least recently used ones, until under 90% of max_bytes"""
+        expired = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results "
+                                     "WHERE expires_at <= ?", (now,)).fetchone()
+        self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+        self._bytes -= expired[1]
+        self.counters["expired"] += expired[0]
+
+        target = self.max_bytes * 0.9
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed_at").fetchall():
+            if self._bytes <= target:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._bytes -= size
+            removed += 1
+        self.counters["evicted"] += removed
+        if removed:
+            logger.info(f"Evicted {removed} stored result(s) to stay under {self.max_bytes} bytes")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            replayed = self.counters[STORED] + self.counters[ATTACHED]
+            return {
+                **self.counters,
+                "hit_rate": replayed / self.counters["requests"] if self.counters["requests"] else 0.0,
+                "in_flight": len(self._running),
+                "entries": entries,
+                "stored_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,370 @@
+"""
+Persistent job queue for the Business Workflow System
+Runs long workflows in the background with priorities, retries and per-workflow concurrency
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from runtime.scheduler import call_priority
+from storage.ids import new_id
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    workflow TEXT NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,  -- Start of the latest attempt
+    finished_at REAL,
+    first_started_at REAL  -- Start of the first attempt, for wait times
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, available_at, created_at);
+CREATE INDEX IF NOT EXISTS jobs_workflow ON jobs (workflow, status);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobNotFound(KeyError):
+    """Raised when a job ID does not exist"""
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of workflow jobs, surviving restarts
+
+    Every method runs a blocking query; the worker pool and the API call them from
+    worker threads. Finished jobs older than `retention` are pruned every prune_every
+    finishes.
+
+    Args:
+        db_path: Location of the SQLite database file
+        retry_backoff: Seconds before the first retry; doubles with each attempt
+        max_backoff: Upper bound in seconds for the retry delay
+        retention: Seconds a finished job (and its result) is kept
+        prune_every: Finished jobs between retention passes
+    """
+
+    def __init__(self, db_path: Path, retry_backoff: float = 5.0, max_backoff: float = 300.0,
+                 retention: float = 7 * 24 * 3600, prune_every: int = 100):
+        self.db_path = Path(db_path)
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self.prune_every = prune_every
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), isolation_level=None,
+                                     check_same_thread=False, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+        self._finished = 0
+
+    def _migrate(self):
+        """Add columns that queues created by older versions lack"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "first_started_at" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN first_started_at REAL")
+            # The first start of old jobs is lost; the latest one is the closest there is
+            self._conn.execute("UPDATE jobs SET first_started_at = started_at")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # === Submission and inspection ===
+
+    def submit(self, workflow: str, message: Any, priority: int = 0, max_attempts: int = 3) -> Dict[str, Any]:
+        """Queue a workflow run; higher priorities are claimed first"""
+        job_id = new_id("job")
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, workflow, message, status, priority, max_attempts, created_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, workflow, json.dumps(message), QUEUED, int(priority), max(1, int(max_attempts)), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFound(job_id)
+        return _job(row)
+
+    def list(self, status: Optional[str] = None, workflow: Optional[str] = None,
+             limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """List jobs, newest first"""
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if workflow:
+            clauses.append("workflow = ?")
+            params.append(workflow)
+        sql = "SELECT * FROM jobs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params.extend([int(limit), int(offset)])
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_job(row, include_result=False) for row in rows]
+
+    # === Worker side ===
+
+    def claim(self, exclude: List[str] = ()) -> Optional[Dict[str, Any]]:
+        """Mark the highest-priority available job as running and return it"""
+        now = time.time()
+        sql = "SELECT id FROM jobs WHERE status = ? AND available_at <= ?"
+        params: List[Any] = [QUEUED, now]
+        if exclude:
+            sql += f" AND workflow NOT IN ({', '.join('?' for _ in exclude)})"
+            params.extend(exclude)
+        sql += " ORDER BY priority DESC, available_at, created_at LIMIT 1"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(sql, params).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, "
+                        "first_started_at = COALESCE(first_started_at, ?) WHERE id = ?",
+                        (RUNNING, now, now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def next_available_at(self) -> Optional[float]:
+        """When the earliest queued job (e.g. one waiting out a retry delay) becomes available"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(available_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+        return row[0]
+
+    def complete(self, job_id: str, result: Any):
+        self._finish(job_id, SUCCEEDED, result=json.dumps(result, default=str))
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """Record a failed attempt; returns True if the job will be retried"""
+        job = self.get(job_id)
+        if job["status"] != RUNNING:
+            return False
+        if job["attempts"] < job["max_attempts"]:
+            delay = min(self.retry_backoff * 2 ** (job["attempts"] - 1), self.max_backoff)
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ? WHERE id = ? AND status = ?",
+                    (QUEUED, error, time.time() + delay, job_id, RUNNING),
+                )
+            return True
+        self._finish(job_id, FAILED, error=error)
+        return False
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a queued or running job; finished jobs are left as they are"""
+        job = self.get(job_id)
+        if job["status"] not in FINISHED:
+            self._finish(job_id, CANCELLED)
+        return self.get(job_id)
+
+    def recover(self) -> int:
+        """Requeue jobs left running by a previous process, e.g. after a crash"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ? WHERE status = ?",
+                (QUEUED, time.time(), RUNNING),
+            )
+        if cursor.rowcount:
+            logger.warning(f"Requeued {cursor.rowcount} job(s) interrupted by a restart")
+        return cursor.rowcount
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = COALESCE(?, error), finished_at = ? "
+                "WHERE id = ? AND status NOT IN (?, ?, ?)",
+                (status, result, error, time.time(), job_id, *FINISHED),
+            )
+            self._finished += 1
+            due = self._finished % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete jobs that finished more than `retention` seconds ago, returning how many"""
+        with self._lock:
+            removed = self._conn.execute(
+                f"DELETE FROM jobs WHERE finished_at < ? AND status IN ({', '.join('?' for _ in FINISHED)})",
+                (time.time() - self.retention, *FINISHED)).rowcount
+        if removed:
+            logger.info(f"Pruned {removed} finished job(s) from {self.db_path}")
+        return removed
+
+    # === Metrics ===
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait time and run time, per workflow"""
+        now = time.time()
+        with self._lock:
+            counts = self._conn.execute(
+                "SELECT workflow, status, COUNT(*) AS jobs, MIN(created_at) AS oldest "
+                "FROM jobs GROUP BY workflow, status"
+            ).fetchall()
+            timings = self._conn.execute(
+                "SELECT workflow, COUNT(*) AS jobs, AVG(first_started_at - created_at) AS wait, "
+                "MAX(first_started_at - created_at) AS max_wait, AVG(finished_at - started_at) AS run, "
+                "MAX(finished_at - started_at) AS max_run "
+                "FROM jobs WHERE status = ? GROUP BY workflow", (SUCCEEDED,)
+            ).fetchall()
+
+        workflows: Dict[str, Dict[str, Any]] = {}
+        for row in counts:
+            entry = workflows.setdefault(row["workflow"], {"jobs": {}, "oldest_queued_age": 0.0})
+            entry["jobs"][row["status"]] = row["jobs"]
+            if row["status"] == QUEUED:
+                entry["oldest_queued_age"] = now - row["oldest"]
+        for row in timings:
+            workflows.setdefault(row["workflow"], {"jobs": {}, "oldest_queued_age": 0.0}).update({
+                "avg_wait_seconds": row["wait"], "max_wait_seconds": row["max_wait"],
+                "avg_run_seconds": row["run"], "max_run_seconds": row["max_run"],
+            })
+        return {
+            "depth": sum(e["jobs"].get(QUEUED, 0) for e in workflows.values()),
+            "running": sum(e["jobs"].get(RUNNING, 0) for e in workflows.values()),
+            "workflows": workflows,
+        }
+
+
+def _job(row: sqlite3.Row, include_result: bool = True) -> Dict[str, Any]:
+    job = {key: row[key] for key in row.keys() if key not in ("message", "result")}
+    job["message"] = json.loads(row["message"])
+    if include_result and row["result"] is not None:
+        job["result"] = json.loads(row["result"])
+    return job
+
+
+class JobWorkerPool:
+    """
+    Runs queued jobs on the agent runtime
+
+    Queue queries run in worker threads. The dispatcher claims jobs until none is
+    available, then sleeps until the next one comes due (e.g. after a retry delay) or a
+    job is submitted or finishes.
+
+    Args:
+        queue: Where jobs come from
+        runtime: Anything with an async run_workflow(name, message)
+        workers: Maximum jobs running at once across all workflows
+        concurrency: Per-workflow limits, e.g. {"onboarding_workflow": 1}
+        poll_interval: Longest the dispatcher sleeps between checks
+    """
+
+    def __init__(self, queue: JobQueue, runtime: Any, workers: int = 4,
+                 concurrency: Optional[Dict[str, int]] = None, poll_interval: float = 30.0):
+        self.queue = queue
+        self.runtime = runtime
+        self.workers = workers
+        self.concurrency = concurrency or {}
+        self.poll_interval = poll_interval
+        self._running: Dict[str, asyncio.Task] = {}
+        self._per_workflow: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await asyncio.to_thread(self.queue.recover)
+        await asyncio.to_thread(self.queue.prune)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        logger.info(f"Job worker pool started ({self.workers} workers)")
+
+    async def stop(self):
+        """Stop claiming jobs; jobs still running are requeued on the next start"""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._dispatcher
+            self._dispatcher = None
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def submit(self, workflow: str, message: Any, priority: int = 0, max_attempts: int = 3) -> Dict[str, Any]:
+        job = await asyncio.to_thread(self.queue.submit, workflow, message, priority, max_attempts)
+        self._wakeup.set()
+        return job
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        job = await asyncio.to_thread(self.queue.cancel, job_id)
+        task = self._running.get(job_id)
+        if task:
+            task.cancel()
+        return job
+
+    async def _dispatch(self):
+        while True:
+            # Cleared before claiming, so a submit() that arrives meanwhile is not lost
+            self._wakeup.clear()
+            while len(self._running) < self.workers:
+                full = [w for w, limit in self.concurrency.items() if self._per_workflow.get(w, 0) >= limit]
+                job = await asyncio.to_thread(self.queue.claim, full)
+                if job is None:
+                    break
+                self._per_workflow[job["workflow"]] = self._per_workflow.get(job["workflow"], 0) + 1
+                self._running[job["id"]] = asyncio.create_task(self._execute(job))
+
+            # Jobs already available wait for a worker or workflow slot, which wakes us when freed
+            delay = self.poll_interval
+            next_at = await asyncio.to_thread(self.queue.next_available_at)
+            if next_at is not None and next_at > time.time():
+                delay = min(delay, next_at - time.time())
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+
+    async def _execute(self, job: Dict[str, Any]):
+        job_id, workflow = job["id"], job["workflow"]
+        # Jobs yield model calls to interactive requests
+        call_priority.set("background")
+        try:
+            result = await self.runtime.run_workflow(workflow, job["message"])
+        except asyncio.CancelledError:
+            logger.info(f"Job {job_id} ({workflow}) cancelled")
+        except Exception as e:
+            retried = await asyncio.to_thread(self.queue.fail, job_id, str(e) or type(e).__name__)
+            logger.error(f"Job {job_id} ({workflow}) attempt {job['attempts']} failed"
+                         f"{', will retry' if retried else ''}: {e}")
+        else:
+            await asyncio.to_thread(self.queue.complete, job_id, result)
+        finally:
+            self._running.pop(job_id, None)
+            self._per_workflow[workflow] -= 1
+            self._wakeup.set()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {**await asyncio.to_thread(self.queue.stats), "workers": self.workers, "active": len(self._running),
+                "concurrency": self.concurrency}
@@ -0,0 +1,125 @@
+"""
+Workflow registry for the Business Workflow System
+Reads the @fast.* declarations in agents/ and workflows/ without importing them
+"""
+
+import ast
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SOURCE_DIRS = [PROJECT_DIR / "agents", PROJECT_DIR / "workflows"]
+
+# Keyword arguments that reference other agents or workflows
+CHILD_KEYS = ("sequence", "steps", "agents", "fan_out", "fan_in", "generator", "evaluator")
+
+DECORATOR_PATTERN = re.compile(r"^@fast\.(\w+)\(", re.MULTILINE)
+
+
+def _call_source(source: str, start: int) -> Optional[str]:
+    """Return the text of the call expression opening at source[start] ('(')"""
+    depth = 0
+    in_string = None
+    i = start
+    while i < len(source):
+        ch = source[i]
+        if in_string:
+            if source.startswith(in_string, i):
+                i += len(in_string)
+                in_string = None
+                continue
+            if ch == "\\":
+                i += 1
+        elif source.startswith('"""', i) or source.startswith("'''", i):
+            in_string = source[i:i + 3]
+            i += 3
+            continue
+        elif ch in "\"'":
+            in_string = ch
+        elif ch == "#":
+            i = source.find("\n", i)
+            if i < 0:
+                return None
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return source[start:i + 1]
+        i += 1
+    return None
+
+
+def parse_declarations(source: str) -> List[Dict[str, Any]]:
+    """Extract the literal arguments of every @fast.<kind>(...) decorator in a source file"""
+    declarations = []
+    for match in DECORATOR_PATTERN.finditer(source):
+        call = _call_source(source, match.end() - 1)
+        if call is None:
+            continue
+        node = ast.parse(f"f{call}", mode="eval").body
+
+        spec: Dict[str, Any] = {"kind": match.group(1)}
+        positional = [ast.literal_eval(arg) for arg in node.args]
+        if positional:
+            spec["name"] = positional[0]
+        if len(positional) > 1:
+            spec["instruction"] = positional[1]
+        for keyword in node.keywords:
+            try:
+                spec[keyword.arg] = ast.literal_eval(keyword.value)
+            except ValueError:
+                continue
+        if "name" in spec:
+            declarations.append(spec)
+    return declarations
+
+
+class WorkflowRegistry:
+    """Index of declared agents and workflows and the MCP servers each one needs"""
+
+    def __init__(self, source_dirs: Optional[List[Path]] = None):
+        self.declarations: Dict[str, Dict[str, Any]] = {}
+        for directory in source_dirs or SOURCE_DIRS:
+            for path in sorted(Path(directory).glob("*.py")):
+                for spec in parse_declarations(path.read_text()):
+                    spec["source"] = str(path)
+                    self.declarations[spec["name"]] = spec
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.declarations
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.declarations.get(name)
+
+    def children(self, name: str) -> List[str]:
+        """Return the agents and workflows a declaration delegates to"""
+        spec = self.declarations.get(name) or {}
+        children = []
+        for key in CHILD_KEYS:
+            value = spec.get(key)
+            if isinstance(value, str):
+                value = [value]
+            for child in value or []:
+                if child not in children:
+                    children.append(child)
+        return children
+
+    def servers_for(self, name: str) -> List[str]:
+        """Return the MCP servers used anywhere beneath a declaration, in first-use order"""
+        servers: List[str] = []
+        seen: Set[str] = set()
+
+        def visit(node: str):
+            if node in seen:
+                return
+            seen.add(node)
+            for server in (self.declarations.get(node) or {}).get("servers", []):
+                if server not in servers:
+                    servers.append(server)
+            for child in self.children(node):
+                visit(child)
+
+        visit(name)
+        return servers
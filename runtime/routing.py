@@ -0,0 +1,346 @@
+"""
+Workflow routing for the Business Workflow System
+Picks a router's sub-workflow by rules or a local classifier before paying for an LLM call
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import importlib
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from storage.filesystem import DATA_DIR
+from telemetry.metrics import ROUTER_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+ROUTING_PATH = DATA_DIR / "routing.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS routing_decisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    router TEXT NOT NULL,
+    message TEXT NOT NULL,  -- The first excerpt_chars characters, for retraining the classifier
+    target TEXT,
+    source TEXT NOT NULL,
+    confidence REAL,
+    created_at REAL NOT NULL,
+    message_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS routing_decisions_router ON routing_decisions (router, source);
+CREATE INDEX IF NOT EXISTS routing_decisions_created ON routing_decisions (created_at);
+"""
+
+RULE, CLASSIFIER, LLM = "rule", "classifier", "llm"
+
+FEATURE_BUCKETS = 1 << 18
+WORD = re.compile(r"[a-z0-9]+")
+ACTION = re.compile(r"^\s*([\w\-]{1,64})\s*:")
+
+
+def action_of(message: Any) -> Optional[str]:
+    """The action path segment of an endpoint message ("{action}: {data}"), if there is one"""
+    match = ACTION.match(message) if isinstance(message, str) else None
+    return match.group(1).lower() if match else None
+
+
+def message_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def features(text: str) -> List[int]:
+    """Hashed word unigrams and bigrams of a message"""
+    words = WORD.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [zlib.crc32(gram.encode("utf-8")) % FEATURE_BUCKETS for gram in grams]
+
+
+class RouteClassifier:
+    """
+    Multinomial naive Bayes over hashed word features, trained incrementally
+
+    Args:
+        min_examples: Examples a workflow needs before the classifier will pick it
+    """
+
+    def __init__(self, min_examples: int = 5):
+        self.min_examples = min_examples
+        self.examples: Dict[str, int] = {}
+        self.totals: Dict[str, int] = {}
+        self.counts: Dict[str, Dict[int, int]] = {}
+
+    def learn(self, text: str, target: str):
+        counts = self.counts.setdefault(target, {})
+        for feature in features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+            self.totals[target] = self.totals.get(target, 0) + 1
+        self.examples[target] = self.examples.get(target, 0) + 1
+
+    def predict(self, text: str, candidates: List[str]) -> Tuple[Optional[str], float]:
+        """Return the most likely candidate and its posterior probability"""
+        trained = [target for target in candidates if self.examples.get(target, 0) >= self.min_examples]
+        observed = features(text)
+        if len(trained) < 2 or not observed:
+            return None, 0.0
+        examples = sum(self.examples[target] for target in trained)
+        scores = {}
+        for target in trained:
+            counts, total = self.counts[target], self.totals.get(target, 0)
+            score = math.log(self.examples[target] / examples)
+            for feature in observed:
+                score += math.log((counts.get(feature, 0) + 1) / (total + FEATURE_BUCKETS))
+            scores[target] = score
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+class _Fallback:
+    """A decision left to the LLM router, completed once the router has picked a target"""
+
+    __slots__ = ("owner", "router", "text", "row_id", "done")
+
+    def __init__(self, owner: "WorkflowRouter", router: str, text: str, row_id: Optional[int]):
+        self.owner = owner
+        self.router = router
+        self.text = text
+        self.row_id = row_id
+        self.done = False
+
+
+# The LLM fallback of the current run, completed by the patched fast-agent router
+llm_fallback: contextvars.ContextVar[Optional[_Fallback]] = contextvars.ContextVar("llm_fallback", default=None)
+
+
+class WorkflowRouter:
+    """
+    Chooses the sub-workflow for a router declaration without an LLM call when it can
+
+    Decisions are tried in order: the router's rules (action keyword -> workflow, from
+    rules= in its decorator), then a classifier trained on past rule decisions and on
+    the targets the LLM router picked, which must reach `confidence`. Otherwise route()
+    returns None and the LLM router runs as declared; its choice is learned when
+    instrument_llm_router() is installed. Every decision is recorded so the fallback
+    rate can be tracked.
+
+    The log keeps a hash of each message and only its first excerpt_chars characters,
+    which is what the classifier is retrained from on startup (0 keeps no text, so the
+    classifier starts untrained after a restart). Decisions older than max_age or
+    beyond the newest max_rows are pruned every prune_every decisions.
+
+    Args:
+        path: SQLite file for the decision log
+        confidence: Minimum classifier probability to skip the LLM router
+        min_examples: Rule or LLM decisions per workflow before the classifier may pick it
+        history: Past decisions per router replayed into the classifier on startup
+        excerpt_chars: Characters of each message kept in the log
+        max_rows: Decisions to keep
+        max_age: Seconds to keep a decision
+        prune_every: Decisions between retention passes
+    """
+
+    def __init__(self, path: Path = ROUTING_PATH, confidence: float = 0.85,
+                 min_examples: int = 5, history: int = 5000, excerpt_chars: int = 500,
+                 max_rows: int = 100000, max_age: float = 30 * 24 * 3600, prune_every: int = 1000):
+        self.path = Path(path)
+        self.confidence = confidence
+        self.min_examples = min_examples
+        self.excerpt_chars = max(0, excerpt_chars)
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False,
+                                     timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.prune()
+
+        self.classifiers: Dict[str, RouteClassifier] = {}
+        rows = self._conn.execute(
+            "SELECT router, message, target FROM (SELECT *, ROW_NUMBER() OVER "
+            "(PARTITION BY router ORDER BY id DESC) AS recent FROM routing_decisions "
+            "WHERE source IN (?, ?) AND target IS NOT NULL) "
+            "WHERE recent <= ? ORDER BY id", (RULE, LLM, history)).fetchall()
+        for router, message, target in rows:
+            self._classifier(router).learn(message, target)
+
+    def _migrate(self):
+        """Bring logs written by older versions, which kept whole messages, up to the current schema"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(routing_decisions)")}
+        if "message_hash" not in columns:
+            self._conn.execute("ALTER TABLE routing_decisions ADD COLUMN message_hash TEXT")
+            self._conn.execute("UPDATE routing_decisions SET message = substr(message, 1, ?)",
+                               (self.excerpt_chars,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    async def route(self, spec: Dict[str, Any], message: Any) -> Optional[Dict[str, Any]]:
+        """
+        Pick a router's target for a message
+
+        Returns {"workflow", "source", "confidence"}, or None when the LLM router should decide;
+        the target it then picks in this context is logged and learned. The decision is made
+        in memory; only writing it to the log runs in a worker thread.
+        """
+        router, candidates = spec["name"], list(spec.get("agents") or [])
+        text = message if isinstance(message, str) else str(message)
+
+        target = self._match_rules(spec.get("rules") or {}, action_of(text), candidates)
+        if target:
+            self._classifier(router).learn(text, target)
+            return await self._record(router, text, target, RULE, 1.0)
+
+        target, confidence = self._classifier(router).predict(text, candidates)
+        if target and confidence >= self.confidence:
+            return await self._record(router, text, target, CLASSIFIER, confidence)
+
+        row_id = await self._log(router, text, None, LLM, confidence if target else None)
+        ROUTER_DECISIONS.inc(router, LLM)
+        logger.info(f"{router}: no confident local route, falling back to the LLM router")
+        llm_fallback.set(_Fallback(self, router, text, row_id))
+        return None
+
+    @staticmethod
+    def _match_rules(rules: Dict[str, str], action: Optional[str], candidates: List[str]) -> Optional[str]:
+        """The single workflow whose rule keywords appear in the action; ambiguous matches don't count"""
+        if not action:
+            return None
+        words = set(re.split(r"[\-_\s]+", action))
+        matched = {target for keyword, target in rules.items()
+                   if keyword.lower() == action or keyword.lower() in words}
+        matched &= set(candidates)
+        return matched.pop() if len(matched) == 1 else None
+
+    def _classifier(self, router: str) -> RouteClassifier:
+        if router not in self.classifiers:
+            self.classifiers[router] = RouteClassifier(self.min_examples)
+        return self.classifiers[router]
+
+    async def _record(self, router: str, message: str, target: str, source: str,
+                      confidence: float) -> Dict[str, Any]:
+        await self._log(router, message, target, source, confidence)
+        ROUTER_DECISIONS.inc(router, source)
+        logger.info(f"{router}: routed to {target} by {source} (confidence {confidence:.2f})")
+        return {"workflow": target, "source": source, "confidence": confidence}
+
+    async def _log(self, router: str, message: str, target: Optional[str], source: str,
+                   confidence: Optional[float]) -> Optional[int]:
+        """Write a decision to the log in a worker thread, returning its row ID"""
+        row = (router, message[:self.excerpt_chars], message_hash(message), target, source, confidence, time.time())
+        try:
+            return await asyncio.to_thread(self._write, row)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not log the routing decision of {router}: {e}")
+            return None
+
+    async def learn_fallback(self, fallback: _Fallback, target: str):
+        """Train on the target the LLM router picked for a fallback and fill it in on its log row"""
+        self._classifier(fallback.router).learn(fallback.text, target)
+        logger.info(f"{fallback.router}: the LLM router picked {target}")
+        if fallback.row_id is None:
+            return
+        try:
+            await asyncio.to_thread(self._set_target, fallback.row_id, target)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not log the LLM routing decision of {fallback.router}: {e}")
+
+    def _write(self, row: Tuple[Any, ...]) -> int:
+        with self._lock:
+            row_id = self._conn.execute(
+                "INSERT INTO routing_decisions (router, message, message_hash, target, source, confidence, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)", row).lastrowid
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self.prune()
+        return row_id
+
+    def _set_target(self, row_id: int, target: str):
+        with self._lock:
+            self._conn.execute("UPDATE routing_decisions SET target = ? WHERE id = ?", (target, row_id))
+
+    def prune(self) -> int:
+        """Apply the retention limits, returning the number of decisions removed"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM routing_decisions ORDER BY id DESC LIMIT 1 OFFSET ?",
+                                     (self.max_rows,)).fetchone()
+            removed = self._conn.execute(
+                "DELETE FROM routing_decisions WHERE created_at < ? OR id <= ?",
+                (time.time() - self.max_age, row[0] if row else 0)).rowcount
+        if removed:
+            logger.info(f"Pruned {removed} routing decision(s) from {self.path}")
+        return removed
+
+    def stats(self, since: Optional[float] = None) -> Dict[str, Any]:
+        """Decisions per router and source, and the share that fell back to the LLM router"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT router, source, COUNT(*) FROM routing_decisions WHERE created_at >= ? "
+                "GROUP BY router, source", (since or 0.0,)).fetchall()
+        routers: Dict[str, Dict[str, Any]] = {}
+        for router, source, count in rows:
+            routers.setdefault(router, {RULE: 0, CLASSIFIER: 0, LLM: 0})[source] = count
+        for counts in routers.values():
+            total = counts[RULE] + counts[CLASSIFIER] + counts[LLM]
+            counts["fallback_rate"] = counts[LLM] / total if total else 0.0
+        return {
+            "confidence_threshold": self.confidence,
+            "routers": routers,
+            "trained": {router: dict(classifier.examples) for router, classifier in self.classifiers.items()},
+        }
+
+
+def instrument_llm_router() -> Optional[Callable[[], None]]:
+    """
+    Report the targets fast-agent's LLM router picks to the WorkflowRouter that deferred to it
+
+    Patches RouterAgent._route_request, which asks the model for a target before the
+    router dispatches to it. When the run has a pending fallback for that router (see
+    WorkflowRouter.route), the target is learned. Returns a function that removes the
+    patch, or None if fast-agent's router agent cannot be found.
+    """
+    router_agent = None
+    for module in ("fast_agent.agents.workflow.router_agent", "mcp_agent.agents.workflow.router_agent"):
+        try:
+            router_agent = importlib.import_module(module).RouterAgent
+            break
+        except (ImportError, AttributeError):
+            continue
+    if router_agent is None:
+        logger.warning("fast-agent's router agent was not found; routing is learned from rules only")
+        return None
+
+    route_request = router_agent._route_request
+
+    async def learning_route_request(self, *args, **kwargs):
+        result = await route_request(self, *args, **kwargs)
+        route = result[0] if isinstance(result, tuple) else result
+        target = getattr(route, "agent", None)
+        fallback = llm_fallback.get()
+        if (fallback is not None and not fallback.done and fallback.router == self.name
+                and target in getattr(self, "agent_map", {})):
+            fallback.done = True
+            await fallback.owner.learn_fallback(fallback, target)
+        return result
+
+    router_agent._route_request = learning_route_request
+
+    def remove():
+        router_agent._route_request = route_request
+
+    return remove
@@ -0,0 +1,441 @@
+"""
+Model-call scheduler for the Business Workflow System
+Shares the model provider's rate limits across every workflow with priorities and AIMD backoff
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telemetry.metrics import MODEL_CALL_SECONDS, MODEL_QUEUE_WAIT_SECONDS, MODEL_RETRIES, MODEL_TOKENS
+from telemetry.tracing import annotate, span
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first; interactive requests jump ahead of queued background work
+PRIORITY_CLASSES = {"interactive": 0, "batch": 1, "background": 2}
+
+# Share of the concurrency limit each class may occupy, so background work always leaves
+# headroom for interactive requests
+PRIORITY_SHARE = {0: 1.0, 1: 0.9, 2: 0.75}
+
+# Priority class of model calls made by the current task; set by API routes and job workers
+call_priority: contextvars.ContextVar[str] = contextvars.ContextVar("call_priority", default="interactive")
+
+# Agent whose turn the current task is running; set by ScheduledAgent, used to label model requests
+call_agent: contextvars.ContextVar[str] = contextvars.ContextVar("call_agent", default="")
+
+OVERLOAD_STATUS_CODES = (429, 529)
+
+
+def estimate_tokens(text: Any) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text if isinstance(text, str) else str(text)) // 4)
+
+
+def request_tokens(arguments: Dict[str, Any]) -> int:
+    """Rough input token count of a Messages API request: system prompt, messages and tools"""
+    return estimate_tokens(json.dumps([arguments.get(key) for key in ("system", "messages", "tools")],
+                                      default=str))
+
+
+def usage_of(response: Any) -> Optional[Tuple[int, int]]:
+    """(input, output) tokens the provider reports for a response, if it reports them"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return getattr(usage, "input_tokens", 0) or 0, getattr(usage, "output_tokens", 0) or 0
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether an error is the provider asking us to slow down (rate limit or overload)"""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status in OVERLOAD_STATUS_CODES:
+        return True
+    name = type(error).__name__
+    return "RateLimit" in name or "Overloaded" in name
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """The provider's Retry-After hint in seconds, if the error carries one"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills continuously at rate_per_minute up to one minute's worth
+
+    The level may go negative when actual usage turns out higher than reserved;
+    callers then wait for it to refill.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than the capacity wait for a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+
+class ModelCallScheduler:
+    """
+    Process-wide gate in front of every request to the model provider
+
+    A request waits until it is the highest-priority waiter, a concurrency slot is free
+    and both token buckets can cover it. The concurrency limit follows AIMD: it grows by
+    one per limit's worth of successful requests and halves when the provider answers 429
+    or overloaded, after which only that request is sent again. Requests are scheduled
+    one by one (see instrument_anthropic), so an agent turn that makes several requests
+    with tool calls in between holds a slot only while a request is in flight.
+
+    Args:
+        requests_per_minute: Request bucket rate (None for no limit)
+        tokens_per_minute: Input+output token bucket rate (None for no limit)
+        max_concurrency: Upper bound for the adaptive concurrency limit
+        min_concurrency: Lower bound for the adaptive concurrency limit
+        max_retries: Retries of a request rejected as rate limited or overloaded
+        backoff: Seconds to pause all requests after an overload without a Retry-After hint
+        decrease_cooldown: Seconds after a decrease during which further overloads don't halve again
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_concurrency: int = 8, min_concurrency: int = 1, max_retries: int = 4,
+                 backoff: float = 2.0, decrease_cooldown: float = 1.0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.decrease_cooldown = decrease_cooldown
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future, int]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "overloaded": 0, "retries": 0}
+        self.wait_seconds = {name: 0.0 for name in PRIORITY_CLASSES}
+        self.granted = {name: 0 for name in PRIORITY_CLASSES}
+
+    async def call(self, request: Callable[[], Awaitable[Any]], tokens: int = 1,
+                   priority: Optional[str] = None, agent: Optional[str] = None) -> Any:
+        """
+        Send one model request once the scheduler admits it
+
+        request() must make exactly one provider request; it is called again for each
+        retry after a rate-limit or overload response.
+
+        Args:
+            request: Makes the request and returns the response
+            tokens: Estimated input tokens, reserved from the token bucket
+            priority: Priority class (defaults to call_priority)
+            agent: Agent label for metrics (defaults to call_agent)
+        """
+        agent = call_agent.get() if agent is None else agent
+        with span("model_request", "model"):
+            response, started = await self._admit(request, tokens, self._priority_class(priority), agent)
+            self._complete(started, agent, tokens, response)
+            return response
+
+    # === Admission ===
+
+    def _priority_class(self, priority: Optional[str]) -> str:
+        priority_class = priority or call_priority.get()
+        if priority_class not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority_class!r}")
+        return priority_class
+
+    async def _admit(self, request: Callable[[], Awaitable[Any]], tokens: int, priority_class: str,
+                     agent: str) -> Tuple[Any, float]:
+        """Run request() in a slot, retrying it on overload; returns its result with the slot still held"""
+        self.counters["calls"] += 1
+        annotate(priority=priority_class, input_tokens=tokens)
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            waited += await self._acquire(priority_class, tokens)
+            annotate(attempts=attempt + 1, queue_wait_ms=round(waited * 1000, 3))
+            started = time.perf_counter()
+            try:
+                return await request(), started
+            except Exception as e:
+                overloaded = is_overload(e)
+                MODEL_CALL_SECONDS.observe(time.perf_counter() - started, agent,
+                                           "overloaded" if overloaded else "error")
+                # Pause before freeing the slot, or the next waiter goes straight out into the limit
+                if overloaded:
+                    self._on_overload(e)
+                self._release()
+                if not overloaded or attempt == self.max_retries:
+                    self.counters["failed"] += 1
+                    raise
+                self.counters["retries"] += 1
+                MODEL_RETRIES.inc(agent)
+            except BaseException:
+                self._release()
+                raise
+
+    def _complete(self, started: float, agent: str, tokens: int, response: Any = None,
+                  error: Optional[BaseException] = None):
+        """Record how a request held since `started` went, then release its slot"""
+        if error is not None:
+            self.counters["failed"] += 1
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - started, agent, "error")
+            if is_overload(error):
+                self._on_overload(error)
+        else:
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - started, agent, "ok")
+            self._on_success(response, agent, tokens)
+        self._release()
+
+    async def _acquire(self, priority_class: str, tokens: int) -> float:
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITY_CLASSES[priority_class], next(self._sequence), future, tokens))
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # Admitted just as we were cancelled
+            else:
+                future.cancel()
+                self._pump()
+            raise
+        waited = time.monotonic() - started
+        self.wait_seconds[priority_class] += waited
+        MODEL_QUEUE_WAIT_SECONDS.observe(waited, priority_class)
+        self.granted[priority_class] += 1
+        return waited
+
+    def _release(self):
+        self.in_flight -= 1
+        self._pump()
+
+    def _pump(self):
+        """Admit waiters in priority order for as long as limits allow"""
+        now = time.monotonic()
+        while self._waiters:
+            priority, _, future, tokens = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= max(1, int(self.limit * PRIORITY_SHARE[priority])):
+                return  # A release will pump again
+
+            wait = self._paused_until - now
+            if self.requests:
+                wait = max(wait, self.requests.wait_time(1, now))
+            if self.tokens:
+                wait = max(wait, self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            heapq.heappop(self._waiters)
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens:
+                self.tokens.take(tokens, now)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+
+    # === Feedback ===
+
+    def _on_success(self, response: Any, agent: str = "", reserved: int = 0):
+        self.counters["succeeded"] += 1
+        usage = usage_of(response)
+        input_tokens, output_tokens = usage if usage else (reserved, estimate_tokens(response))
+        MODEL_TOKENS.inc(agent, "input", amount=input_tokens)
+        MODEL_TOKENS.inc(agent, "output", amount=output_tokens)
+        annotate(input_tokens=input_tokens, output_tokens=output_tokens)
+        if self.tokens:
+            # Only the input estimate was reserved up front; settle the difference now
+            self.tokens.take(input_tokens - reserved + output_tokens, time.monotonic())
+        self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+
+    def _on_overload(self, error: BaseException):
+        self.counters["overloaded"] += 1
+        now = time.monotonic()
+        pause = retry_after(error) or self.backoff
+        self._paused_until = max(self._paused_until, now + pause)
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self._last_decrease = now
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            logger.warning(f"Model provider overloaded ({error}); concurrency limit now "
+                           f"{int(self.limit)}, pausing {pause:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        queued = {name: 0 for name in PRIORITY_CLASSES}
+        names = {value: name for name, value in PRIORITY_CLASSES.items()}
+        for priority, _, future, _ in self._waiters:
+            if not future.done():
+                queued[names[priority]] += 1
+        return {
+            **self.counters,
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": queued,
+            "avg_wait_seconds": {name: self.wait_seconds[name] / self.granted[name] if self.granted[name] else 0.0
+                                 for name in PRIORITY_CLASSES},
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+
+# === Provider hook ===
+
+class _ScheduledStream:
+    """
+    Stands in for the stream manager messages.stream() returns
+
+    The request is admitted (and retried) when the stream is entered, and its slot is
+    held until the stream is closed.
+    """
+
+    def __init__(self, scheduler: ModelCallScheduler, open_stream: Callable[[], Any], tokens: int):
+        self._scheduler = scheduler
+        self._open = open_stream
+        self._tokens = tokens
+        self._agent = call_agent.get()
+        self._span = contextlib.ExitStack()
+        self._manager = None
+        self._stream = None
+        self._started = 0.0
+
+    async def _enter(self) -> Tuple[Any, Any]:
+        manager = self._open()
+        return manager, await manager.__aenter__()
+
+    async def __aenter__(self) -> Any:
+        self._span.enter_context(span("model_request", "model"))
+        try:
+            priority_class = self._scheduler._priority_class(None)
+            (self._manager, self._stream), self._started = await self._scheduler._admit(
+                self._enter, self._tokens, priority_class, self._agent)
+        except BaseException as e:
+            self._span.__exit__(type(e), e, e.__traceback__)
+            raise
+        return self._stream
+
+    async def __aexit__(self, exc_type, exc, tb) -> Optional[bool]:
+        try:
+            return await self._manager.__aexit__(exc_type, exc, tb)
+        finally:
+            try:
+                message = self._stream.current_message_snapshot
+            except (AssertionError, AttributeError):
+                message = None  # Closed before the first event arrived
+            self._scheduler._complete(self._started, self._agent, self._tokens, message,
+                                      exc if exc_type is not None and issubclass(exc_type, Exception) else None)
+            self._span.__exit__(exc_type, exc, tb)
+
+
+def instrument_anthropic(scheduler: ModelCallScheduler) -> Optional[Callable[[], None]]:
+    """
+    Send every Anthropic Messages API request through the scheduler
+
+    Patches the SDK's async messages resource, which fast-agent's Anthropic provider
+    calls once per LLM turn, so each request is admitted, rate-limited and retried on
+    its own; the tool calls between turns are never repeated. The SDK's built-in retries
+    are turned off for these requests so the scheduler alone decides when to resend.
+    Returns a function that removes the patch, or None if the SDK is not installed.
+    """
+    try:
+        from anthropic.resources.messages import AsyncMessages
+    except ImportError:
+        logger.warning("anthropic is not installed; model requests will not be scheduled")
+        return None
+
+    create, stream = AsyncMessages.create, AsyncMessages.stream
+    # One retry-free copy of each client, sharing its connection pool
+    resources: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+
+    def without_retries(messages: Any) -> Any:
+        client = messages._client
+        if client not in resources:
+            resources[client] = AsyncMessages(client.with_options(max_retries=0))
+        return resources[client]
+
+    async def scheduled_create(self, *args, **kwargs):
+        target = without_retries(self)
+        return await scheduler.call(lambda: create(target, *args, **kwargs), request_tokens(kwargs))
+
+    def scheduled_stream(self, *args, **kwargs):
+        target = without_retries(self)
+        return _ScheduledStream(scheduler, lambda: stream(target, *args, **kwargs), request_tokens(kwargs))
+
+    AsyncMessages.create, AsyncMessages.stream = scheduled_create, scheduled_stream
+
+    def remove():
+        AsyncMessages.create, AsyncMessages.stream = create, stream
+
+    return remove
+
+
+class ScheduledAgent:
+    """
+    Wraps the fast-agent application to label each agent call
+
+    Each call gets an "agent" span and sets call_agent, so the model requests it makes
+    (scheduled by instrument_anthropic) are traced and counted under the agent.
+    """
+
+    def __init__(self, agent: Any, scheduler: ModelCallScheduler):
+        self._agent = agent
+        self._scheduler = scheduler
+
+    def __getattr__(self, name: str) -> Any:
+        return _ScheduledProxy(getattr(self._agent, name), self._scheduler, name)
+
+
+class _ScheduledProxy:
+    def __init__(self, proxy: Any, scheduler: ModelCallScheduler, name: str = ""):
+        self._proxy = proxy
+        self._scheduler = scheduler
+        self._name = name
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._proxy, name)
+
+    async def __call__(self, message: Any) -> Any:
+        return await self.send(message)
+
+    async def send(self, message: Any) -> Any:
+        token = call_agent.set(self._name)
+        try:
+            with span(self._name, "agent"):
+                return await self._proxy.send(message)
+        finally:
+            call_agent.reset(token)
@@ -0,0 +1,284 @@
+"""
+MCP server management for the Business Workflow System
+Starts each workflow's MCP servers on first use and keeps them warm until they go idle
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import fast_agent as fast
+import yaml
+
+from runtime.registry import PROJECT_DIR, WorkflowRegistry
+from telemetry.metrics import AGENT_APP_START_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = PROJECT_DIR / "fastagent.config.yaml"
+
+# Starts a fast-agent application holding the named declarations: an async context manager
+# that yields the application, spawning the MCP servers those declarations list
+AppFactory = Callable[[List[str]], Any]
+
+
+def load_server_config(config_path: Path = CONFIG_PATH) -> Dict[str, Dict[str, Any]]:
+    """Read the MCP servers declared in fastagent.config.yaml"""
+    with open(config_path, "r") as f:
+        config = yaml.safe_load(f) or {}
+    return dict((config.get("mcp") or {}).get("servers") or {})
+
+
+def scoped_run(agents: List[str], config_path: Path = CONFIG_PATH):
+    """
+    fast.run() limited to the named declarations
+
+    fast-agent creates every declaration it holds when it starts, and each agent spawns
+    the servers in its servers=[...]. A separate FastAgent holding only `agents` (copied
+    from the shared one) therefore starts only the servers they use.
+    """
+    scoped = fast.FastAgent("business-workflow", config_path=str(config_path), parse_cli_args=False)
+    scoped.agents = {name: fast.agents[name] for name in agents if name in fast.agents}
+    return scoped.run()
+
+
+class WarmApp:
+    """
+    One running application for a set of MCP servers
+
+    The application is entered and exited by its own task, since the MCP sessions inside
+    it must be closed by the task that opened them.
+    """
+
+    def __init__(self, servers: Tuple[str, ...], agents: List[str]):
+        self.servers = servers
+        self.agents = agents
+        self.app: Any = None
+        self.leases = 0
+        self.runs = 0
+        self.started_at: Optional[float] = None
+        self.start_seconds: Optional[float] = None
+        self.last_used = time.monotonic()
+        self.retired = False
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Future] = None
+        self._closing = asyncio.Event()
+
+    async def start(self, factory: AppFactory, timeout: float):
+        loop = asyncio.get_running_loop()
+        self._ready = loop.create_future()
+        self._task = asyncio.create_task(self._serve(factory))
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready), timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _serve(self, factory: AppFactory):
+        started = time.perf_counter()
+        try:
+            async with factory(self.agents) as app:
+                self.app = app
+                self.start_seconds = time.perf_counter() - started
+                self.started_at = time.time()
+                self._ready.set_result(app)
+                await self._closing.wait()
+        except asyncio.CancelledError:
+            raise  # Startup timed out
+        except Exception as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            else:
+                logger.error(f"Error closing the application for {', '.join(self.servers) or 'no servers'}: {e}")
+        finally:
+            self.app = None
+
+    async def close(self):
+        self._closing.set()
+        if self._task is not None:
+            if not self._ready.done():
+                self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await self._task
+
+    @property
+    def idle_seconds(self) -> float:
+        return 0.0 if self.leases else time.monotonic() - self.last_used
+
+
+class ServerManager:
+    """
+    Starts MCP servers per workflow on first use and keeps them warm
+
+    A workflow's servers are those listed in servers=[...] by the agents beneath it.
+    Workflows that need the same set share one fast-agent application, started on first
+    use with only the declarations those servers can serve (see scoped_run), so each
+    application spawns just that set, one process per server. Applications no run has
+    used for idle_timeout seconds are closed, along with their servers. Cold-start time
+    and live processes are reported per workflow.
+
+    Args:
+        registry: Declared agents and workflows used to resolve server requirements
+        config_path: fastagent.config.yaml, for the configured servers
+        app_factory: Starts an application for a list of declarations (scoped_run if omitted)
+        idle_timeout: Seconds an unused application is kept warm
+        startup_timeout: Seconds to wait for an application to come up
+    """
+
+    def __init__(self, registry: Optional[WorkflowRegistry] = None, config_path: Path = CONFIG_PATH,
+                 app_factory: Optional[AppFactory] = None, idle_timeout: float = 300.0,
+                 startup_timeout: float = 60.0):
+        self.registry = registry or WorkflowRegistry()
+        self.config = load_server_config(config_path)
+        self.app_factory = app_factory or (lambda agents: scoped_run(agents, config_path))
+        self.idle_timeout = idle_timeout
+        self.startup_timeout = startup_timeout
+
+        self.apps: Dict[Tuple[str, ...], WarmApp] = {}
+        self._starting: Dict[Tuple[str, ...], asyncio.Lock] = {}
+        self._retired: List[WarmApp] = []
+        self._evictor: Optional[asyncio.Task] = None
+        self.cold_starts = 0
+        self.evictions = 0
+        self.start_total = 0.0
+        self.workflow_runs: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def servers(self) -> List[str]:
+        """Every MCP server in the configuration"""
+        return list(self.config)
+
+    @property
+    def used(self) -> List[str]:
+        """The configured servers some declared agent uses, i.e. that may be started"""
+        used: List[str] = []
+        for spec in self.registry.declarations.values():
+            if spec.get("kind") != "agent":
+                continue
+            for server in spec.get("servers", []):
+                if server in self.config and server not in used:
+                    used.append(server)
+        return used
+
+    def servers_for(self, workflow: str) -> List[str]:
+        """Return the configured MCP servers a workflow uses"""
+        return [s for s in self.registry.servers_for(workflow) if s in self.config]
+
+    def agents_for(self, servers: Tuple[str, ...]) -> List[str]:
+        """Every declaration whose agents need no servers beyond `servers`"""
+        return [name for name in self.registry.declarations if set(self.servers_for(name)) <= set(servers)]
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Start closing idle applications in the background"""
+        if self._evictor is None:
+            self._evictor = asyncio.create_task(self._evict_loop())
+
+    async def close(self):
+        """Close every application and stop the eviction loop"""
+        if self._evictor:
+            self._evictor.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._evictor
+            self._evictor = None
+        apps, self.apps = list(self.apps.values()) + self._retired, {}
+        self._retired = []
+        await asyncio.gather(*(app.close() for app in apps))
+
+    @contextlib.asynccontextmanager
+    async def lease(self, workflow: str) -> AsyncIterator[Any]:
+        """Use the application serving a workflow for one run, starting it if it is not warm"""
+        key = tuple(sorted(self.servers_for(workflow)))
+        warm = await self._get(key, workflow)
+        warm.leases += 1
+        warm.runs += 1
+        runs = self.workflow_runs.setdefault(workflow, {"runs": 0, "cold_starts": 0, "last_cold_start_ms": None})
+        runs["runs"] += 1
+        try:
+            yield warm.app
+        finally:
+            warm.leases -= 1
+            warm.last_used = time.monotonic()
+            if warm.retired and not warm.leases and warm in self._retired:
+                self._retired.remove(warm)
+                await warm.close()
+
+    async def _get(self, key: Tuple[str, ...], workflow: str) -> WarmApp:
+        warm = self.apps.get(key)
+        if warm is not None:
+            return warm
+        async with self._starting.setdefault(key, asyncio.Lock()):
+            warm = self.apps.get(key)
+            if warm is not None:
+                return warm
+            warm = WarmApp(key, self.agents_for(key))
+            await warm.start(self.app_factory, self.startup_timeout)
+            self.apps[key] = warm
+        self.cold_starts += 1
+        self.start_total += warm.start_seconds
+        AGENT_APP_START_SECONDS.observe(warm.start_seconds)
+        runs = self.workflow_runs.setdefault(workflow, {"runs": 0, "cold_starts": 0, "last_cold_start_ms": None})
+        runs["cold_starts"] += 1
+        runs["last_cold_start_ms"] = round(warm.start_seconds * 1000, 1)
+        logger.info(f"Started MCP servers {', '.join(key) or '(none)'} for {workflow} "
+                    f"in {warm.start_seconds * 1000:.0f}ms ({len(warm.agents)} declarations)")
+        return warm
+
+    async def retire(self, servers: Tuple[str, ...]):
+        """Replace an application (e.g. one with a dead server): new runs start a fresh one"""
+        warm = self.apps.pop(servers, None)
+        if warm is None:
+            return
+        if warm.leases:
+            warm.retired = True
+            self._retired.append(warm)  # Closed once its last run finishes
+        else:
+            await warm.close()
+
+    async def evict_idle(self) -> int:
+        """Close applications unused for idle_timeout seconds, returning how many were closed"""
+        idle = [key for key, warm in self.apps.items() if not warm.leases and warm.idle_seconds >= self.idle_timeout]
+        for key in idle:
+            warm = self.apps.pop(key)
+            logger.info(f"Closing idle MCP servers {', '.join(key) or '(none)'} "
+                        f"after {warm.idle_seconds:.0f}s unused")
+            await warm.close()
+        self.evictions += len(idle)
+        return len(idle)
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, min(30.0, self.idle_timeout / 4)))
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Error closing idle MCP servers: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        live = {server for key in self.apps for server in key}
+        return {
+            "configured": self.servers,
+            "used": self.used,
+            "unused": [s for s in self.servers if s not in self.used],
+            "live_servers": sorted(live),
+            # Applications for different sets each spawn their own process per server
+            "live_processes": sum(len(key) for key in self.apps),
+            "idle_timeout": self.idle_timeout,
+            "cold_starts": self.cold_starts,
+            "avg_cold_start_ms": round(self.start_total / self.cold_starts * 1000, 1) if self.cold_starts else None,
+            "evictions": self.evictions,
+            "apps": [{"servers": list(key), "declarations": len(warm.agents), "in_use": warm.leases,
+                      "runs": warm.runs, "idle_seconds": round(warm.idle_seconds, 1),
+                      "start_ms": round(warm.start_seconds * 1000, 1) if warm.start_seconds is not None else None}
+                     for key, warm in self.apps.items()],
+            "workflows": {
+                workflow: {**runs, "servers": self.servers_for(workflow),
+                           "live_processes": len(self.servers_for(workflow))
+                           if tuple(sorted(self.servers_for(workflow))) in self.apps else 0}
+                for workflow, runs in self.workflow_runs.items()
+            },
+        }
@@ -0,0 +1,143 @@
+"""
+Streaming workflow execution for the Business Workflow System
+Runs chains stage by stage and reports progress as events while they run
+"""
+
+import asyncio
+import contextlib
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from runtime.registry import WorkflowRegistry
+from runtime.scheduler import estimate_tokens
+from telemetry.tracing import Span, span
+
+# Marks the end of a stage's output on its delta queue
+_DONE = object()
+
+
+def stages_for(registry: WorkflowRegistry, name: str) -> Tuple[List[str], bool]:
+    """
+    Return the stages a workflow streams as, and whether they are cumulative
+
+    Chains stream one stage per agent in their sequence; every other workflow type is
+    a single stage.
+    """
+    spec = registry.get(name) or {}
+    if spec.get("kind") == "chain" and spec.get("sequence"):
+        return list(spec["sequence"]), bool(spec.get("cumulative", False))
+    return [name], False
+
+
+def cumulative_input(request: str, responses: List[Tuple[str, str]]) -> str:
+    """Build the input a cumulative chain gives its next agent: the request and every response so far"""
+    parts = [f"<fastagent:request>\n{request}\n</fastagent:request>"]
+    parts += [f'<fastagent:response agent="{stage}">\n{output}\n</fastagent:response>'
+              for stage, output in responses]
+    return "\n\n".join(parts)
+
+
+async def stream_stages(agent: Any, stages: List[str], message: Any, cumulative: bool = False,
+                        compactor: Optional[Any] = None,
+                        parent: Optional[Span] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run stages in order, yielding progress events as they happen
+
+    Events:
+        stage_start: {"stage", "index", "total", "prompt_tokens", "full_prompt_tokens"}
+        delta: {"stage", "text"}, a chunk of the stage's output
+        stage_end: {"stage", "index", "elapsed_ms", "chars", "prompt_tokens", "full_prompt_tokens"}
+        result: {"result"}, the workflow's final output
+
+    prompt_tokens estimates the stage's input; full_prompt_tokens is what it would have
+    been without compaction. A compactor (see runtime.compaction) builds the inputs of
+    cumulative chains in place of cumulative_input(). With a parent span (see
+    telemetry.tracing) each stage is traced as its child.
+
+    Closing the generator (e.g. when the client disconnects) cancels the running stage
+    and skips the remaining ones.
+    """
+    request = message if isinstance(message, str) else str(message)
+    responses: List[Tuple[str, str]] = []
+    current = request
+    full_tokens = estimate_tokens(request)
+
+    for index, stage in enumerate(stages):
+        started = time.perf_counter()
+        sizes = {"prompt_tokens": estimate_tokens(current), "full_prompt_tokens": full_tokens}
+        yield {"event": "stage_start", "stage": stage, "index": index, "total": len(stages), **sizes}
+
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(_run_stage(getattr(agent, stage), current, queue, stage, parent))
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _DONE:
+                    break
+                yield {"event": "delta", "stage": stage, "text": chunk}
+            output = await task
+        finally:
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await task
+
+        yield {"event": "stage_end", "stage": stage, "index": index,
+               "elapsed_ms": round((time.perf_counter() - started) * 1000, 1), "chars": len(output), **sizes}
+
+        responses.append((stage, output))
+        if cumulative:
+            full = cumulative_input(request, responses)
+            current = await compactor.build(request, responses) if compactor else full
+            full_tokens = estimate_tokens(full)
+        else:
+            current = output
+            full_tokens = estimate_tokens(output)
+
+    if cumulative:
+        result = "\n\n".join(f'<fastagent:response agent="{stage}">\n{output}\n</fastagent:response>'
+                             for stage, output in responses)
+    else:
+        result = responses[-1][1] if responses else ""
+    yield {"event": "result", "result": result}
+
+
+async def _run_stage(proxy: Any, message: str, queue: asyncio.Queue, stage: str = "",
+                     parent: Optional[Span] = None) -> str:
+    """Send a message to one agent, forwarding its output to the queue as it is produced"""
+    with span(stage, "stage", parent, input_chars=len(message)) as traced:
+        output = await _send_streaming(proxy, message, queue)
+        if traced:
+            traced.attrs["output_chars"] = len(output)
+        return output
+
+
+async def _send_streaming(proxy: Any, message: str, queue: asyncio.Queue) -> str:
+    streamed = False
+
+    def on_chunk(chunk: str):
+        nonlocal streamed
+        if chunk:
+            streamed = True
+            queue.put_nowait(chunk)
+
+    # Agents whose model supports streaming report token deltas through a listener;
+    # for the rest the whole output arrives as one delta when the stage finishes
+    add_listener = getattr(proxy, "add_stream_listener", None)
+    remove = add_listener(on_chunk) if callable(add_listener) else None
+    try:
+        output = await proxy.send(message)
+        output = output if isinstance(output, str) else str(output)
+        if not streamed:
+            on_chunk(output)
+        return output
+    finally:
+        if callable(remove):
+            remove()
+        queue.put_nowait(_DONE)
+
+
+def sse_format(event: Dict[str, Any]) -> str:
+    """Encode an event as a server-sent event"""
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,4 @@
+# Storage package initialization
+# Local-disk storage shared by the API and the filesystem MCP server
+
+from storage.filesystem import FilesystemStore, InvalidPathError
@@ -0,0 +1,43 @@
+"""
+Storage maintenance commands
+
+Usage:
+    python -m storage reindex    Rebuild the metadata index from the files on disk
+    python -m storage compact    Compact the calendar event and task journals
+    python -m storage dedupe     Move artifacts saved before the blob store existed into it
+    python -m storage gc         Delete blobs nothing refers to any more
+"""
+
+import argparse
+import json
+
+from storage.filesystem import BASE_DIR, FilesystemStore
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m storage", description="Storage maintenance commands")
+    parser.add_argument("--base-dir", default=str(BASE_DIR),
+                        help="Business workflow directory (defaults to BUSINESS_WORKFLOW_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("reindex", help="Rebuild the metadata index from the files on disk")
+    commands.add_parser("compact", help="Compact the calendar event and task journals")
+    commands.add_parser("dedupe", help="Move artifacts saved before the blob store existed into it")
+    commands.add_parser("gc", help="Delete blobs nothing refers to any more")
+    args = parser.parse_args()
+
+    store = FilesystemStore(args.base_dir)
+    if args.command == "reindex":
+        print(json.dumps(store.reindex(), indent=2))
+    elif args.command == "compact":
+        print(json.dumps({
+            "events": store.events_journal.compact(),
+            "tasks": store.tasks_journal.compact(),
+        }, indent=2))
+    elif args.command == "dedupe":
+        print(json.dumps(store.deduplicate(), indent=2))
+    elif args.command == "gc":
+        print(json.dumps(store.collect_garbage(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
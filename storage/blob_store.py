@@ -0,0 +1,114 @@
+"""
+Content-addressed blob store for the Business Workflow System
+Keeps one read-only copy of each distinct piece of content, named by its SHA-256
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """
+    Hash-named blobs shared by every view of the stored artifacts
+
+    Views (document and UI asset directories) are hardlinks to a blob, so identical content
+    occupies disk space once no matter how many names it has. Blobs are never modified in
+    place: saving new content under an existing name relinks the name to a different blob.
+
+    Blobs are mode 0444, and a view shares its blob's inode, so saved documents, UI assets
+    and downloads are read-only on disk. That is deliberate: writing to a view in place
+    would change the blob, and every other name for it, underneath its digest. To change
+    a file, save it again through the store, or write a new file and rename it over the
+    name; both replace the link and leave the blob alone.
+
+    Args:
+        directory: Where the blobs live; must be on the same filesystem as the views
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def put(self, data: bytes) -> str:
+        """Store content (if it is not stored already) and return its digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self.path(digest)
+        if blob_path.exists():
+            return digest
+
+        os.makedirs(blob_path.parent, exist_ok=True)
+        temp_path = blob_path.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.chmod(temp_path, 0o444)
+        try:
+            # Never replace an existing blob: other names may be hardlinked to it
+            os.link(temp_path, blob_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            if not blob_path.exists():
+                os.replace(temp_path, blob_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        return digest
+
+    def path(self, digest: str) -> Path:
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return self.directory / digest[:2] / digest
+
+    def get(self, digest: str) -> Optional[Path]:
+        """Return the path of a stored blob, or None if it is missing"""
+        blob_path = self.path(digest)
+        return blob_path if blob_path.is_file() else None
+
+    def link(self, digest: str, destination: Path):
+        """
+        Atomically point a view name at a blob
+
+        The new link is renamed over `destination`, replacing whatever name was there
+        rather than writing into the file it pointed at. Falls back to a copy where the
+        filesystem does not support hardlinks.
+        """
+        temp_path = destination.with_name(f".{destination.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.link(self.path(digest), temp_path)
+        except OSError:
+            shutil.copyfile(self.path(digest), temp_path)
+        os.replace(temp_path, destination)
+
+    def digests(self) -> Iterator[str]:
+        for bucket in self.directory.glob("??"):
+            for blob_path in bucket.iterdir():
+                if not blob_path.name.startswith("."):
+                    yield blob_path.name
+
+    def collect_garbage(self, referenced: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        Delete blobs that no view links to and no index entry references
+
+        Args:
+            referenced: Digests referenced other than by hardlinks (e.g. download index entries)
+        """
+        keep = set(referenced)
+        removed = freed = 0
+        for digest in list(self.digests()):
+            blob_path = self.path(digest)
+            stat = blob_path.stat()
+            if stat.st_nlink > 1 or digest in keep:
+                continue
+            blob_path.unlink()
+            removed += 1
+            freed += stat.st_size
+        if removed:
+            logger.info(f"Removed {removed} unreferenced blob(s) ({freed} bytes) from {self.directory}")
+        return {"blobs": removed, "bytes": freed}
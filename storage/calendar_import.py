@@ -0,0 +1,146 @@
+"""
+Calendar import parsers for the Business Workflow System
+Turns iCalendar (ICS) and JSON Lines payloads into event and task records
+"""
+
+import datetime
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+# iCalendar property -> record field, per component
+EVENT_FIELDS = {
+    "SUMMARY": "title",
+    "DESCRIPTION": "description",
+    "LOCATION": "location",
+    "UID": "uid",
+    "DTSTART": "date",
+    "DTEND": "end_date",
+}
+TASK_FIELDS = {
+    "SUMMARY": "title",
+    "DESCRIPTION": "description",
+    "UID": "uid",
+    "STATUS": "status",
+    "DUE": "due_date",
+    "PRIORITY": "priority",
+}
+DATE_PROPERTIES = ("DTSTART", "DTEND", "DUE")
+
+
+def detect_format(body: str, content_type: str = "") -> str:
+    """Guess whether a payload is ICS or JSONL from its content type or first line"""
+    if "calendar" in content_type:
+        return "ics"
+    if "json" in content_type:
+        return "jsonl"
+    return "ics" if body.lstrip().upper().startswith("BEGIN:VCALENDAR") else "jsonl"
+
+
+def parse(body: str, fmt: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Parse a payload in the given format ("ics" or "jsonl") into (events, tasks)"""
+    if fmt == "ics":
+        return parse_ics(body)
+    if fmt == "jsonl":
+        return parse_jsonl(body)
+    raise ValueError(f"Unsupported import format: {fmt!r}; expected 'ics' or 'jsonl'")
+
+
+def parse_jsonl(body: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Parse one JSON object per line
+
+    A "type" field of "task" marks a task; anything else is an event.
+    """
+    events, tasks = [], []
+    for number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {number} is not a JSON object")
+        kind = record.pop("type", "event")
+        (tasks if kind == "task" else events).append(record)
+    return events, tasks
+
+
+def parse_ics(body: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Parse the VEVENT and VTODO components of an iCalendar document"""
+    events, tasks = [], []
+    current = None
+    fields = None
+    for line in _unfold(body):
+        name, params, value = _split_property(line)
+        if name == "BEGIN" and value.upper() in ("VEVENT", "VTODO"):
+            current = {}
+            fields = EVENT_FIELDS if value.upper() == "VEVENT" else TASK_FIELDS
+        elif name == "END" and current is not None and value.upper() in ("VEVENT", "VTODO"):
+            if value.upper() == "VEVENT":
+                events.append(_finish_event(current))
+            else:
+                tasks.append(_finish_task(current))
+            current = None
+        elif current is not None and name in fields:
+            if name in DATE_PROPERTIES:
+                current[fields[name]] = _ics_date(value)
+                if "VALUE=DATE" in params.upper() or len(value) == 8:
+                    current.setdefault("_all_day", set()).add(name)
+            else:
+                current[fields[name]] = _unescape(value)
+    return events, tasks
+
+
+def _finish_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    all_day = event.pop("_all_day", set())
+    # An all-day DTEND is exclusive in iCalendar, but end_date is inclusive here
+    if "DTEND" in all_day and "end_date" in event:
+        end = datetime.date.fromisoformat(event["end_date"]) - datetime.timedelta(days=1)
+        event["end_date"] = end.isoformat()
+    if event.get("end_date") == event.get("date"):
+        event.pop("end_date", None)
+    return event
+
+
+def _finish_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    task.pop("_all_day", None)
+    if "status" in task:
+        task["status"] = task["status"].lower().replace("needs-action", "pending")
+    return task
+
+
+def _unfold(body: str) -> List[str]:
+    """Join iCalendar continuation lines (those starting with a space or tab)"""
+    lines: List[str] = []
+    for raw in body.splitlines():
+        if raw[:1] in (" ", "\t") and lines:
+            lines[-1] += raw[1:]
+        elif raw.strip():
+            lines.append(raw)
+    return lines
+
+
+def _split_property(line: str) -> Tuple[str, str, str]:
+    """Split "NAME;PARAM=X:value" into its name, parameters and value"""
+    head, _, value = line.partition(":")
+    name, _, params = head.partition(";")
+    return name.upper(), params, value
+
+
+def _ics_date(value: str) -> str:
+    """Convert an iCalendar DATE or DATE-TIME into ISO 8601"""
+    value = value.strip()
+    try:
+        if len(value) == 8:
+            return datetime.datetime.strptime(value, "%Y%m%d").date().isoformat()
+        utc = value.endswith("Z")
+        parsed = datetime.datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    except ValueError:
+        raise ValueError(f"Invalid iCalendar date: {value!r}")
+    return parsed.isoformat() + ("+00:00" if utc else "")
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
@@ -0,0 +1,118 @@
+"""
+Date-range index for calendar events
+Answers overlap queries by scanning only events whose start can reach the query window
+"""
+
+import bisect
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Events are bucketed by duration so a query only looks back as far as the longest
+# event in each bucket could reach; the last bucket holds everything longer
+DURATION_CLASSES = [
+    datetime.timedelta(days=1),
+    datetime.timedelta(days=7),
+    datetime.timedelta(days=31),
+    datetime.timedelta(days=366),
+    datetime.timedelta.max,
+]
+
+
+def parse_when(value: Any, end_of_day: bool = False) -> Optional[datetime.datetime]:
+    """
+    Parse an ISO date or datetime into a naive UTC datetime
+
+    Args:
+        value: The date string (e.g. "2025-06-15" or "2025-06-15T09:30:00+02:00")
+        end_of_day: Treat a bare date as the last instant of that day rather than midnight
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    if end_of_day and "T" not in value and " " not in value:
+        parsed = parsed + datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+    return parsed
+
+
+def event_span(event: Dict[str, Any]) -> Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]:
+    """Return the (start, end) of an event; single-day events end where they start"""
+    start_value = event.get("date") or event.get("start_date")
+    start = parse_when(start_value)
+    if start is None:
+        return None, None
+    end = parse_when(event.get("end_date"), end_of_day=True) or parse_when(start_value, end_of_day=True)
+    return start, max(start, end)
+
+
+class EventIndex:
+    """In-memory interval index of calendar events keyed on start and end"""
+
+    def __init__(self):
+        # Per duration class: sorted list of (start, event_id)
+        self._classes: List[List[Tuple[datetime.datetime, str]]] = [[] for _ in DURATION_CLASSES]
+        # Per event: (start, end, duration class)
+        self._spans: Dict[str, Tuple[datetime.datetime, datetime.datetime, int]] = {}
+        # Events with no parseable date; only returned by unbounded queries
+        self._undated: Dict[str, None] = {}
+
+    def __len__(self) -> int:
+        return len(self._spans) + len(self._undated)
+
+    def add(self, event_id: str, start: Optional[datetime.datetime], end: Optional[datetime.datetime]):
+        """Insert or move an event"""
+        self.remove(event_id)
+        if start is None:
+            self._undated[event_id] = None
+            return
+        end = end or start
+        duration = end - start
+        bucket = next(i for i, limit in enumerate(DURATION_CLASSES) if duration <= limit)
+        bisect.insort(self._classes[bucket], (start, event_id))
+        self._spans[event_id] = (start, end, bucket)
+
+    def remove(self, event_id: str):
+        self._undated.pop(event_id, None)
+        span = self._spans.pop(event_id, None)
+        if span:
+            entries = self._classes[span[2]]
+            i = bisect.bisect_left(entries, (span[0], event_id))
+            if i < len(entries) and entries[i] == (span[0], event_id):
+                del entries[i]
+
+    def query(self, start: Optional[datetime.datetime] = None,
+              end: Optional[datetime.datetime] = None) -> List[str]:
+        """
+        Return the IDs of events overlapping [start, end], ordered by start
+
+        Either bound may be omitted for an open-ended query; with neither, every event
+        (including undated ones) is returned.
+        """
+        if start is None and end is None:
+            dated = sorted((s, event_id) for event_id, (s, _, _) in self._spans.items())
+            return [event_id for _, event_id in dated] + list(self._undated)
+
+        matches = []
+        for bucket, entries in enumerate(self._classes):
+            if end is not None:
+                hi = bisect.bisect_right(entries, (end, "\uffff"))
+            else:
+                hi = len(entries)
+
+            if start is None:
+                lo = 0
+            elif DURATION_CLASSES[bucket] == datetime.timedelta.max:
+                lo = 0
+            else:
+                lo = bisect.bisect_left(entries, (start - DURATION_CLASSES[bucket], ""))
+
+            for event_start, event_id in entries[lo:hi]:
+                if start is None or self._spans[event_id][1] >= start:
+                    matches.append((event_start, event_id))
+
+        matches.sort()
+        return [event_id for _, event_id in matches]
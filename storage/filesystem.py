@@ -0,0 +1,698 @@
+"""
+Filesystem storage for the Business Workflow System
+Plain in-process library used directly by the API and wrapped by the filesystem MCP server
+"""
+
+import json
+import os
+import datetime
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+from storage.blob_store import BlobStore
+from storage.calendar_index import EventIndex, event_span, parse_when
+from storage.ids import new_id
+from storage.journal import Journal
+from storage.metadata_index import MetadataIndex
+from storage.task_index import TaskIndex
+
+# Determine user's home directory
+HOME_DIR = Path.home()
+
+# Allow configuring the base directory via environment variable or default to user-specified location
+if platform.system() == "Windows":
+    DEFAULT_BASE_DIR = HOME_DIR / "TechShit" / "businesses"
+else:
+    DEFAULT_BASE_DIR = HOME_DIR / "TechShit" / "businesses"
+
+# Use environment variable if set, otherwise use default
+BASE_DIR = Path(os.environ.get("BUSINESS_WORKFLOW_DIR", str(DEFAULT_BASE_DIR)))
+
+# Business data and the API's persistent stores
+DATA_DIR = BASE_DIR / "data"
+
+
+# Sidecar reads during reindex are independent, so larger directories are read in parallel
+SIDECAR_BATCH = 32
+SIDECAR_WORKERS = 8
+
+
+class InvalidPathError(ValueError):
+    """Raised when a caller-supplied name would escape its storage directory"""
+
+
+def safe_name(name: str) -> str:
+    """Validate a single path component supplied by a caller"""
+    if (not name or name in (".", "..") or "/" in name or "\\" in name
+            or "\x00" in name or ":" in name):
+        raise InvalidPathError(f"Invalid path component: {name!r}")
+    return name
+
+
+def _prepare_record(record: Dict[str, Any], prefix: str) -> str:
+    """Assign an ID (if the record has none) and an update time to a calendar record"""
+    if "id" not in record:
+        record["id"] = new_id(prefix)
+
+    record_id = str(record["id"])
+    safe_name(f"{prefix}_{record_id}.json")
+    record["updated_at"] = datetime.datetime.now().isoformat()
+    return record_id
+
+
+class FilesystemStore:
+    """Stores business data, documents, calendar entries, UI assets and downloads on local disk"""
+
+    def __init__(self, base_dir: Optional[Path] = None):
+        self.base_dir = Path(base_dir) if base_dir else BASE_DIR
+
+        # Directory for storing business data
+        self.data_dir = self.base_dir / "data"
+        # Subdirectories
+        self.documents_dir = self.data_dir / "documents"
+        self.business_data_dir = self.data_dir / "business"
+        self.calendar_dir = self.data_dir / "calendar"
+        self.ui_assets_dir = self.data_dir / "ui_assets"
+        self.downloads_dir = self.data_dir / "downloads"  # For user downloads
+
+        # Ensure directories exist
+        self._ensure_directories()
+
+        # Every saved artifact's content is stored once, by hash; the document and UI asset
+        # directories hardlink to it and downloads reference it from the index
+        self.blobs = BlobStore(self.data_dir / "blobs")
+
+        # Catalog of documents, downloads and UI assets; built from disk the first time
+        self.index = MetadataIndex(self.data_dir / "metadata.db")
+        if self.index.created:
+            self.reindex()
+
+        # Calendar events and tasks live in append-only journals; their download files are
+        # only written when someone asks for them
+        self._calendar_lock = threading.Lock()
+        self._events = EventIndex()
+        self._tasks = TaskIndex()
+        self._calendar_downloads: Dict[Tuple[str, str], str] = {}
+        # (subtype, filename) -> (journal position, blob digest) of materialized calendar downloads
+        self._materialized: Dict[Tuple[str, str], Tuple[Tuple[int, int, int], str]] = {}
+        self.events_journal = Journal(self.calendar_dir / "journal" / "events")
+        self.tasks_journal = Journal(self.calendar_dir / "journal" / "tasks")
+        self.events_journal.subscribe(self._on_event)
+        self.tasks_journal.subscribe(self._on_task)
+        self._migrate_calendar_files()
+        for journal in (self.events_journal, self.tasks_journal):
+            for key, value in journal.items():
+                (self._on_event if journal is self.events_journal else self._on_task)(key, value)
+
+    def _ensure_directories(self):
+        """Ensure required directories exist"""
+        directories = [self.documents_dir, self.business_data_dir, self.calendar_dir,
+                       self.ui_assets_dir, self.downloads_dir]
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+
+        # Create a blank .keep file to ensure Git tracks the directories
+        for directory in directories:
+            keep_file = directory / ".keep"
+            if not keep_file.exists():
+                with open(keep_file, "w") as f:
+                    f.write("# This file ensures the directory is tracked by Git")
+
+    # === Business data ===
+
+    def save_business_data(self, data: Dict[str, Any], category: str) -> Path:
+        """Save business data to a JSON file"""
+        # Add timestamp
+        data["updated_at"] = datetime.datetime.now().isoformat()
+
+        # Create file path
+        file_path = self.business_data_dir / f"{safe_name(category)}.json"
+
+        # Save data
+        with open(file_path, "w") as f:
+            json.dump(data, f, indent=2)
+
+        return file_path
+
+    def get_business_data(self, category: str) -> Optional[Dict[str, Any]]:
+        """Get business data from a JSON file, or None if the category has none"""
+        file_path = self.business_data_dir / f"{safe_name(category)}.json"
+
+        if not file_path.exists():
+            return None
+
+        with open(file_path, "r") as f:
+            return json.load(f)
+
+    def list_business_data(self) -> List[str]:
+        """List all business data categories"""
+        files = list(self.business_data_dir.glob("*.json"))
+        return [f.stem for f in files if not f.stem.startswith(".")]
+
+    # === Documents ===
+
+    def save_document(self, content: str, filename: str,
+                      document_type: str, metadata: Optional[Dict[str, Any]] = None) -> Path:
+        """
+        Save a document to the filesystem
+
+        The file is a read-only hardlink to the content's blob (see BlobStore); saving again
+        under the same name replaces the link.
+        """
+        # Create document type directory if it doesn't exist
+        doc_dir = self.documents_dir / safe_name(document_type)
+        os.makedirs(doc_dir, exist_ok=True)
+        created_at = datetime.datetime.now().isoformat()
+
+        with self.index.transaction():
+            # Save document content
+            file_path = doc_dir / safe_name(filename)
+            digest = self.blobs.put(content.encode("utf-8"))
+            self.blobs.link(digest, file_path)
+
+            # Save metadata if provided
+            meta_path = doc_dir / f"{Path(filename).stem}_metadata.json"
+            if metadata:
+                metadata["filename"] = filename
+                metadata["document_type"] = document_type
+                metadata["created_at"] = created_at
+                metadata["local_path"] = str(file_path)
+
+                with open(meta_path, "w") as f:
+                    json.dump(metadata, f, indent=2)
+            else:
+                # A sidecar from an earlier save would bring its metadata back on reindex()
+                meta_path.unlink(missing_ok=True)
+
+            self.index.upsert_document(document_type, filename, created_at, metadata or None)
+
+            # Also make it available for download, sharing the stored content
+            self._register_download(digest, filename, "document", document_type)
+
+        return file_path
+
+    def get_document(self, filename: str, document_type: str) -> Optional[Dict[str, Any]]:
+        """Get a document and its metadata, or None if it does not exist"""
+        doc_dir = self.documents_dir / safe_name(document_type)
+        file_path = doc_dir / safe_name(filename)
+
+        if not file_path.exists():
+            return None
+
+        with open(file_path, "r") as f:
+            content = f.read()
+
+        # Try to get metadata if it exists
+        meta_path = doc_dir / f"{Path(filename).stem}_metadata.json"
+        metadata = None
+        if meta_path.exists():
+            with open(meta_path, "r") as f:
+                metadata = json.load(f)
+
+        return {
+            "content": content,
+            "metadata": metadata,
+            "download_path": f"/api/download/document/{document_type}/{filename}"
+        }
+
+    def list_documents(self, document_type: Optional[str] = None,
+                       created_after: Optional[str] = None, created_before: Optional[str] = None,
+                       sort: str = "created_at", descending: bool = False,
+                       limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """List documents, optionally filtered by type and creation time, from the metadata index"""
+        return self.index.query_documents(
+            safe_name(document_type) if document_type else None,
+            created_after=created_after, created_before=created_before,
+            sort=sort, descending=descending, limit=limit, offset=offset,
+        )
+
+    # === Calendar ===
+
+    def save_calendar_event(self, event_data: Dict[str, Any]) -> str:
+        """Save a calendar event, returning its ID"""
+        event_id = _prepare_record(event_data, "event")
+        self.events_journal.append(event_id, event_data)
+        return event_id
+
+    def get_calendar_events(self, start_date: Optional[str] = None,
+                            end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get calendar events overlapping a date range, ordered by start
+
+        Either bound may be given alone: start_date only returns events ending on or after it,
+        end_date only returns events starting on or before it. Multi-day events (with an
+        end_date field) match any range they overlap.
+        """
+        start = parse_when(start_date)
+        end = parse_when(end_date, end_of_day=True)
+        if start_date and start is None:
+            raise ValueError(f"Invalid start_date: {start_date!r}")
+        if end_date and end is None:
+            raise ValueError(f"Invalid end_date: {end_date!r}")
+
+        self.events_journal.refresh()
+        with self._calendar_lock:
+            event_ids = self._events.query(start, end)
+
+        # Only the matching records are read
+        events = self.events_journal.get_many(event_ids)
+        for event in events:
+            event["download_path"] = f"/api/download/calendar/events/event_{event['id']}.json"
+        return events
+
+    def save_task(self, task_data: Dict[str, Any]) -> str:
+        """Save a task, returning its ID"""
+        task_id = _prepare_record(task_data, "task")
+        self.tasks_journal.append(task_id, task_data)
+        return task_id
+
+    def import_calendar(self, events: List[Dict[str, Any]],
+                        tasks: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Save many events and tasks at once
+
+        Every record is validated before anything is written; each journal then receives
+        its records as a single atomic batch, so a failed import never leaves half of the
+        events (or half of the tasks) behind.
+
+        Returns:
+            The IDs of the imported records, under "events" and "tasks"
+        """
+        event_ids = [_prepare_record(event, "event") for event in events]
+        task_ids = [_prepare_record(task, "task") for task in tasks]
+
+        self.events_journal.append_many(zip(event_ids, events), atomic=True)
+        self.tasks_journal.append_many(zip(task_ids, tasks), atomic=True)
+        return {"events": event_ids, "tasks": task_ids}
+
+    def get_tasks(self, status: Optional[Union[str, List[str]]] = None,
+                  due_after: Optional[str] = None, due_before: Optional[str] = None,
+                  assignee: Optional[str] = None, sort: str = "id", descending: bool = False,
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get tasks, optionally filtered by status, due date and assignee
+
+        Args:
+            status: A status, or a list of statuses any of which may match
+            due_after: Only tasks due on or after this date
+            due_before: Only tasks due on or before this date
+            assignee: Only tasks assigned to this person
+            sort: "id", "due_date" or "updated_at"
+            descending: Reverse the sort order
+            limit: Maximum number of tasks to return
+        """
+        statuses = [status] if isinstance(status, str) else status
+        after = parse_when(due_after)
+        before = parse_when(due_before, end_of_day=True)
+        if due_after and after is None:
+            raise ValueError(f"Invalid due_after: {due_after!r}")
+        if due_before and before is None:
+            raise ValueError(f"Invalid due_before: {due_before!r}")
+
+        self.tasks_journal.refresh()
+        with self._calendar_lock:
+            task_ids = self._tasks.query(statuses or None, assignee or None, after, before,
+                                         sort, descending, limit)
+
+        # Only the matching records are read
+        tasks = self.tasks_journal.get_many(task_ids)
+        for task in tasks:
+            task["download_path"] = f"/api/download/calendar/tasks/task_{task['id']}.json"
+        return tasks
+
+    def _on_event(self, event_id: str, event: Dict[str, Any]):
+        start, end = event_span(event)
+        with self._calendar_lock:
+            self._events.add(event_id, start, end)
+            self._calendar_downloads[("events", f"event_{event_id}.json")] = event.get("updated_at", "")
+
+    def _on_task(self, task_id: str, task: Dict[str, Any]):
+        with self._calendar_lock:
+            self._tasks.add(task_id, task)
+            self._calendar_downloads[("tasks", f"task_{task_id}.json")] = task.get("updated_at", "")
+
+    def _migrate_calendar_files(self):
+        """Import per-record event and task files written before the journals existed"""
+        for journal, prefix in ((self.events_journal, "event_"), (self.tasks_journal, "task_")):
+            if len(journal):
+                continue
+            records = []
+            for file_path in sorted(self.calendar_dir.glob(f"{prefix}*.json")):
+                with open(file_path, "r") as f:
+                    record = json.load(f)
+                records.append((str(record.get("id") or file_path.stem[len(prefix):]), record))
+            if records:
+                journal.append_many(records)
+
+    def _calendar_record(self, subtype: Optional[str], filename: str) -> Tuple[Optional[Journal], str]:
+        """Map a calendar download filename to the journal and key holding its record"""
+        for journal, journal_subtype, prefix in ((self.events_journal, "events", "event_"),
+                                                 (self.tasks_journal, "tasks", "task_")):
+            if subtype == journal_subtype and filename.startswith(prefix) and filename.endswith(".json"):
+                return journal, filename[len(prefix):-len(".json")]
+        return None, ""
+
+    def _materialize_calendar_download(self, subtype: Optional[str], filename: str) -> Optional[Path]:
+        """Store a calendar record's download content on demand, redoing it only when the record changed"""
+        journal, key = self._calendar_record(subtype, filename)
+        if journal is None:
+            return None
+        position = journal.position(key)
+        if position is None:
+            return None
+
+        cached = self._materialized.get((subtype, filename))
+        if cached and cached[0] == position:
+            blob_path = self.blobs.get(cached[1])
+            if blob_path is not None:
+                return blob_path
+
+        # Nothing but this cache refers to the blob, so garbage collection may remove it
+        record = journal.get(key)
+        digest = self.blobs.put(json.dumps(record, indent=2).encode("utf-8"))
+        self._materialized[(subtype, filename)] = (position, digest)
+        return self.blobs.path(digest)
+
+    def _calendar_download_entries(self, subtype: Optional[str], created_after: Optional[str],
+                                   created_before: Optional[str]) -> List[Dict[str, Any]]:
+        """Download listing entries for journaled calendar records"""
+        self.events_journal.refresh()
+        self.tasks_journal.refresh()
+        with self._calendar_lock:
+            entries = list(self._calendar_downloads.items())
+
+        downloads = []
+        for (entry_subtype, filename), created_at in entries:
+            if subtype and entry_subtype != subtype:
+                continue
+            if (created_after and created_at < created_after) or (created_before and created_at > created_before):
+                continue
+            download_path = f"/api/download/calendar/{entry_subtype}/{filename}"
+            downloads.append({
+                "filename": filename,
+                "content_type": "calendar",
+                "subtype": entry_subtype,
+                "download_path": download_path,
+                "metadata": {
+                    "filename": filename,
+                    "content_type": "calendar",
+                    "subtype": entry_subtype,
+                    "created_at": created_at,
+                    "download_path": download_path,
+                },
+            })
+        return downloads
+
+    # === UI assets ===
+
+    def save_ui_asset(self, content: str, filename: str, asset_type: str) -> Path:
+        """Save a UI asset (CSS, JS, images, etc.)"""
+        # Create asset type directory if it doesn't exist
+        asset_dir = self.ui_assets_dir / safe_name(asset_type)
+        os.makedirs(asset_dir, exist_ok=True)
+
+        with self.index.transaction():
+            # Save asset content
+            file_path = asset_dir / safe_name(filename)
+            digest = self.blobs.put(content.encode("utf-8"))
+            self.blobs.link(digest, file_path)
+
+            self.index.upsert_ui_asset(asset_type, filename, datetime.datetime.now().isoformat())
+
+            # Make it available for download, sharing the stored content
+            self._register_download(digest, filename, "ui_asset", asset_type)
+
+        return file_path
+
+    def get_ui_asset(self, filename: str, asset_type: str) -> Optional[Dict[str, Any]]:
+        """Get a UI asset, or None if it does not exist"""
+        file_path = self.ui_assets_dir / safe_name(asset_type) / safe_name(filename)
+
+        if not file_path.exists():
+            return None
+
+        with open(file_path, "r") as f:
+            content = f.read()
+
+        return {
+            "content": content,
+            "download_path": f"/api/download/ui_asset/{asset_type}/{filename}"
+        }
+
+    def list_ui_assets(self, asset_type: Optional[str] = None,
+                       created_after: Optional[str] = None, created_before: Optional[str] = None,
+                       sort: str = "created_at", descending: bool = False,
+                       limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """List UI assets, optionally filtered by type and creation time, from the metadata index"""
+        return self.index.query_ui_assets(
+            safe_name(asset_type) if asset_type else None,
+            created_after=created_after, created_before=created_before,
+            sort=sort, descending=descending, limit=limit, offset=offset,
+        )
+
+    # === Download functionality ===
+
+    def prepare_download(self, content: str, filename: str,
+                         content_type: str, subtype: Optional[str] = None) -> Path:
+        """
+        Make content available for download
+
+        The content goes into the blob store (once, however many times it is offered) and
+        the download is an index entry pointing at it.
+
+        Args:
+            content: The content to save
+            filename: The filename
+            content_type: The type of content (document, calendar, ui_asset)
+            subtype: The subtype (e.g., business_plan, event, css)
+
+        Returns:
+            The path of the stored content
+        """
+        digest = self.blobs.put(content.encode("utf-8"))
+        return self._register_download(digest, filename, content_type, subtype)
+
+    def _register_download(self, digest: str, filename: str, content_type: str,
+                           subtype: Optional[str] = None, created_at: Optional[str] = None) -> Path:
+        """Record a blob-backed download in the index and its metadata sidecar"""
+        download_dir = self._download_dir(content_type, subtype)
+        os.makedirs(download_dir, exist_ok=True)
+
+        with self.index.transaction():
+            # The metadata sidecar lets reindex() rebuild the entry
+            meta_path = download_dir / f"{Path(safe_name(filename)).stem}_metadata.json"
+            metadata = {
+                "filename": filename,
+                "content_type": content_type,
+                "subtype": subtype,
+                "created_at": created_at or datetime.datetime.now().isoformat(),
+                "download_path": f"/api/download/{content_type}/{subtype or ''}/{filename}",
+                "blob": digest
+            }
+
+            with open(meta_path, "w") as f:
+                json.dump(metadata, f, indent=2)
+
+            self.index.upsert_download(content_type, subtype, filename, metadata["created_at"],
+                                       metadata, digest)
+
+            # A full copy written before downloads were blob-backed is no longer needed
+            legacy_path = download_dir / filename
+            if legacy_path.is_file():
+                legacy_path.unlink()
+
+        return self.blobs.path(digest)
+
+    def _download_dir(self, content_type: str, subtype: Optional[str] = None) -> Path:
+        if subtype:
+            return self.downloads_dir / safe_name(content_type) / safe_name(subtype)
+        return self.downloads_dir / safe_name(content_type)
+
+    def get_download_path(self, content_type: str, subtype: Optional[str],
+                          filename: str) -> Optional[Path]:
+        """
+        Resolve the local path of a downloadable file without touching anything but the file itself
+
+        Args:
+            content_type: The type of content (document, calendar, ui_asset)
+            subtype: The subtype (e.g., business_plan, event, css)
+            filename: The filename
+
+        Returns:
+            The file path, or None if no such download exists
+
+        Raises:
+            InvalidPathError: If any component would escape the downloads directory
+        """
+        if content_type == "calendar":
+            file_path = self._materialize_calendar_download(safe_name(subtype) if subtype else None,
+                                                            safe_name(filename))
+            if file_path is not None:
+                return file_path
+
+        download_dir = self._download_dir(content_type, subtype)
+        digest = self.index.download_blob(content_type, subtype, safe_name(filename))
+        if digest:
+            blob_path = self.blobs.get(digest)
+            if blob_path is not None:
+                return blob_path
+
+        # Downloads prepared before the blob store existed are plain files
+        file_path = download_dir / filename
+        if not file_path.is_file():
+            return None
+        return file_path
+
+    def list_downloads(self, content_type: Optional[str] = None, subtype: Optional[str] = None,
+                       created_after: Optional[str] = None, created_before: Optional[str] = None,
+                       sort: str = "created_at", descending: bool = False,
+                       limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        List available downloads, optionally filtered by type and subtype
+
+        Stored files come from the metadata index; calendar events and tasks are listed from
+        their journals and merged in.
+        """
+        content_type = safe_name(content_type) if content_type else None
+        subtype = safe_name(subtype) if subtype else None
+        options = {"created_after": created_after, "created_before": created_before,
+                   "sort": sort, "descending": descending}
+        if content_type not in (None, "calendar"):
+            return self.index.query_downloads(content_type, subtype, limit=limit, offset=offset, **options)
+
+        # Fetch enough indexed rows to fill the requested page, then merge with the journals
+        window = None if limit is None else offset + limit
+        indexed = self.index.query_downloads(content_type, subtype, limit=window, **options)
+        journaled = self._calendar_download_entries(subtype, created_after, created_before)
+
+        seen = set()
+        merged = []
+        for download in indexed + journaled:
+            identity = (download["content_type"], download["subtype"], download["filename"])
+            if identity not in seen:
+                seen.add(identity)
+                merged.append(download)
+
+        def sort_key(download: Dict[str, Any]):
+            primary = (download.get("metadata") or {}).get("created_at", "") if sort == "created_at" else ""
+            return primary, download["filename"]
+
+        merged.sort(key=sort_key, reverse=descending)
+        return merged[offset:window]
+
+    # === Metadata index ===
+
+    def reindex(self) -> Dict[str, int]:
+        """Rebuild the metadata index from the files on disk"""
+        counts = {"documents": 0, "downloads": 0, "ui_assets": 0}
+        with self.index.transaction():
+            self.index.clear()
+            for document_type, filename, created_at, metadata in self._scan_documents():
+                self.index.upsert_document(document_type, filename, created_at, metadata)
+                counts["documents"] += 1
+            for content_type, subtype, filename, created_at, metadata, blob in self._scan_downloads():
+                self.index.upsert_download(content_type, subtype, filename, created_at, metadata, blob)
+                counts["downloads"] += 1
+            for asset_type, filename, created_at in self._scan_ui_assets():
+                self.index.upsert_ui_asset(asset_type, filename, created_at)
+                counts["ui_assets"] += 1
+        return counts
+
+    # === Blob maintenance ===
+
+    def deduplicate(self) -> Dict[str, int]:
+        """Move artifacts saved before the blob store existed into it, sharing identical content"""
+        counts = {"documents": 0, "ui_assets": 0, "downloads": 0}
+        for view_dir, kind in ((self.documents_dir, "documents"), (self.ui_assets_dir, "ui_assets")):
+            for type_dir in view_dir.glob("*"):
+                if not type_dir.is_dir():
+                    continue
+                files = _content_files(type_dir) if kind == "documents" else \
+                    [f for f in type_dir.glob("*") if not f.name.startswith(".")]
+                for f in files:
+                    if f.stat().st_nlink > 1:
+                        continue  # Already linked to a blob
+                    self.blobs.link(self.blobs.put(f.read_bytes()), f)
+                    counts[kind] += 1
+
+        for content_type, subtype, filename, created_at, _, blob in list(self._scan_downloads()):
+            if blob is None:
+                file_path = self._download_dir(content_type, subtype) / filename
+                self._register_download(self.blobs.put(file_path.read_bytes()), filename,
+                                        content_type, subtype, created_at)
+                counts["downloads"] += 1
+        return counts
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """Delete blobs that no document, UI asset or download refers to any more"""
+        return self.blobs.collect_garbage(self.index.download_blobs())
+
+    def _scan_documents(self) -> Iterator[Tuple[str, str, str, Optional[Dict[str, Any]]]]:
+        for doc_dir in self.documents_dir.glob("*"):
+            if not doc_dir.is_dir():
+                continue
+            files = _content_files(doc_dir)
+            sidecars = _read_sidecars([doc_dir / f"{f.stem}_metadata.json" for f in files])
+            for f, metadata in zip(files, sidecars):
+                created_at = (metadata or {}).get("created_at") or _mtime(f)
+                yield doc_dir.name, f.name, created_at, metadata
+
+    def _scan_downloads(self) -> Iterator[Tuple[str, str, str, str, Optional[Dict[str, Any]], Optional[str]]]:
+        for content_dir in self.downloads_dir.glob("*"):
+            # Calendar downloads are listed from the journals
+            if not content_dir.is_dir() or content_dir.name == "calendar":
+                continue
+            for subtype_dir in content_dir.glob("*"):
+                if not subtype_dir.is_dir():
+                    continue
+                # Blob-backed downloads exist only as a metadata sidecar naming their blob
+                blob_backed = set()
+                meta_paths = list(subtype_dir.glob("*_metadata.json"))
+                sidecars = dict(zip(meta_paths, _read_sidecars(meta_paths)))
+                for meta_path, metadata in sidecars.items():
+                    if metadata and metadata.get("blob") and metadata.get("filename"):
+                        blob_backed.add(metadata["filename"])
+                        yield (content_dir.name, subtype_dir.name, metadata["filename"],
+                               metadata.get("created_at") or _mtime(meta_path), metadata, metadata["blob"])
+                for f in _content_files(subtype_dir):
+                    if f.name in blob_backed:
+                        continue
+                    metadata = sidecars.get(subtype_dir / f"{f.stem}_metadata.json")
+                    created_at = (metadata or {}).get("created_at") or _mtime(f)
+                    yield content_dir.name, subtype_dir.name, f.name, created_at, metadata, None
+
+    def _scan_ui_assets(self) -> Iterator[Tuple[str, str, str]]:
+        for asset_dir in self.ui_assets_dir.glob("*"):
+            if not asset_dir.is_dir():
+                continue
+            for f in asset_dir.glob("*"):
+                if not f.name.startswith("."):
+                    yield asset_dir.name, f.name, _mtime(f)
+
+
+def _content_files(directory: Path) -> List[Path]:
+    """Files in a directory, excluding metadata sidecars and .keep files"""
+    return [f for f in directory.glob("*")
+            if not f.name.endswith("_metadata.json") and not f.name.startswith(".")]
+
+
+def _read_sidecar(meta_path: Path) -> Optional[Dict[str, Any]]:
+    if not meta_path.exists():
+        return None
+    with open(meta_path, "r") as f:
+        return json.load(f)
+
+
+def _read_sidecars(meta_paths: List[Path]) -> List[Optional[Dict[str, Any]]]:
+    """Read many metadata sidecars, concurrently when there are enough to be worth it"""
+    if len(meta_paths) < SIDECAR_BATCH:
+        return [_read_sidecar(meta_path) for meta_path in meta_paths]
+    with ThreadPoolExecutor(max_workers=SIDECAR_WORKERS) as pool:
+        return list(pool.map(_read_sidecar, meta_paths))
+
+
+def _mtime(path: Path) -> str:
+    return datetime.datetime.fromtimestamp(path.stat().st_mtime).isoformat()
@@ -0,0 +1,72 @@
+"""
+ID allocation for the Business Workflow System
+Generates monotonic, lexicographically sortable ULIDs for stored records
+"""
+
+import os
+import threading
+import time
+
+# Crockford base32, as used by the ULID spec
+ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ENCODING[index])
+    return "".join(reversed(chars))
+
+
+class IdAllocator:
+    """
+    Thread-safe ULID generator
+
+    A ULID is a 48-bit millisecond timestamp followed by 80 random bits. Within one
+    millisecond the random part is incremented rather than redrawn, so IDs from one
+    process are strictly increasing; across processes the random bits make collisions
+    practically impossible.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def reset(self):
+        """Forget the last ID so a forked child does not continue its parent's sequence"""
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new_ulid(self) -> str:
+        with self._lock:
+            now = time.time_ns() // 1_000_000
+            if now <= self._last_ms:
+                # Same (or an earlier, if the clock stepped back) millisecond: stay monotonic
+                now = self._last_ms
+                random_part = self._last_random + 1
+                if random_part > RANDOM_MAX:
+                    now += 1
+                    random_part = int.from_bytes(os.urandom(10), "big")
+            else:
+                random_part = int.from_bytes(os.urandom(10), "big")
+            self._last_ms, self._last_random = now, random_part
+        return _encode(now, 10) + _encode(random_part, 16)
+
+    def new_id(self, prefix: str) -> str:
+        """Return an ID such as ``event_01J0Z7Q9M8X5R3T2V1W0Y9Z8A7``"""
+        return f"{prefix}_{self.new_ulid()}"
+
+
+_allocator = IdAllocator()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_allocator.reset)
+
+
+def new_id(prefix: str) -> str:
+    """Allocate a new record ID from the process-wide allocator"""
+    return _allocator.new_id(prefix)
@@ -0,0 +1,541 @@
+"""
+Append-only segmented journal for the Business Workflow System
+Stores keyed JSON records in JSONL segments with an in-memory offset index
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: recovery and compaction are not coordinated across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "segment_"
+SEGMENT_SUFFIX = ".jsonl"
+COMPACT_SUFFIX = ".compact"
+
+# (segment number, byte offset, byte length) of a record's latest version
+Position = Tuple[int, int, int]
+Listener = Callable[[str, Dict[str, Any]], None]
+
+
+def _segment_name(number: int) -> str:
+    return f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}"
+
+
+def _encode(key: str, value: Dict[str, Any], txn: Optional[str] = None) -> bytes:
+    record = {"key": key, "value": value}
+    if txn:
+        record["txn"] = txn
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class Journal:
+    """
+    Keyed record store built on append-only JSONL segments
+
+    Every write appends one line to the active (highest-numbered) segment with a single
+    O_APPEND write, so appends from several threads or processes never interleave. A
+    segment is sealed once it reaches segment_bytes; every writer then moves on to the
+    next one, so later segments always hold later writes. The latest position of each key
+    is kept in memory; a reader in another process catches up by parsing the bytes
+    appended since it last looked. Sealed segments whose records have mostly been
+    superseded are rewritten by a background compactor.
+
+    Each open journal holds a shared lock on .writers until it is closed. Recovery only
+    truncates a torn write at the end of the last segment when it can take that lock
+    exclusively, i.e. no other process has the journal open; otherwise the tail may be an
+    append still in progress and is left alone. A torn write that others then append
+    past is skipped when the line holding it is read.
+
+    Args:
+        directory: Directory holding the segment files
+        segment_bytes: Size at which the active segment is sealed and a new one started
+        fsync: Flush every append to stable storage before returning
+        compact_interval: Seconds between background compaction checks (None disables it)
+        garbage_ratio: Fraction of dead bytes at which a sealed segment is compacted
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int = 64 * 1024 * 1024,
+                 fsync: bool = False, compact_interval: Optional[float] = 60.0,
+                 garbage_ratio: float = 0.5):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.garbage_ratio = garbage_ratio
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._index: Dict[str, Position] = {}
+        self._listeners: List[Listener] = []
+        # Per segment: bytes parsed so far, live bytes, inode (to notice compaction elsewhere)
+        self._scanned: Dict[int, int] = {}
+        self._live: Dict[int, int] = {}
+        self._inodes: Dict[int, int] = {}
+        self._readers: Dict[int, int] = {}
+        self._active: Optional[int] = None
+        self._writer: Optional[int] = None
+        self._dir_mtime: Optional[int] = None
+        self._writers: Optional[int] = None
+
+        self._recover()
+
+        self._stop = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        if compact_interval:
+            self._compactor = threading.Thread(
+                target=self._compact_loop, args=(compact_interval,),
+                name=f"journal-compactor-{self.directory.name}", daemon=True,
+            )
+            self._compactor.start()
+
+    # === Public API ===
+
+    def subscribe(self, listener: Listener):
+        """Call listener(key, value) for every record indexed from now on, including other processes' writes"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def append(self, key: str, value: Dict[str, Any]):
+        """Append the new version of a record"""
+        self.append_many([(key, value)])
+
+    def append_many(self, records: Iterable[Tuple[str, Dict[str, Any]]], atomic: bool = False) -> int:
+        """
+        Append several records, batching them into as few writes as possible
+
+        Args:
+            records: (key, value) pairs to append
+            atomic: Write all records as one transaction that is either fully visible or,
+                after a crash part-way through, discarded on recovery. An atomic batch is
+                written in one piece even if it overflows the segment size.
+        """
+        txn = os.urandom(8).hex() if atomic else None
+        encoded = [(key, value, _encode(key, value, txn)) for key, value in records]
+        if not encoded:
+            return 0
+        with self._lock:
+            if atomic:
+                commit = json.dumps({"commit": txn, "count": len(encoded)}).encode("utf-8") + b"\n"
+                self._write_batch(encoded, commit)
+                return len(encoded)
+
+            batch: List[Tuple[str, Dict[str, Any], bytes]] = []
+            size = 0
+            for item in encoded:
+                if batch and size + len(item[2]) > self.segment_bytes:
+                    self._write_batch(batch)
+                    batch, size = [], 0
+                batch.append(item)
+                size += len(item[2])
+            if batch:
+                self._write_batch(batch)
+        return len(encoded)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the latest version of a record, or None"""
+        with self._lock:
+            self._catch_up()
+            position = self._index.get(key)
+            if position is None:
+                return None
+            return self._read(position)["value"]
+
+    def get_many(self, keys: Iterable[str]) -> List[Dict[str, Any]]:
+        """Return the latest versions of several records in the order given, skipping unknown keys"""
+        with self._lock:
+            self._catch_up()
+            positions = [self._index[key] for key in keys if key in self._index]
+            return [self._read(position)["value"] for position in positions]
+
+    def position(self, key: str) -> Optional[Position]:
+        """Return where the latest version of a record lives; changes whenever the record does"""
+        with self._lock:
+            self._catch_up()
+            return self._index.get(key)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            self._catch_up()
+            return list(self._index)
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return the latest version of every record in write order"""
+        with self._lock:
+            self._catch_up()
+            ordered = sorted(self._index.items(), key=lambda item: item[1])
+            return [(key, self._read(position)["value"]) for key, position in ordered]
+
+    def refresh(self):
+        """Index records appended by other processes"""
+        with self._lock:
+            self._catch_up()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._catch_up()
+            return key in self._index
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._catch_up()
+            return len(self._index)
+
+    def close(self):
+        self._stop.set()
+        if self._compactor:
+            self._compactor.join(timeout=5.0)
+        with self._lock:
+            for fd in list(self._readers.values()) + ([self._writer] if self._writer is not None else []):
+                os.close(fd)
+            self._readers.clear()
+            self._writer = None
+            if self._writers is not None:
+                os.close(self._writers)  # Releases the shared writer lock
+                self._writers = None
+
+    # === Writing ===
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any], bytes]], commit: bytes = b""):
+        data = b"".join(item[2] for item in batch) + commit
+        self._ensure_writer()
+        written = os.write(self._writer, data)
+        if written != len(data):
+            raise OSError(f"Short write to journal segment {self._active} ({written} of {len(data)} bytes)")
+        end = os.lseek(self._writer, 0, os.SEEK_CUR)
+        if self.fsync:
+            os.fsync(self._writer)
+
+        offset = end - len(data)
+        segment = self._active
+        for key, value, line in batch:
+            self._index_record(key, value, (segment, offset, len(line)))
+            offset += len(line)
+        if self._scanned.get(segment) == end - len(data):
+            self._scanned[segment] = end
+
+    def _ensure_writer(self):
+        """Open the active segment for appending, rolling to a new one once it is sealed"""
+        while True:
+            if self._writer is None:
+                path = self._path(self._active)
+                self._writer = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                self._inodes.setdefault(self._active, os.fstat(self._writer).st_ino)
+                self._scanned.setdefault(self._active, 0)
+                self._live.setdefault(self._active, 0)
+
+            if os.fstat(self._writer).st_size < self.segment_bytes:
+                return
+
+            # Sealed; another process may already have started the next segment
+            os.close(self._writer)
+            self._writer = None
+            sealed = self._active
+            self._catch_up(force=True)
+            if self._active == sealed:
+                self._active += 1
+                try:
+                    os.close(os.open(self._path(self._active), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+                except FileExistsError:
+                    pass
+
+    # === Reading and recovery ===
+
+    def _path(self, segment: int) -> Path:
+        return self.directory / _segment_name(segment)
+
+    def _segments_on_disk(self) -> List[int]:
+        numbers = []
+        for path in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+            try:
+                numbers.append(int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+            except ValueError:
+                continue
+        return sorted(numbers)
+
+    def _recover(self):
+        """Rebuild the offset index from disk, discarding torn writes and interrupted compactions"""
+        with self._lock, self._exclusive(blocking=True):
+            for leftover in self.directory.glob(f"*{COMPACT_SUFFIX}"):
+                leftover.unlink()
+
+            sole_writer = self._join_writers()
+            segments = self._segments_on_disk()
+            for segment in segments:
+                self._scan(segment, repair=sole_writer and segment == segments[-1])
+            self._active = segments[-1] if segments else 1
+
+    def _join_writers(self) -> bool:
+        """
+        Take the shared writer lock for the life of this journal
+
+        Returns whether no other process had the journal open, which is only known while
+        holding the recovery lock: no one else can be joining at the same time.
+        """
+        if fcntl is None:
+            return True
+        self._writers = os.open(self.directory / ".writers", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._writers, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            sole = True
+        except BlockingIOError:
+            sole = False
+        fcntl.flock(self._writers, fcntl.LOCK_SH)
+        return sole
+
+    def _reset(self):
+        """Forget everything and rescan; used when another process has compacted segments"""
+        for fd in self._readers.values():
+            os.close(fd)
+        if self._writer is not None:
+            os.close(self._writer)
+        self._readers.clear()
+        self._writer = None
+        self._index.clear()
+        self._scanned.clear()
+        self._live.clear()
+        self._inodes.clear()
+        segments = self._segments_on_disk()
+        for segment in segments:
+            self._scan(segment)
+        self._active = segments[-1] if segments else 1
+
+    def _scan(self, segment: int, repair: bool = False):
+        """Index complete records of a segment beyond the bytes already scanned"""
+        path = self._path(segment)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        self._inodes[segment] = stat.st_ino
+        start = self._scanned.get(segment, 0)
+        self._live.setdefault(segment, 0)
+        if stat.st_size <= start:
+            self._scanned[segment] = start
+            return
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(stat.st_size - start)
+
+        offset = start
+        # Records of atomic batches whose commit line has not been seen yet, by transaction
+        pending: Dict[str, List[Tuple[str, Dict[str, Any], Position]]] = {}
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # Incomplete tail: either still being written or a torn write
+            start = 0
+            try:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn write from a crashed writer that others appended past
+                    start = max(line.rfind(b'{"key":'), line.rfind(b'{"commit": '), 0)
+                    if not start:
+                        raise
+                    record = json.loads(line[start:])
+                    logger.warning(f"Skipping torn write in {path.name} at offset {offset} ({start} bytes)")
+                if "commit" in record:
+                    for key, value, position in pending.pop(record["commit"], []):
+                        self._index_record(key, value, position)
+                else:
+                    key, value = record["key"], record["value"]
+                    position = (segment, offset + start, len(line) - start)
+                    if record.get("txn"):
+                        pending.setdefault(record["txn"], []).append((key, value, position))
+                    else:
+                        self._index_record(key, value, position)
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"Skipping corrupt journal record in {path.name} at offset {offset}")
+            offset += len(line)
+
+        # Re-read an uncommitted batch next time, or discard it when recovering from a crash
+        if pending:
+            offset = min(position[1] for records in pending.values() for _, _, position in records)
+        self._scanned[segment] = offset
+
+        if repair and offset < stat.st_size:
+            logger.warning(f"Truncating torn write at the end of {path.name} ({stat.st_size - offset} bytes)")
+            os.truncate(path, offset)
+
+    def _catch_up(self, force: bool = False):
+        """Index bytes appended by other processes and notice segments they created or compacted"""
+        mtime = os.stat(self.directory).st_mtime_ns
+        if not force and mtime == self._dir_mtime:
+            # No segment was created, replaced or removed; only the active one can have grown
+            self._scan(self._active)
+            return
+        # Directory timestamps can be coarse, so only trust one that is safely in the past
+        self._dir_mtime = mtime if time.time_ns() - mtime > 2_000_000_000 else None
+
+        for segment in list(self._inodes):
+            try:
+                inode = os.stat(self._path(segment)).st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode != self._inodes[segment]:
+                self._reset()
+                return
+
+        segments = self._segments_on_disk()
+        for segment in segments:
+            if segment >= self._active or segment not in self._scanned:
+                self._scan(segment)
+        if segments and segments[-1] > self._active:
+            if self._writer is not None:
+                os.close(self._writer)
+                self._writer = None
+            self._active = segments[-1]
+
+    def _index_record(self, key: str, value: Dict[str, Any], position: Position):
+        previous = self._index.get(key)
+        if previous is not None:
+            if previous >= position:
+                return
+            self._live[previous[0]] = self._live.get(previous[0], 0) - previous[2]
+        self._index[key] = position
+        self._live[position[0]] = self._live.get(position[0], 0) + position[2]
+        for listener in self._listeners:
+            listener(key, value)
+
+    def _read(self, position: Position) -> Dict[str, Any]:
+        segment, offset, length = position
+        fd = self._readers.get(segment)
+        if fd is None:
+            fd = self._readers[segment] = os.open(self._path(segment), os.O_RDONLY)
+        return json.loads(os.pread(fd, length, offset))
+
+    # === Compaction ===
+
+    def _exclusive(self, blocking: bool):
+        """Cross-process lock held while recovering or compacting"""
+        return _FileLock(self.directory / ".lock", blocking)
+
+    def _compact_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Journal compaction failed in {self.directory}: {e}")
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Rewrite sealed segments that are mostly dead records into one compact segment
+
+        The output replaces the highest-numbered input segment, so it still sorts before
+        every newer write; the remaining inputs are then deleted. A crash at any point
+        leaves either the old segments or the new one, both of which recover correctly.
+        """
+        with self._exclusive(blocking=False) as acquired:
+            if not acquired:
+                return {"segments": 0, "records": 0}
+
+            with self._lock:
+                self._catch_up()
+                candidates = [
+                    s for s in sorted(self._scanned)
+                    if s != self._active and self._scanned[s]
+                    and self._live.get(s, 0) <= self._scanned[s] * (1 - self.garbage_ratio)
+                ]
+                if not candidates:
+                    return {"segments": 0, "records": 0}
+                live = sorted((pos, key) for key, pos in self._index.items() if pos[0] in candidates)
+
+            # Sealed segments never change, so their records can be copied without the lock
+            target = max(candidates)
+            temp_path = self._path(target).with_name(_segment_name(target) + COMPACT_SUFFIX)
+            moves: Dict[str, Position] = {}
+            with open(temp_path, "wb") as out:
+                offset = 0
+                for position, key in live:
+                    segment, start, length = position
+                    with open(self._path(segment), "rb") as f:
+                        f.seek(start)
+                        line = f.read(length)
+                    if b'"txn":' in line:
+                        # The batch committed long ago; its commit line is not copied
+                        line = _encode(key, json.loads(line)["value"])
+                        length = len(line)
+                    out.write(line)
+                    moves[key] = (position, (target, offset, length))
+                    offset += length
+                out.flush()
+                os.fsync(out.fileno())
+
+            with self._lock:
+                for segment in candidates:
+                    fd = self._readers.pop(segment, None)
+                    if fd is not None:
+                        os.close(fd)
+                os.replace(temp_path, self._path(target))
+                for segment in candidates:
+                    if segment != target:
+                        self._path(segment).unlink()
+                    self._scanned.pop(segment, None)
+                    self._live.pop(segment, None)
+                    self._inodes.pop(segment, None)
+                self._sync_directory()
+
+                self._scanned[target] = offset
+                self._live[target] = 0
+                self._inodes[target] = os.stat(self._path(target)).st_ino
+                for key, (old, new) in moves.items():
+                    if self._index.get(key) == old:
+                        self._index[key] = new
+                        self._live[target] += new[2]
+
+            logger.info(f"Compacted {len(candidates)} journal segment(s) in {self.directory} "
+                        f"into {len(moves)} record(s)")
+            return {"segments": len(candidates), "records": len(moves)}
+
+    def _sync_directory(self):
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "records": len(self._index),
+                "segments": len(self._scanned),
+                "bytes": sum(self._scanned.values()),
+                "live_bytes": sum(self._live.values()),
+            }
+
+
+class _FileLock:
+    """Exclusive advisory lock on a file; a no-op where fcntl is unavailable"""
+
+    def __init__(self, path: Path, blocking: bool):
+        self.path = path
+        self.blocking = blocking
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> bool:
+        if fcntl is None:
+            return True
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | (0 if self.blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            os.close(self._fd)
+            self._fd = None
+            return False
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
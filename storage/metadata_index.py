@@ -0,0 +1,225 @@
+"""
+SQLite metadata index for the Business Workflow System
+Catalogs documents, downloads and UI assets so list queries never walk the disk
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    metadata TEXT,
+    PRIMARY KEY (document_type, filename)
+);
+CREATE INDEX IF NOT EXISTS documents_created_at ON documents (created_at);
+
+CREATE TABLE IF NOT EXISTS downloads (
+    content_type TEXT NOT NULL,
+    subtype TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    metadata TEXT,
+    blob TEXT,
+    PRIMARY KEY (content_type, subtype, filename)
+);
+CREATE INDEX IF NOT EXISTS downloads_subtype ON downloads (subtype);
+CREATE INDEX IF NOT EXISTS downloads_created_at ON downloads (created_at);
+
+CREATE TABLE IF NOT EXISTS ui_assets (
+    asset_type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (asset_type, filename)
+);
+CREATE INDEX IF NOT EXISTS ui_assets_created_at ON ui_assets (created_at);
+"""
+
+SORT_COLUMNS = ("created_at", "filename")
+
+
+class MetadataIndex:
+    """
+    Persistent catalog of stored artifacts, shared by every process using the same data directory
+
+    Args:
+        db_path: Location of the SQLite database file
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.created = not self.db_path.exists()
+        self._conn = sqlite3.connect(str(self.db_path), isolation_level=None,
+                                     check_same_thread=False, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    def _migrate(self):
+        """Bring databases created by older versions up to the current schema"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(downloads)")}
+        if "blob" not in columns:
+            self._conn.execute("ALTER TABLE downloads ADD COLUMN blob TEXT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Group index updates atomically; nested calls join the outer transaction"""
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self._conn
+            except BaseException:
+                self._depth -= 1
+                if outermost:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if outermost:
+                self._conn.execute("COMMIT")
+
+    # === Updates ===
+
+    def upsert_document(self, document_type: str, filename: str, created_at: str,
+                        metadata: Optional[Dict[str, Any]] = None):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                (document_type, filename, created_at, _dumps(metadata)),
+            )
+
+    def upsert_download(self, content_type: str, subtype: Optional[str], filename: str,
+                        created_at: str, metadata: Optional[Dict[str, Any]] = None,
+                        blob: Optional[str] = None):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO downloads (content_type, subtype, filename, created_at, metadata, blob) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (content_type, subtype or "", filename, created_at, _dumps(metadata), blob),
+            )
+
+    def upsert_ui_asset(self, asset_type: str, filename: str, created_at: str):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ui_assets VALUES (?, ?, ?)",
+                (asset_type, filename, created_at),
+            )
+
+    def clear(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM documents")
+            conn.execute("DELETE FROM downloads")
+            conn.execute("DELETE FROM ui_assets")
+
+    # === Queries ===
+
+    def query_documents(self, document_type: Optional[str] = None, **options) -> List[Dict[str, Any]]:
+        """List documents, filtered, sorted and paginated inside the index"""
+        rows = self._select("documents", {"document_type": document_type}, **options)
+        documents = []
+        for row in rows:
+            doc = {"filename": row["filename"], "document_type": row["document_type"],
+                   "download_path": f"/api/download/document/{row['document_type']}/{row['filename']}"}
+            if row["metadata"] is not None:
+                doc["metadata"] = json.loads(row["metadata"])
+            documents.append(doc)
+        return documents
+
+    def query_downloads(self, content_type: Optional[str] = None, subtype: Optional[str] = None,
+                        **options) -> List[Dict[str, Any]]:
+        """List downloads, filtered, sorted and paginated inside the index"""
+        rows = self._select("downloads", {"content_type": content_type, "subtype": subtype}, **options)
+        downloads = []
+        for row in rows:
+            download = {
+                "filename": row["filename"],
+                "content_type": row["content_type"],
+                "subtype": row["subtype"],
+                "download_path": f"/api/download/{row['content_type']}/{row['subtype']}/{row['filename']}"
+            }
+            if row["metadata"] is not None:
+                download["metadata"] = json.loads(row["metadata"])
+            downloads.append(download)
+        return downloads
+
+    def query_ui_assets(self, asset_type: Optional[str] = None, **options) -> List[Dict[str, Any]]:
+        """List UI assets, filtered, sorted and paginated inside the index"""
+        rows = self._select("ui_assets", {"asset_type": asset_type}, **options)
+        return [{"filename": row["filename"],
+                 "asset_type": row["asset_type"],
+                 "download_path": f"/api/download/ui_asset/{row['asset_type']}/{row['filename']}"}
+                for row in rows]
+
+    def download_blob(self, content_type: str, subtype: Optional[str], filename: str) -> Optional[str]:
+        """Return the digest of the blob holding a download, or None if it is not blob-backed"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob FROM downloads WHERE content_type = ? AND subtype = ? AND filename = ?",
+                (content_type, subtype or "", filename),
+            ).fetchone()
+        return row["blob"] if row else None
+
+    def download_blobs(self) -> List[str]:
+        """Digests of every blob referenced by a download entry"""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT blob FROM downloads WHERE blob IS NOT NULL").fetchall()
+        return [row["blob"] for row in rows]
+
+    def _select(self, table: str, filters: Dict[str, Optional[str]],
+                created_after: Optional[str] = None, created_before: Optional[str] = None,
+                sort: str = "created_at", descending: bool = False,
+                limit: Optional[int] = None, offset: int = 0) -> List[sqlite3.Row]:
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort!r}; expected one of {', '.join(SORT_COLUMNS)}")
+
+        clauses, params = _where(filters)
+        if created_after:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            clauses.append("created_at <= ?")
+            params.append(created_before)
+
+        sql = f"SELECT * FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        direction = "DESC" if descending else "ASC"
+        sql += f" ORDER BY {sort} {direction}, filename {direction}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([int(limit), int(offset)])
+        elif offset:
+            sql += " LIMIT -1 OFFSET ?"
+            params.append(int(offset))
+
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+def _where(filters: Dict[str, Optional[str]]) -> Tuple[List[str], List[Any]]:
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return clauses, params
+
+
+def _dumps(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    return json.dumps(metadata) if metadata is not None else None
@@ -0,0 +1,146 @@
+"""
+Secondary indexes for tasks
+Answers status, assignee and due-date queries without reading every task record
+"""
+
+import bisect
+import datetime
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from storage.calendar_index import parse_when
+
+SORT_KEYS = ("id", "due_date", "updated_at")
+
+# Field names accepted for the indexed attributes, in order of preference
+DUE_FIELDS = ("due_date", "due")
+ASSIGNEE_FIELDS = ("assignee", "assigned_to")
+
+
+def _first(task: Dict[str, Any], fields: Tuple[str, ...]) -> Any:
+    for field in fields:
+        if task.get(field) not in (None, ""):
+            return task[field]
+    return None
+
+
+class _Entry:
+    __slots__ = ("status", "assignee", "due", "updated_at")
+
+    def __init__(self, task: Dict[str, Any]):
+        status = task.get("status")
+        assignee = _first(task, ASSIGNEE_FIELDS)
+        self.status = str(status) if status is not None else None
+        self.assignee = str(assignee) if assignee is not None else None
+        self.due = parse_when(_first(task, DUE_FIELDS), end_of_day=True)
+        self.updated_at = str(task.get("updated_at", ""))
+
+
+class TaskIndex:
+    """In-memory status, assignee and due-date indexes over task IDs"""
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._by_status: Dict[Optional[str], Dict[str, None]] = {}
+        self._by_assignee: Dict[Optional[str], Dict[str, None]] = {}
+        # Sorted (due, task_id) for tasks that have a parseable due date
+        self._due: List[Tuple[datetime.datetime, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, task_id: str, task: Dict[str, Any]):
+        """Insert or update a task"""
+        self.remove(task_id)
+        entry = _Entry(task)
+        self._entries[task_id] = entry
+        self._by_status.setdefault(entry.status, {})[task_id] = None
+        self._by_assignee.setdefault(entry.assignee, {})[task_id] = None
+        if entry.due is not None:
+            bisect.insort(self._due, (entry.due, task_id))
+
+    def remove(self, task_id: str):
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return
+        _discard(self._by_status, entry.status, task_id)
+        _discard(self._by_assignee, entry.assignee, task_id)
+        if entry.due is not None:
+            i = bisect.bisect_left(self._due, (entry.due, task_id))
+            if i < len(self._due) and self._due[i] == (entry.due, task_id):
+                del self._due[i]
+
+    def query(self, statuses: Optional[Iterable[str]] = None, assignee: Optional[str] = None,
+              due_after: Optional[datetime.datetime] = None,
+              due_before: Optional[datetime.datetime] = None,
+              sort: str = "id", descending: bool = False,
+              limit: Optional[int] = None) -> List[str]:
+        """
+        Return the IDs of tasks matching every given filter
+
+        The smallest candidate set among the filters is scanned, and the rest are checked
+        per candidate, so a selective query never touches the other tasks.
+
+        Args:
+            statuses: Accept any of these statuses
+            assignee: Only tasks assigned to this person
+            due_after: Only tasks due at or after this time
+            due_before: Only tasks due at or before this time
+            sort: "id" (creation order for generated IDs), "due_date" or "updated_at";
+                tasks without a due date sort last by due date
+            descending: Reverse the sort order
+            limit: Maximum number of IDs to return
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Cannot sort by {sort!r}; expected one of {', '.join(SORT_KEYS)}")
+        statuses = set(statuses) if statuses is not None else None
+
+        candidates: List[Tuple[int, Iterable[str]]] = []
+        if statuses is not None:
+            sets = [self._by_status.get(status, {}) for status in statuses]
+            candidates.append((sum(len(s) for s in sets), [t for s in sets for t in s]))
+        if assignee is not None:
+            assigned = self._by_assignee.get(assignee, {})
+            candidates.append((len(assigned), assigned))
+        if due_after is not None or due_before is not None:
+            lo = bisect.bisect_left(self._due, (due_after, "")) if due_after else 0
+            hi = bisect.bisect_right(self._due, (due_before, "\uffff")) if due_before else len(self._due)
+            candidates.append((max(hi - lo, 0), (task_id for _, task_id in self._due[lo:hi])))
+        pool = min(candidates, key=lambda c: c[0])[1] if candidates else self._entries
+
+        def matches(task_id: str) -> bool:
+            entry = self._entries[task_id]
+            if statuses is not None and entry.status not in statuses:
+                return False
+            if assignee is not None and entry.assignee != assignee:
+                return False
+            if due_after is not None and (entry.due is None or entry.due < due_after):
+                return False
+            if due_before is not None and (entry.due is None or entry.due > due_before):
+                return False
+            return True
+
+        selected = [task_id for task_id in pool if matches(task_id)]
+        key = self._sort_key(sort, descending)
+        if limit is not None and limit < len(selected):
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            return pick(int(limit), selected, key=key)
+        return sorted(selected, key=key, reverse=descending)
+
+    def _sort_key(self, sort: str, descending: bool):
+        if sort == "id":
+            return lambda task_id: task_id
+        if sort == "updated_at":
+            return lambda task_id: (self._entries[task_id].updated_at, task_id)
+
+        # Undated tasks go last in either direction
+        missing = datetime.datetime.min if descending else datetime.datetime.max
+        return lambda task_id: (self._entries[task_id].due or missing, task_id)
+
+
+def _discard(groups: Dict[Optional[str], Dict[str, None]], value: Optional[str], task_id: str):
+    members = groups.get(value)
+    if members is not None:
+        members.pop(task_id, None)
+        if not members:
+            del groups[value]
@@ -0,0 +1,5 @@
+# Telemetry package initialization
+# Metrics and run traces shared by the API and the MCP servers
+
+from telemetry.metrics import REGISTRY, Registry, SnapshotWriter, load_snapshots
+from telemetry.tracing import TraceStore
@@ -0,0 +1,238 @@
+"""
+Metrics for the Business Workflow System
+Counters and histograms rendered in the Prometheus text format, shared across processes via snapshots
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """A metric family, holding one series per combination of label values (passed positionally)"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, values: Tuple[str, ...]) -> List[float]:
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._empty())
+        return series
+
+    def _empty(self) -> List[float]:
+        return [0.0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = [[list(values), list(series)] for values, series in self._series.items()]
+        return {"kind": self.kind, "help": self.help, "labels": list(self.labelnames), "samples": samples}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *values: str, amount: float = 1.0):
+        series = self._get(values)
+        with self._lock:
+            series[0] += amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labels)
+
+    def _empty(self) -> List[float]:
+        # One count per bucket plus +Inf, then sum and count
+        return [0.0] * (len(self.buckets) + 3)
+
+    def observe(self, value: float, *values: str):
+        series = self._get(values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    """The metrics of one process"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def _register(self, metric: Metric) -> Any:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def render(self, snapshots: Iterable[Tuple[str, Dict[str, Dict[str, Any]]]] = ()) -> str:
+        """
+        The Prometheus text exposition of this registry and of other processes' snapshots
+
+        Series from a snapshot carry a process="<name>" label.
+        """
+        families: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for name, family in self.snapshot().items():
+            families.setdefault(name, []).append(("", family))
+        for process, snapshot in snapshots:
+            for name, family in snapshot.items():
+                families.setdefault(name, []).append((f'process="{_escape(process)}"', family))
+
+        lines: List[str] = []
+        for name, sources in families.items():
+            lines.append(f"# HELP {name} {sources[0][1]['help']}")
+            lines.append(f"# TYPE {name} {sources[0][1]['kind']}")
+            for extra, family in sources:
+                for values, series in family["samples"]:
+                    labels = _labels(family["labels"], values, extra)
+                    if family["kind"] != "histogram":
+                        lines.append(f"{name}{labels} {_number(series[0])}")
+                        continue
+                    cumulative = 0.0
+                    bounds = [_number(bound) for bound in family["buckets"]] + ["+Inf"]
+                    for bound, count in zip(bounds, series):
+                        cumulative += count
+                        le = ",".join(filter(None, [extra, f'le="{bound}"']))
+                        lines.append(f"{name}_bucket{_labels(family['labels'], values, le)} {_number(cumulative)}")
+                    lines.append(f"{name}_sum{labels} {series[-2]!r}")
+                    lines.append(f"{name}_count{labels} {_number(series[-1])}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# === Snapshots from other processes ===
+
+class SnapshotWriter:
+    """
+    Periodically writes this process's metrics where the API can read them
+
+    MCP servers run as separate processes, so they publish snapshots to a shared
+    directory and the API's /metrics endpoint merges them in.
+
+    Args:
+        directory: Shared snapshot directory
+        process: Name used in the process label, e.g. "filesystem"
+        interval: Seconds between writes
+        registry: Metrics to write
+    """
+
+    def __init__(self, directory: Path, process: str, interval: float = 10.0, registry: Registry = REGISTRY):
+        self.path = Path(directory) / f"{process}-{os.getpid()}.json"
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def write(self):
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(self.registry.snapshot()))
+        os.replace(temp_path, self.path)
+
+    def _run(self):
+        while True:
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Could not write metrics snapshot {self.path}: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+
+def load_snapshots(directory: Path, max_age: float = 120.0) -> List[Tuple[str, Dict[str, Dict[str, Any]]]]:
+    """Read the snapshots other processes wrote recently, skipping those of processes that have gone"""
+    snapshots = []
+    now = time.time()
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            if now - path.stat().st_mtime > max_age:
+                continue
+            snapshots.append((path.stem, json.loads(path.read_text())))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+# === Instrumentation points ===
+
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    "bw_model_call_seconds", "Duration of model provider requests, excluding queue wait", ["agent", "outcome"])
+MODEL_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "bw_model_queue_wait_seconds", "Time model requests waited for the model-call scheduler", ["priority"])
+MODEL_RETRIES = REGISTRY.counter(
+    "bw_model_retries_total", "Model requests resent after a rate-limit or overload response", ["agent"])
+MODEL_TOKENS = REGISTRY.counter(
+    "bw_model_tokens_total", "Tokens sent to and received from the model (as reported by the provider, else estimated)", ["agent", "direction"])
+WORKFLOW_SECONDS = REGISTRY.histogram(
+    "bw_workflow_seconds", "Duration of workflow runs", ["workflow", "status"])
+STAGE_SECONDS = REGISTRY.histogram(
+    "bw_stage_seconds", "Duration of chain stages and dag steps", ["workflow", "stage"])
+REFINEMENT_ROUNDS = REGISTRY.histogram(
+    "bw_refinement_rounds", "Rounds per evaluator-optimizer run", ["workflow", "stop_reason"], COUNT_BUCKETS)
+ROUTER_DECISIONS = REGISTRY.counter(
+    "bw_router_decisions_total", "Router decisions by how they were made", ["router", "source"])
+AGENT_APP_START_SECONDS = REGISTRY.histogram(
+    "bw_agent_app_start_seconds", "Time to start an agent application and the MCP servers of its server set")
+MCP_TOOL_SECONDS = REGISTRY.histogram(
+    "bw_mcp_tool_seconds", "Duration of MCP tool functions", ["server", "tool", "outcome"])
@@ -0,0 +1,357 @@
+"""
+Run tracing for the Business Workflow System
+Span trees per workflow run, kept in a local SQLite store with retention limits
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from storage.filesystem import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+TRACE_PATH = DATA_DIR / "traces.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    workflow TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    spans INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_duration ON runs (duration_ms);
+CREATE TABLE IF NOT EXISTS spans (
+    run_id TEXT NOT NULL,
+    span_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    start_ms REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    status TEXT NOT NULL,
+    attrs TEXT NOT NULL,
+    PRIMARY KEY (run_id, span_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tool_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    server TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration_ms REAL NOT NULL,
+    status TEXT NOT NULL,
+    attrs TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tool_calls_started_at ON tool_calls (started_at);
+"""
+
+# The innermost open span of the current task; nested spans become its children
+current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation in a run; attrs holds its sizes and outcome details"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "started", "duration_ms", "status", "attrs")
+
+    def __init__(self, trace: "Trace", span_id: int, parent_id: Optional[int], name: str, kind: str,
+                 attrs: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.attrs = attrs
+
+    def child(self, name: str, kind: str, **attrs: Any) -> "Span":
+        return self.trace.open(name, kind, self.span_id, attrs)
+
+    def end(self, status: Optional[str] = None, **attrs: Any):
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+        if status:
+            self.status = status
+        self.attrs.update(attrs)
+        self.trace.spans.append(self)
+
+
+class Trace:
+    """The spans of one workflow run; the root span is the run itself"""
+
+    def __init__(self, run_id: str, workflow: str, **attrs: Any):
+        self.run_id = run_id
+        self.workflow = workflow
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self._next_id = 0
+        self.root = self.open(workflow, "workflow", None, attrs)
+
+    def open(self, name: str, kind: str, parent_id: Optional[int], attrs: Dict[str, Any]) -> Span:
+        self._next_id += 1
+        return Span(self, self._next_id, parent_id, name, kind, attrs)
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str, parent: Optional[Span] = None, **attrs: Any) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child of `parent` (default: the current span), making it the current span
+
+    Outside a traced run this does nothing and yields None. The current span is a
+    context variable, so only enter this in the task that runs the block.
+    """
+    parent = parent or current_span.get()
+    if parent is None:
+        yield None
+        return
+    opened = parent.child(name, kind, **attrs)
+    token = current_span.set(opened)
+    status = "error"
+    try:
+        yield opened
+        status = "ok"
+    except BaseException as e:
+        status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+        opened.attrs["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        opened.end(status)
+
+
+def annotate(**attrs: Any):
+    """Add details to the current span, if there is one"""
+    opened = current_span.get()
+    if opened is not None:
+        opened.attrs.update(attrs)
+
+
+def _dumps(attrs: Dict[str, Any]) -> str:
+    return json.dumps(attrs, separators=(",", ":"), default=str)
+
+
+class TraceStore:
+    """
+    SQLite store of finished runs, their spans and MCP tool call timings
+
+    A run is written in one transaction when it finishes. Runs older than max_age or
+    beyond the newest max_runs are pruned every prune_every saves, along with tool
+    calls that no kept run can claim.
+
+    Args:
+        path: SQLite file, shared with the MCP servers that log tool calls
+        max_runs: Runs to keep
+        max_age: Seconds to keep a run
+        prune_every: Saves between retention passes
+    """
+
+    def __init__(self, path: Path = TRACE_PATH, max_runs: int = 10000, max_age: float = 7 * 24 * 3600,
+                 prune_every: int = 100):
+        self.path = Path(path)
+        self.max_runs = max_runs
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False,
+                                     timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._saves = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def start(self, run_id: str, workflow: str, **attrs: Any) -> Trace:
+        return Trace(run_id, workflow, **attrs)
+
+    def save(self, trace: Trace, status: str, **attrs: Any):
+        """End a run's root span and write the run"""
+        trace.root.end(status, **attrs)
+        origin = trace.root.started
+        rows = [(trace.run_id, s.span_id, s.parent_id, s.name, s.kind, round((s.started - origin) * 1000, 3),
+                 s.duration_ms, s.status, _dumps(s.attrs)) for s in trace.spans]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO runs (run_id, workflow, status, started_at, duration_ms, spans) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (trace.run_id, trace.workflow, status, trace.started_at, trace.root.duration_ms, len(rows)))
+                self._conn.executemany("INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._saves += 1
+            due = self._saves % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def record_tool_calls(self, calls: List[Tuple[str, str, float, float, str, str]]):
+        """Append (server, tool, started_at, duration_ms, status, attrs_json) rows"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO tool_calls (server, tool, started_at, duration_ms, status, attrs) "
+                "VALUES (?, ?, ?, ?, ?, ?)", calls)
+
+    def prune(self) -> int:
+        """Apply the retention limits, returning the number of runs removed"""
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            row = self._conn.execute("SELECT started_at FROM runs ORDER BY started_at DESC LIMIT 1 OFFSET ?",
+                                     (self.max_runs,)).fetchone()
+            if row:
+                cutoff = max(cutoff, row[0])
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM spans WHERE run_id IN "
+                                   "(SELECT run_id FROM runs WHERE started_at <= ?)", (cutoff,))
+                removed = self._conn.execute("DELETE FROM runs WHERE started_at <= ?", (cutoff,)).rowcount
+                self._conn.execute("DELETE FROM tool_calls WHERE started_at <= ?", (cutoff,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if removed:
+            logger.info(f"Pruned {removed} trace(s) from {self.path}")
+        return removed
+
+    # === Queries ===
+
+    def runs(self, slowest: Optional[int] = None, workflow: Optional[str] = None,
+             since: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Recent runs, newest first, or the `slowest` runs, slowest first
+
+        Each of the slowest runs also names its longest span below the root, the usual
+        place to start looking.
+        """
+        order, count = ("duration_ms DESC", slowest) if slowest else ("started_at DESC", limit)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT run_id, workflow, status, started_at, duration_ms, spans FROM runs "
+                f"WHERE started_at >= ? AND (? IS NULL OR workflow = ?) ORDER BY {order} LIMIT ?",
+                (since or 0.0, workflow, workflow, count)).fetchall()
+            runs = [dict(zip(("run_id", "workflow", "status", "started_at", "duration_ms", "spans"), row))
+                    for row in rows]
+            if slowest:
+                for run in runs:
+                    longest = self._conn.execute(
+                        "SELECT name, kind, duration_ms FROM spans WHERE run_id = ? AND parent_id IS NOT NULL "
+                        "ORDER BY duration_ms DESC LIMIT 1", (run["run_id"],)).fetchone()
+                    run["longest_span"] = dict(zip(("name", "kind", "duration_ms"), longest)) if longest else None
+        return runs
+
+    def trace(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        A run and its span tree, or None if it is unknown or has been pruned
+
+        Tool calls logged by MCP servers carry no run ID, so each is placed under the
+        innermost agent span whose time window contains it (attributed_by="time"); with
+        concurrent runs a call can land under the wrong agent.
+        """
+        with self._lock:
+            run = self._conn.execute(
+                "SELECT workflow, status, started_at, duration_ms FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if run is None:
+                return None
+            workflow, status, started_at, duration_ms = run
+            span_rows = self._conn.execute(
+                "SELECT span_id, parent_id, name, kind, start_ms, duration_ms, status, attrs FROM spans "
+                "WHERE run_id = ? ORDER BY start_ms, span_id", (run_id,)).fetchall()
+            tool_rows = self._conn.execute(
+                "SELECT server, tool, started_at, duration_ms, status, attrs FROM tool_calls "
+                "WHERE started_at >= ? AND started_at <= ? ORDER BY started_at",
+                (started_at, started_at + duration_ms / 1000)).fetchall()
+
+        nodes: Dict[int, Dict[str, Any]] = {}
+        for span_id, parent_id, name, kind, start_ms, span_ms, span_status, attrs in span_rows:
+            nodes[span_id] = {"span_id": span_id, "parent_id": parent_id, "name": name, "kind": kind,
+                              "start_ms": start_ms, "duration_ms": span_ms, "status": span_status,
+                              "attrs": json.loads(attrs), "children": []}
+
+        agents = [node for node in nodes.values() if node["kind"] == "agent"]
+        next_id = max(nodes, default=0)
+        for server, tool, tool_started, tool_ms, tool_status, attrs in tool_rows:
+            start_ms = round((tool_started - started_at) * 1000, 3)
+            owners = [node for node in agents if node["start_ms"] <= start_ms
+                      and start_ms + tool_ms <= node["start_ms"] + node["duration_ms"]]
+            if not owners:
+                continue
+            next_id += 1
+            owner = max(owners, key=lambda node: node["start_ms"])
+            nodes[next_id] = {"span_id": next_id, "parent_id": owner["span_id"], "name": f"{server}.{tool}",
+                              "kind": "tool", "start_ms": start_ms, "duration_ms": tool_ms, "status": tool_status,
+                              "attrs": {**json.loads(attrs), "attributed_by": "time"}, "children": []}
+
+        roots = []
+        for node in sorted(nodes.values(), key=lambda node: node["start_ms"]):
+            parent = nodes.get(node["parent_id"])
+            (parent["children"] if parent else roots).append(node)
+        return {"run_id": run_id, "workflow": workflow, "status": status, "started_at": started_at,
+                "duration_ms": duration_ms, "spans": roots}
+
+
+class ToolCallLog:
+    """
+    Buffers an MCP server's tool call timings and appends them to the trace store in batches
+
+    MCP servers run as separate processes and never see a run ID, so their calls are
+    stored on their own and matched to runs by time when a trace is read.
+
+    Args:
+        store: Trace store (its file is shared with the API process)
+        server: Server name, e.g. "filesystem"
+        interval: Seconds between writes
+    """
+
+    def __init__(self, store: TraceStore, server: str, interval: float = 1.0):
+        self.store = store
+        self.server = server
+        self.interval = interval
+        self._buffer: List[Tuple[str, str, float, float, str, str]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tool-call-log", daemon=True)
+
+    def record(self, tool: str, started_at: float, duration_ms: float, status: str, **attrs: Any):
+        row = (self.server, tool, started_at, duration_ms, status, _dumps(attrs))
+        with self._lock:
+            self._buffer.append(row)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if rows:
+            self.store.record_tool_calls(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not write tool call timings to {self.store.path}: {e}")
@@ -17,12 +17,27 @@ from agents.document_agents import document_generator, pdf_creator, document_qua
     evaluator="quality_assurance",
     min_rating="EXCELLENT",
     max_refinements=5,
+    # Local checks run before each evaluator call
+    checks={
+        "required_sections": ["Executive Summary", "Conclusion"],
+        "min_words": 400,
+        "banned_terms": ["lorem ipsum", "TBD"],
+    },
 )
 
 # Router for directing different document requests
 @fast.router(
     name="document_router",
     agents=["document_workflow", "premium_document_workflow"],
+    # Action keywords that pick a workflow without asking the model
+    rules={
+        "create": "document_workflow",
+        "convert": "document_workflow",
+        "pdf": "document_workflow",
+        "organize": "document_workflow",
+        "premium": "premium_document_workflow",
+        "polish": "premium_document_workflow",
+    },
 )
 
 # Example usage:
@@ -46,6 +46,8 @@ from agents.marketing_agents import (
     evaluator="brand_guidelines_keeper",
     min_rating="EXCELLENT",
     max_refinements=3,
+    # Local checks run before each evaluator call
+    checks={"max_words": 600, "banned_terms": ["lorem ipsum", "guaranteed", "risk-free"]},
 )
 
 @fast.parallel(
@@ -63,6 +65,20 @@ from agents.marketing_agents import (
     name="marketing_router",
     agents=["social_media_workflow", "campaign_management_workflow", "creator_partnership_workflow", "content_quality_workflow"],
     model="claude-3.7-sonnet-20250219",
+    # Action keywords that pick a workflow without asking the model
+    rules={
+        "social": "social_media_workflow",
+        "post": "social_media_workflow",
+        "template": "social_media_workflow",
+        "campaign": "campaign_management_workflow",
+        "ads": "campaign_management_workflow",
+        "audience": "campaign_management_workflow",
+        "creator": "creator_partnership_workflow",
+        "influencer": "creator_partnership_workflow",
+        "partnership": "creator_partnership_workflow",
+        "quality": "content_quality_workflow",
+        "review": "content_quality_workflow",
+    },
 )
 
 # Example usage:
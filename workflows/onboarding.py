@@ -11,6 +11,7 @@ from agents.document_agents import document_generator
     """,
     cumulative=True,
     continue_with_final=True,
+    compaction={"strategy": "summarize", "budget": 3000},
 )
 
 # Example usage:
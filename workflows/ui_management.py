@@ -2,14 +2,23 @@ import fast_agent as fast
 from agents.ui_agents import ui_generator, ui_analyzer, style_manager
 from agents.business_agents import repo_manager
 
-@fast.chain(
+# Analysis and styling both work from the request alone, so they run side by side
+@fast.dag(
     "ui_workflow",
-    sequence=["ui_analyzer", "style_manager", "ui_generator", "repo_manager"],
+    steps={
+        "ui_analyzer": [],
+        "style_manager": [],
+        "ui_generator": ["ui_analyzer", "style_manager"],
+        "repo_manager": ["style_manager", "ui_generator"],
+    },
     instruction="""Generate and manage UI components based on business styling.
     Analyze existing UI, apply business styling, generate new components,
     and update repository with changes.
     """,
     cumulative=True,
+    # Past the budget a step keeps its last input whole and gets the earlier ones summarized,
+    # e.g. repo_manager sees the generated components in full and the styling in brief
+    compaction={"strategy": "summarize", "budget": 3000},
 )
 
 @fast.chain(